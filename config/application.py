@@ -11,3 +11,11 @@ APP_ROOT = os.path.abspath(
 
 DATA_PATH = os.path.join(APP_ROOT, 'data')
 JARS_PATH = os.path.join(DATA_PATH, 'jars')
+CACHE_PATH = os.path.join(DATA_PATH, 'cache')
+JAR_STORE_PATH = os.path.join(DATA_PATH, 'store')
+SERVERS_PATH = os.path.join(DATA_PATH, 'servers')
+BACKUPS_PATH = os.path.join(DATA_PATH, 'backups')
+
+# Number of seconds a cached remote manifest (such as versions.json) is used
+# before it is revalidated against the remote endpoint.
+MANIFEST_CACHE_TTL = 5 * 60
@@ -0,0 +1,223 @@
+import collections
+import csv
+import optparse
+import os.path
+import simplejson
+import sys
+
+from jar_downloader.config_form import get_compiled_form
+from jar_downloader.discovery import get_jar_downloader_map
+from jar_downloader.helpers import create_jar_directory
+from jar_downloader.helpers import get_jar_directory
+from jar_downloader.helpers import USER_JAR_NAME_REGEX
+
+# Columns picking the jar.  They are taken out of the row before the rest
+# of it is loaded as the jar's config (which may have a jar_type of its own).
+JAR_DOWNLOADER = 'jar_downloader'
+USER_JAR_NAME = 'user_jar_name'
+# Error key of rows which could not be read
+ROW = 'row'
+
+CSV = 'csv'
+JSON_LINES = 'jsonl'
+FORMATS = (CSV, JSON_LINES)
+
+
+class ImportResult(collections.namedtuple(
+    'ImportResult',
+    ['row_number', 'jar_type', 'user_jar_name', 'created', 'errors'],
+)):
+    """An ImportResult is the outcome of importing a single row.
+
+    Properties:
+        row_number - 1 based number of the row
+        jar_type - The type of the jar (name of the JarDownloader class)
+        user_jar_name - Name given by the user for the jar
+        created - Whether the jar directory was created
+        errors - dict mapping dotted paths (or jar_downloader /
+            user_jar_name / row) to error messages, empty if the row is valid
+    """
+    __slots__ = ()
+
+    @property
+    def success(self):
+        return not self.errors
+
+
+class InvalidRow(collections.namedtuple('InvalidRow', ['error'])):
+    """Yielded by row readers in place of a row which could not be read.
+
+    Properties:
+        error - Error message
+    """
+    __slots__ = ()
+
+
+def _import_row(row_number, row, jar_downloader_map, seen, dry_run):
+    if isinstance(row, InvalidRow):
+        return ImportResult(row_number, None, None, False, {ROW: row.error})
+
+    row = dict(row)
+    jar_type = row.pop(JAR_DOWNLOADER, None)
+    user_jar_name = row.pop(USER_JAR_NAME, None)
+
+    def get_result(created=False, errors=None):
+        return ImportResult(
+            row_number, jar_type, user_jar_name, created, errors or {},
+        )
+
+    if jar_type not in jar_downloader_map:
+        return get_result(errors={
+            JAR_DOWNLOADER: 'Unknown jar type: {0}'.format(jar_type),
+        })
+
+    if not user_jar_name or not USER_JAR_NAME_REGEX.match(user_jar_name):
+        return get_result(errors={
+            USER_JAR_NAME: 'Invalid jar name: {0}'.format(user_jar_name),
+        })
+
+    form = get_compiled_form(jar_type, jar_downloader_map).form
+    values, errors = form.load_from_form(row)
+    if errors:
+        return get_result(errors=errors)
+
+    if (
+        (jar_type, user_jar_name) in seen or
+        os.path.exists(get_jar_directory(jar_type, user_jar_name))
+    ):
+        return get_result(errors={USER_JAR_NAME: 'Jar already exists.'})
+    seen.add((jar_type, user_jar_name))
+
+    if dry_run:
+        return get_result()
+
+    try:
+        create_jar_directory(jar_type, user_jar_name, values)
+    except (IOError, OSError, ValueError) as e:
+        return get_result(errors={USER_JAR_NAME: str(e)})
+    return get_result(created=True)
+
+def import_jars(rows, dry_run=False, jar_downloader_map=None):
+    """Validates rows and creates a jar directory for each valid one.
+
+    Rows are processed (and results yielded) one at a time so rows may be a
+    stream.  The Form of each jar type is only built once (and shared with
+    the jar creation page, see get_compiled_form).
+
+    Yields an ImportResult for each row.
+
+    Args:
+        rows - Iterable of flat dicts (or InvalidRow).  jar_downloader and
+            user_jar_name pick the jar, the other keys are the jar's config as
+            dotted paths (like the jar creation form).
+        dry_run - Only validate, don't create anything
+        jar_downloader_map - Map like get_jar_downloader_map() (defaults to
+            all jar downloaders)
+    """
+    if jar_downloader_map is None:
+        jar_downloader_map = get_jar_downloader_map()
+
+    # Jars created (or which would be created) by earlier rows
+    seen = set()
+    for row_number, row in enumerate(rows, 1):
+        yield _import_row(
+            row_number, row, jar_downloader_map, seen, dry_run,
+        )
+
+def read_csv_rows(input_file):
+    """Yields the rows of a csv file with a header row.  Empty cells are left
+    out so they are treated like values missing from a form.
+    """
+    for row in csv.DictReader(input_file):
+        yield dict(
+            (key, value) for key, value in row.iteritems()
+            if value not in ('', None)
+        )
+
+def read_json_lines_rows(input_file):
+    """Yields the rows of a file with one json object per line.  Lines which
+    are not json objects are yielded as InvalidRow so the rest of the file is
+    still imported.
+    """
+    for line_number, line in enumerate(input_file, 1):
+        if not line.strip():
+            continue
+        try:
+            row = simplejson.loads(line)
+        except ValueError as e:
+            yield InvalidRow('Invalid json on line {0}: {1}'.format(
+                line_number, e,
+            ))
+            continue
+        if not isinstance(row, dict):
+            yield InvalidRow(
+                'Expected a json object on line {0}.'.format(line_number),
+            )
+            continue
+        yield row
+
+ROW_READERS = {
+    CSV: read_csv_rows,
+    JSON_LINES: read_json_lines_rows,
+}
+
+def format_result(result):
+    name = 'row {0} ({1}/{2})'.format(
+        result.row_number, result.jar_type, result.user_jar_name,
+    )
+    if result.errors:
+        return '{0}: error: {1}'.format(name, '; '.join(
+            '{0}: {1}'.format(path, message)
+            for path, message in sorted(result.errors.iteritems())
+        ))
+    elif result.created:
+        return '{0}: created'.format(name)
+    else:
+        return '{0}: valid'.format(name)
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options] [FILE]\n\n'
+        'Creates a jar for each row of FILE (default stdin).  Rows have '
+        'jar_downloader and user_jar_name columns and a column for each '
+        'config value (dotted paths for nested values).',
+    )
+    parser.add_option(
+        '--format',
+        type='choice', choices=FORMATS, default=CSV,
+        help='Format of the input: csv (with a header row) or jsonl.',
+    )
+    parser.add_option(
+        '--dry-run',
+        action='store_true', default=False,
+        help='Only validate the rows.',
+    )
+    parser.add_option(
+        '--json',
+        action='store_true', default=False,
+        help='Output a json object per row.',
+    )
+    opts, args = parser.parse_args(argv)
+    if len(args) > 1:
+        parser.error('Expected at most one file.')
+
+    input_file = open(args[0], 'r') if args else sys.stdin
+    success = True
+    try:
+        for result in import_jars(
+            ROW_READERS[opts.format](input_file), dry_run=opts.dry_run,
+        ):
+            success = success and result.success
+            if opts.json:
+                print simplejson.dumps(result._asdict())
+            else:
+                print format_result(result)
+            sys.stdout.flush()
+    finally:
+        if args:
+            input_file.close()
+
+    return int(not success)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+
+import collections
+import markupsafe
+
+from jar_downloader.discovery import get_jar_downloader_map
+from schemaform.form import Form
+from schemaform.helpers import get_schema_fingerprint
+from schemaform.helpers import html_el
+from schemaform.single_input_property import SingleInputProperty
+
+# Stands in for the form action until a CompiledForm is rendered
+ACTION_PLACEHOLDER = '__jar_creation_action__'
+
+class CompiledForm(collections.namedtuple(
+    'CompiledForm',
+    ['jar_downloader_cls', 'schema_fingerprint', 'form', 'markup_parts'],
+)):
+    """The Form of a jar downloader's config schema along with its markup.
+
+    Properties:
+        jar_downloader_cls - The jar downloader class the form is for
+        schema_fingerprint - Fingerprint of the schema the form was built from
+        form - The Form, used to load submitted values
+        markup_parts - The markup before and after the form action
+    """
+    __slots__ = ()
+
+    def render(self, action):
+        before, after = self.markup_parts
+        return before + markupsafe.escape(action) + after
+
+# Maps jar types to their CompiledForm
+_compiled_forms = {}
+
+def _compile_form(jar_downloader_cls, schema_fingerprint):
+    form = Form(
+        jar_downloader_cls.get_config_schema(),
+        method='POST',
+        action=ACTION_PLACEHOLDER,
+    )
+    user_jar_name_input = SingleInputProperty(
+        '',
+        'user_jar_name',
+        {'type': 'string', 'label': 'Your Jar Name'},
+    )
+    markup = form.render(
+        before=[user_jar_name_input],
+        after=[html_el('input', type='submit', value='Submit')],
+    )
+    return CompiledForm(
+        jar_downloader_cls,
+        schema_fingerprint,
+        form,
+        tuple(markup.split(ACTION_PLACEHOLDER)),
+    )
+
+def get_compiled_form(jar_type, jar_downloader_map=None):
+    """Returns the CompiledForm for the jar type.  It is built once and
+    rebuilt when the jar downloader class changes to one with another schema.
+
+    Raises KeyError if the jar type is unknown.
+
+    Args:
+        jar_type - The type of the jar (name of the JarDownloader class)
+        jar_downloader_map - Map like get_jar_downloader_map() (defaults to
+            all jar downloaders)
+    """
+    if jar_downloader_map is None:
+        jar_downloader_map = get_jar_downloader_map()
+    jar_downloader_cls = jar_downloader_map[jar_type]
+    compiled_form = _compiled_forms.get(jar_type)
+    if (
+        compiled_form is not None and
+        compiled_form.jar_downloader_cls is jar_downloader_cls
+    ):
+        return compiled_form
+
+    # Only fingerprinted once per class
+    schema_fingerprint = get_schema_fingerprint(
+        jar_downloader_cls.get_config_schema(),
+    )
+    if (
+        compiled_form is not None and
+        compiled_form.schema_fingerprint == schema_fingerprint
+    ):
+        compiled_form = compiled_form._replace(
+            jar_downloader_cls=jar_downloader_cls,
+        )
+    else:
+        compiled_form = _compile_form(jar_downloader_cls, schema_fingerprint)
+    _compiled_forms[jar_type] = compiled_form
+    return compiled_form
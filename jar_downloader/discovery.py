@@ -1,14 +1,25 @@
 
 import collections
+import optparse
 import os
 import os.path
+import simplejson
+import sys
+import threading
 
 import config.application
 from jar_downloader.jar_downloader_base import JarDownloaderBase
+from util.decorators import memoize
+from util.discovery import build_manifest
 from util.discovery import discover
+from util.files import atomic_open
+from util.fs_watch import get_watcher
 
 JAR_DOWNLOADER_DIRECTORY = os.path.dirname(__file__)
 
+# Written by `python -m jar_downloader.discovery` into CACHE_PATH
+MANIFEST_FILE = 'jar_downloader_manifest.json'
+
 def is_jar_downloader(cls):
     return (
         cls is not JarDownloaderBase and
@@ -16,15 +27,48 @@ def is_jar_downloader(cls):
         cls.__dict__.get('__jar_downloader__', True)
     )
 
+def get_manifest_path():
+    return os.path.join(config.application.CACHE_PATH, MANIFEST_FILE)
+
+def load_manifest():
+    """Returns the jar downloader manifest or None if it has not been written
+    (or is broken).
+    """
+    try:
+        with open(get_manifest_path(), 'r') as manifest_file:
+            return simplejson.load(manifest_file)
+    except (IOError, ValueError):
+        return None
+
+def write_manifest():
+    """Writes the manifest of the modules in JAR_DOWNLOADER_DIRECTORY which
+    contain jar downloaders.  Returns the manifest.
+    """
+    manifest = build_manifest(JAR_DOWNLOADER_DIRECTORY, is_jar_downloader)
+    manifest_path = get_manifest_path()
+    if not os.path.exists(os.path.dirname(manifest_path)):
+        os.makedirs(os.path.dirname(manifest_path))
+    with atomic_open(manifest_path, 'w') as manifest_file:
+        simplejson.dump(manifest, manifest_file)
+    return manifest
+
+@memoize
 def get_jar_downloaders():
-    """Returns a list of classes that are JarDownloaders."""
-    return discover(JAR_DOWNLOADER_DIRECTORY, is_jar_downloader)
+    """Returns a frozenset of classes that are JarDownloaders.
+
+    Discovery happens once per process.  If a manifest has been written with
+    write_manifest() modules which contain no jar downloaders are not
+    imported.
+    """
+    return frozenset(discover(
+        JAR_DOWNLOADER_DIRECTORY, is_jar_downloader, manifest=load_manifest(),
+    ))
 
 def get_jar_downloader_map():
     """Returns a dict that maps name to jar downloader class."""
     return dict((jar.__name__, jar) for jar in get_jar_downloaders())
 
-def get_user_jars():
+def scan_user_jars():
     """Returns a map mapping as follows: {
         'JarType': {
             'UserJarName': 'path/to/jar/directory',
@@ -52,3 +96,81 @@ def get_user_jars():
             ret[key][inner_key] = user_jars[key][inner_key]
 
     return ret
+
+
+class UserJarRegistry(object):
+    """Keeps the map of user jars in process and only rescans JARS_PATH when
+    a watcher reports that it (or one of the jar type directories inside of
+    it) changed.
+    """
+
+    def __init__(self, get_watcher=get_watcher):
+        self._get_watcher = get_watcher
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._jars_path = None
+        self._user_jars = None
+
+    def _refresh(self):
+        jars_path = config.application.JARS_PATH
+        if self._watcher is None or jars_path != self._jars_path:
+            if self._watcher is not None:
+                self._watcher.close()
+            self._watcher = self._get_watcher()
+            self._jars_path = jars_path
+
+        # Watch before scanning so changes made during the scan are noticed by
+        # the next lookup
+        self._watcher.watch([jars_path] + [
+            os.path.join(jars_path, jar_type)
+            for jar_type in os.listdir(jars_path)
+        ])
+        self._user_jars = scan_user_jars()
+
+    def get_user_jars(self):
+        """Returns the map of scan_user_jars().  The map is shared between
+        callers and must not be modified.
+        """
+        with self._lock:
+            if (
+                self._user_jars is None or
+                self._jars_path != config.application.JARS_PATH or
+                self._watcher.changed()
+            ):
+                self._refresh()
+            return self._user_jars
+
+    def invalidate(self):
+        """Forces a rescan on the next lookup."""
+        with self._lock:
+            self._user_jars = None
+
+user_jar_registry = UserJarRegistry()
+
+def get_user_jars():
+    """Returns a map mapping as follows: {
+        'JarType': {
+            'UserJarName': 'path/to/jar/directory',
+        }
+    }
+
+    The map is kept current by user_jar_registry and must not be modified.
+    """
+    return user_jar_registry.get_user_jars()
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog\n\n'
+        'Writes the manifest used to skip importing modules without jar '
+        'downloaders.',
+    )
+    parser.parse_args(argv)
+
+    manifest = write_manifest()
+    print 'Wrote {0} ({1} jar downloaders).'.format(
+        get_manifest_path(),
+        sum(len(entry['classes']) for entry in manifest.itervalues()),
+    )
+
+if __name__ == '__main__':
+    sys.exit(main())
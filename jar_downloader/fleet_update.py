@@ -0,0 +1,234 @@
+
+import collections
+import contextlib
+import functools
+import multiprocessing.pool
+import optparse
+import simplejson
+import sys
+import threading
+import urlparse
+
+from jar_downloader.discovery import get_jar_downloader_map
+from jar_downloader.discovery import get_user_jars
+from jar_downloader.jar_store import jar_store
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_PER_HOST = 4
+
+
+class UpdateResult(collections.namedtuple(
+    'UpdateResult',
+    ['jar_type', 'user_jar_name', 'version', 'updated', 'error'],
+)):
+    """An UpdateResult is the outcome of updating a single user jar.
+
+    Properties:
+        jar_type - The type of the jar (name of the JarDownloader class)
+        user_jar_name - Name given by the user for the jar
+        version - Version the jar was updated to (None if not updated)
+        updated - Whether a new version was installed
+        error - Error message if the update failed, otherwise None
+    """
+    __slots__ = ()
+
+    @property
+    def success(self):
+        return self.error is None
+
+
+class HostLimiter(object):
+    """Limits the number of concurrent downloads from each host."""
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _get_semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(
+                    self.max_per_host,
+                )
+            return self._semaphores[host]
+
+    @contextlib.contextmanager
+    def limit(self, url):
+        """Blocks until a download from url's host is allowed."""
+        semaphore = self._get_semaphore(urlparse.urlparse(url).netloc)
+        with semaphore:
+            yield
+
+
+# A UserJarTarget is a user jar we are attempting to update
+UserJarTarget = collections.namedtuple(
+    'UserJarTarget', ['jar_type', 'user_jar_name', 'instance'],
+)
+
+def _format_error(error):
+    return '{0}: {1}'.format(type(error).__name__, error)
+
+def _get_result(target, version=None, updated=False, error=None):
+    return UpdateResult(
+        target.jar_type, target.user_jar_name, version, updated, error,
+    )
+
+def _get_targets(user_jars, jar_downloader_map):
+    """Returns (targets, results) where results are errors for user jars which
+    could not be instantiated.
+    """
+    targets = []
+    results = []
+    for jar_type, user_jar_names in user_jars.iteritems():
+        for user_jar_name, jar_path in user_jar_names.iteritems():
+            if jar_type not in jar_downloader_map:
+                results.append(UpdateResult(
+                    jar_type, user_jar_name, None, False,
+                    'Unknown jar type: {0}'.format(jar_type),
+                ))
+                continue
+
+            targets.append(UserJarTarget(
+                jar_type,
+                user_jar_name,
+                jar_downloader_map[jar_type](jar_path),
+            ))
+    return targets, results
+
+def _plan(target):
+    """Returns (target, version, error) for the version target updates to."""
+    try:
+        return target, target.instance.get_update_version(), None
+    except Exception as e:
+        return target, None, _format_error(e)
+
+def _apply(host_limiter, group):
+    """Downloads a version once and installs it for all of the targets.
+
+    Returns a list of UpdateResult objects.
+
+    Args:
+        host_limiter - HostLimiter for the download
+        group - ((jar_type, version), targets)
+    """
+    (_, version), targets = group
+    primary = targets[0]
+    try:
+        url = primary.instance.get_download_url(version)
+        with host_limiter.limit(url):
+            primary.instance.download_specific_version(version)
+
+        # Jars downloaded through download_jar are already stored (and
+        # hashed), only other downloads need to be hashed here
+        digest = jar_store.get_digest_for_url(url)
+        if digest is None:
+            digest = jar_store.add(primary.instance.get_jar_path(version))
+    except Exception as e:
+        error = _format_error(e)
+        return [_get_result(target, error=error) for target in targets]
+
+    results = []
+    for target in targets:
+        try:
+            if target is not primary:
+                target.instance.install_stored_jar(version, digest)
+            target.instance.set_latest_version(version)
+            results.append(_get_result(target, version, True))
+        except Exception as e:
+            results.append(_get_result(target, error=_format_error(e)))
+    return results
+
+def update_all(
+    user_jars=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    max_per_host=DEFAULT_MAX_PER_HOST,
+):
+    """Updates all of the user jars concurrently.
+
+    Identical downloads (same jar type and version) are only performed once
+    and then linked from the jar store into the other user jars which need
+    them.
+
+    Returns a list of UpdateResult objects sorted by jar type and name.
+
+    Args:
+        user_jars - Map like that of get_user_jars() (defaults to all jars)
+        max_workers - Maximum number of threads used
+        max_per_host - Maximum concurrent downloads from a single host
+    """
+    if user_jars is None:
+        user_jars = get_user_jars()
+
+    targets, results = _get_targets(user_jars, get_jar_downloader_map())
+    host_limiter = HostLimiter(max_per_host)
+
+    pool = multiprocessing.pool.ThreadPool(max_workers)
+    try:
+        # Group user jars by what they would download
+        groups = collections.OrderedDict()
+        for target, version, error in pool.map(_plan, targets):
+            if error is not None:
+                results.append(_get_result(target, error=error))
+            elif version is None:
+                results.append(_get_result(target))
+            else:
+                groups.setdefault((target.jar_type, version), []).append(
+                    target,
+                )
+
+        for group_results in pool.map(
+            functools.partial(_apply, host_limiter), groups.items(),
+        ):
+            results.extend(group_results)
+    finally:
+        pool.close()
+        pool.join()
+
+    return sorted(
+        results,
+        key=lambda result: (result.jar_type, result.user_jar_name),
+    )
+
+def format_result(result):
+    name = '{0}/{1}'.format(result.jar_type, result.user_jar_name)
+    if result.error is not None:
+        return '{0}: error: {1}'.format(name, result.error)
+    elif result.updated:
+        return '{0}: updated to {1}'.format(name, result.version)
+    else:
+        return '{0}: up to date'.format(name)
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option(
+        '--max-workers',
+        type='int', default=DEFAULT_MAX_WORKERS,
+        help='Maximum number of concurrent updates.',
+    )
+    parser.add_option(
+        '--max-per-host',
+        type='int', default=DEFAULT_MAX_PER_HOST,
+        help='Maximum number of concurrent downloads from a single host.',
+    )
+    parser.add_option(
+        '--json',
+        action='store_true', default=False,
+        help='Output the results as json.',
+    )
+    opts, _ = parser.parse_args(argv)
+
+    results = update_all(
+        max_workers=opts.max_workers, max_per_host=opts.max_per_host,
+    )
+
+    if opts.json:
+        print simplejson.dumps([result._asdict() for result in results])
+    else:
+        for result in results:
+            print format_result(result)
+
+    return int(not all(result.success for result in results))
+
+if __name__ == '__main__':
+    sys.exit(main())
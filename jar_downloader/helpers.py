@@ -1,12 +1,15 @@
 
 import os
 import os.path
+import re
 import simplejson
 
 import config.application
 
 CONFIG_FILE = 'config.json'
 
+USER_JAR_NAME_REGEX = re.compile('^[a-zA-Z-_]+$')
+
 def get_jar_directory(jar_type, user_jar_name):
     return os.path.join(
         config.application.JARS_PATH, jar_type, user_jar_name,
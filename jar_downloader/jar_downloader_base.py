@@ -1,10 +1,28 @@
 
 import collections
-import jsonschema
+import os
 import os.path
 import simplejson
+import threading
+import time
 
 from jar_downloader.helpers import CONFIG_FILE
+from jar_downloader.jar_index import JarIndex
+from jar_downloader.jar_store import HASH_ALGORITHM
+from jar_downloader.jar_store import jar_store
+from jar_downloader.progress import DOWNLOAD
+from jar_downloader.progress import ProgressTracker
+from jar_downloader.progress import VERIFY
+from schemaform.helpers import get_validator
+from util.decorators import cached_property
+from util.decorators import memoize
+from util.download import check_hashes
+from util.download import ChecksumMismatchError
+from util.download import DEFAULT_RETRY_POLICY
+from util.download import DEFAULT_TIMEOUT
+from util.download import download
+from util.files import get_file_hashes
+from util.fs_watch import RACY_MTIME_WINDOW
 
 class Jar(collections.namedtuple('Jar', ['filename', 'short_version'])):
     """A Jar represents a single file of a jar inside the jar_directory.
@@ -16,12 +34,46 @@ class Jar(collections.namedtuple('Jar', ['filename', 'short_version'])):
     """
     pass
 
+class VerifyResult(collections.namedtuple('VerifyResult', ['jar', 'valid'])):
+    """A VerifyResult is the outcome of verifying a single jar.
+
+    Properties:
+        jar - The Jar object that was verified
+        valid - True if the jar matches its expected hashes, False if it does
+            not and None if there is nothing to check it against.
+    """
+    __slots__ = ()
+
+def _is_valid(entry):
+    """Returns whether a jar index entry matches its expected hashes."""
+    if not entry['expected_hashes']:
+        return None
+    try:
+        check_hashes(entry['hashes'], entry['expected_hashes'])
+    except ChecksumMismatchError:
+        return False
+    return True
+
+@memoize
+def _get_config_validator(cls):
+    return get_validator(cls.get_config_schema())
+
+# Maps (jar downloader class, config file path) to (stat key, config)
+_config_cache = {}
+_config_cache_lock = threading.Lock()
+
 class JarDownloaderBase(object):
     """Base class for Jar Downloaders.  A Jar Downloader is responsible for
     managing a directory of downloaded jars and for updating to the latest
     version.
     """
 
+    # How failed downloads are retried, override to change the policy
+    retry_policy = DEFAULT_RETRY_POLICY
+
+    # Functions called with each ProgressEvent, see add_progress_listener
+    progress_listeners = ()
+
     def __init__(self, jar_directory):
         """Initialize the Jar Downloader.
 
@@ -45,13 +97,38 @@ class JarDownloaderBase(object):
     def config_file(self):
         return os.path.join(self.jar_directory, CONFIG_FILE)
 
+    @classmethod
+    def get_config_validator(cls):
+        """Returns a jsonschema validator for get_config_schema().  The schema
+        is only checked and compiled once per class.
+        """
+        return _get_config_validator(cls)
+
     @property
     def config(self):
+        """The validated configuration.  The file is only read again once its
+        stat changes so the returned dict is shared and must not be modified.
+        """
+        stat = os.stat(self.config_file)
+        stat_key = (stat.st_mtime, stat.st_size, stat.st_ino)
+        cache_key = (type(self), self.config_file)
+
+        with _config_cache_lock:
+            cached = _config_cache.get(cache_key)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+
         # TODO: catch all the exceptions here and raise one specific type
         with open(self.config_file, 'r') as config_file:
             config_data = simplejson.load(config_file)
 
-        jsonschema.validate(config_data, self.get_config_schema())
+        self.get_config_validator().validate(config_data)
+        if time.time() - stat.st_mtime < RACY_MTIME_WINDOW:
+            # The file could still change without changing its mtime, cache
+            # it but don't trust it next time
+            stat_key = None
+        with _config_cache_lock:
+            _config_cache[cache_key] = (stat_key, config_data)
         return config_data
 
     @property
@@ -71,6 +148,219 @@ class JarDownloaderBase(object):
         """Return a list of all available downloadable versions."""
         raise NotImplementedError
 
+    def get_available_versions(self, allow_stale=False):
+        """Returns available_versions.  Override to support allow_stale.
+
+        Args:
+            allow_stale - Whether an out of date list is acceptable if it
+                can be had without waiting on the network.
+        """
+        return self.available_versions
+
+    def get_jar_path(self, version):
+        """Implement to return the path inside jar_directory where the jar of
+        the specified version is (or would be) stored.
+
+        Args:
+            version - short version string.
+        """
+        raise NotImplementedError
+
+    def get_download_url(self, version):
+        """Implement to return the url the specified version is downloaded
+        from.
+
+        Args:
+            version - short version string.
+        """
+        raise NotImplementedError
+
+    def add_progress_listener(self, listener):
+        """Registers a function to be called with every ProgressEvent this
+        jar downloader emits.
+
+        Args:
+            listener - Function taking a ProgressEvent
+        """
+        self.progress_listeners = self.progress_listeners + (listener,)
+
+    def emit_progress(self, event):
+        """Passes a ProgressEvent to the progress listeners.  Jar downloaders
+        doing their own work (instead of using download_jar) should emit
+        their progress through this.
+        """
+        for listener in self.progress_listeners:
+            listener(event)
+
+    def _track_progress(self, stage):
+        """Returns a (bytes_transferred, total_bytes) callback emitting
+        progress for the stage or None if nobody is listening.
+        """
+        if not self.progress_listeners:
+            return None
+        return ProgressTracker(stage, self.emit_progress)
+
+    @cached_property
+    def jar_index(self):
+        return JarIndex(self.jar_directory)
+
+    def get_expected_hashes(self, version):
+        """Override to return a dict mapping hashlib algorithm name to the hex
+        digest the jar of the specified version is published with.  Downloads
+        which do not match are rejected.
+
+        Args:
+            version - short version string.
+        """
+        return {}
+
+    def _link_from_store(self, url, jar_path, expected_hashes):
+        """Links the jar previously downloaded from url into jar_path.  Returns
+        the hashes of the jar or None if the store can't provide it.
+        """
+        digest = jar_store.get_digest_for_url(url)
+        if digest is None:
+            return None
+        return self._link_blob(digest, jar_path, expected_hashes)
+
+    def _link_blob(self, digest, jar_path, expected_hashes):
+        """Links the stored blob into jar_path.  Returns the hashes of the jar
+        or None (leaving nothing at jar_path) if it doesn't match
+        expected_hashes.
+        """
+        jar_store.materialize(digest, jar_path)
+        hashes = {HASH_ALGORITHM: digest}
+        missing_algorithms = set(expected_hashes) - set(hashes)
+        if missing_algorithms:
+            hashes.update(get_file_hashes(
+                jar_path,
+                missing_algorithms,
+                progress_callback=self._track_progress(VERIFY),
+            ))
+
+        try:
+            check_hashes(hashes, expected_hashes)
+        except ChecksumMismatchError:
+            # The stored jar is no good, download a fresh copy instead
+            os.remove(jar_path)
+            return None
+        return hashes
+
+    def download_jar(
+        self, url, jar_path, timeout=DEFAULT_TIMEOUT, expected_hashes=None,
+    ):
+        """Downloads url to jar_path through the jar store.
+
+        Jars are stored once in the jar store and linked into the jar
+        directory so a url which was already downloaded (for any jar
+        directory) is linked instead of being downloaded again.
+
+        The jar is hashed while it downloads and checked against
+        expected_hashes.  The hashes are recorded in the jar index.
+
+        Progress is emitted to the progress listeners as DOWNLOAD events
+        followed by a VERIFY event once the hashes have been checked.
+
+        Args:
+            url - Url of the jar.
+            jar_path - Path inside jar_directory to put the jar at.
+            timeout - Timeout in seconds for the connection.
+            expected_hashes - dict mapping hashlib algorithm name to the hex
+                digest the jar must have.
+        """
+        expected_hashes = expected_hashes or {}
+        hashes = self._link_from_store(url, jar_path, expected_hashes)
+        if hashes is None:
+            hashes = download(
+                url,
+                jar_path,
+                retry_policy=self.retry_policy,
+                timeout=timeout,
+                hash_algorithms=[HASH_ALGORITHM],
+                expected_hashes=expected_hashes,
+                progress_callback=self._track_progress(DOWNLOAD),
+            )
+            # The hashes were checked while streaming
+            verify_callback = self._track_progress(VERIFY)
+            if verify_callback is not None:
+                size = os.path.getsize(jar_path)
+                verify_callback(size, size)
+            jar_store.add(jar_path, url=url, digest=hashes[HASH_ALGORITHM])
+
+        self.jar_index.record(
+            os.path.basename(jar_path), hashes, expected_hashes,
+        )
+
+    def install_stored_jar(self, version, digest):
+        """Links the stored jar with digest in as the jar of the specified
+        version.  Like a download it is checked against the version's
+        expected hashes and recorded in the jar index.
+
+        Raises ChecksumMismatchError if the jar doesn't match.
+
+        Args:
+            version - short version string.
+            digest - Digest of the jar in the jar store.
+        """
+        jar_path = self.get_jar_path(version)
+        expected_hashes = self.get_expected_hashes(version)
+        hashes = self._link_blob(digest, jar_path, expected_hashes)
+        if hashes is None:
+            raise ChecksumMismatchError(
+                'Stored jar {0} does not match {1}.'.format(
+                    digest, expected_hashes,
+                ),
+            )
+        self.jar_index.record(
+            os.path.basename(jar_path), hashes, expected_hashes,
+        )
+
+    def verify(self, full=False):
+        """Re-checks the downloaded jars against the hashes in the jar index.
+
+        Jars whose size and mtime still match the jar index are not re-read
+        unless full is True.  A jar without expected hashes is checked against
+        the hashes it had when it was first indexed.
+
+        Returns a list of VerifyResult objects.
+
+        Args:
+            full - Re-read every jar regardless of the jar index.
+        """
+        entries = self.jar_index.load()
+        updated_entries = {}
+        results = []
+        for jar in self.downloaded_versions:
+            jar_path = os.path.join(self.jar_directory, jar.filename)
+            stat = os.stat(jar_path)
+            entry = entries.get(jar.filename)
+
+            if full or entry is None or not JarIndex.is_current(entry, stat):
+                if entry is None:
+                    expected_hashes = {}
+                else:
+                    expected_hashes = (
+                        entry['expected_hashes'] or entry['hashes']
+                    )
+                hashes = get_file_hashes(
+                    jar_path,
+                    set([HASH_ALGORITHM]) | set(expected_hashes),
+                    progress_callback=self._track_progress(VERIFY),
+                )
+                entry = {
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                    'hashes': hashes,
+                    'expected_hashes': expected_hashes,
+                }
+                updated_entries[jar.filename] = entry
+
+            results.append(VerifyResult(jar, _is_valid(entry)))
+
+        if updated_entries:
+            self.jar_index.update(updated_entries)
+        return results
+
     def download_specific_version(self, version):
         """Downloads the specified version.
 
@@ -79,6 +369,21 @@ class JarDownloaderBase(object):
         """
         raise NotImplementedError
 
+    def get_update_version(self):
+        """Implement to return the short version string that update() would
+        download or None if we are already up to date.
+        """
+        raise NotImplementedError
+
+    def set_latest_version(self, version):
+        """Implement to mark the (already downloaded) specified version as the
+        latest downloaded version.  Returns a Jar object of it.
+
+        Args:
+            version - short version string.
+        """
+        raise NotImplementedError
+
     def update(self):
         """Retrieves the latest jar version and returns a Jar object of it only
         if it was a new jar, otherwise this function returns nothing.
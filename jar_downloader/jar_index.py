@@ -0,0 +1,158 @@
+
+import os
+import os.path
+import simplejson
+import threading
+import time
+
+from util.files import atomic_open
+from util.fs_watch import RACY_MTIME_WINDOW
+
+# The index lives in a subdirectory so rewriting it does not change the
+# mtime of the jar directory itself
+INDEX_DIRECTORY = '.jar_index'
+INDEX_FILE = 'index.json'
+
+
+class JarIndex(object):
+    """A JarIndex is a sidecar file inside a jar directory.
+
+    It records the jars found in the directory (so they don't have to be
+    listed and parsed on every access) along with, for each jar, its size and
+    mtime, its hashes and the hashes it is expected to have.  The listing is
+    invalidated whenever the mtime of the directory changes and the size and
+    mtime of each jar let callers skip re-reading jars which have not changed
+    since they were last hashed.
+
+    The index looks like this: {
+        'directory_mtime': 1375794000.0,
+        'listing': [['minecraft_server.1.6.2.jar', '1.6.2']],
+        'jars': {
+            'minecraft_server.1.6.2.jar': {
+                'size': 1234,
+                'mtime': 1375794000.0,
+                'hashes': {'sha256': '...', 'sha1': '...'},
+                'expected_hashes': {'sha1': '...'},
+            },
+        },
+    }
+    """
+
+    def __init__(self, jar_directory):
+        self.jar_directory = jar_directory
+        self._lock = threading.RLock()
+
+    @property
+    def path(self):
+        return os.path.join(self.jar_directory, INDEX_DIRECTORY, INDEX_FILE)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as index_file:
+                index = simplejson.load(index_file)
+        except (IOError, ValueError):
+            # A broken index is no different from a missing one
+            return {}
+        if not isinstance(index, dict):
+            return {}
+        return index
+
+    def _write(self, index):
+        index_directory = os.path.dirname(self.path)
+        if not os.path.exists(index_directory):
+            os.mkdir(index_directory)
+        with atomic_open(self.path, 'w') as index_file:
+            simplejson.dump(index, index_file)
+
+    def load(self):
+        """Returns the jar entries as a dict mapping filename to its entry."""
+        return self._read().get('jars', {})
+
+    def save(self, entries):
+        with self._lock:
+            index = self._read()
+            index['jars'] = entries
+            self._write(index)
+
+    def get_listing(self, list_jars):
+        """Returns the listing of the jar directory, a list of
+        (filename, short_version) pairs.
+
+        The listing is only recomputed (with list_jars) when the jar
+        directory has changed since it was last stored.  Entries of jars which
+        are no longer listed are dropped at that point.
+
+        Args:
+            list_jars - Callable returning the listing of the jar directory
+        """
+        with self._lock:
+            # Stat first (and make sure the index directory exists so creating
+            # it later doesn't invalidate the listing we are about to store)
+            index_directory = os.path.dirname(self.path)
+            if not os.path.exists(index_directory):
+                os.mkdir(index_directory)
+            directory_mtime = os.stat(self.jar_directory).st_mtime
+
+            index = self._read()
+            if (
+                index.get('directory_mtime') == directory_mtime and
+                'listing' in index
+            ):
+                return [tuple(jar) for jar in index['listing']]
+
+            listing = [tuple(jar) for jar in list_jars()]
+            filenames = set(filename for filename, _ in listing)
+            if time.time() - directory_mtime < RACY_MTIME_WINDOW:
+                # Store the listing but don't trust it next time
+                directory_mtime = None
+            index['directory_mtime'] = directory_mtime
+            index['listing'] = listing
+            index['jars'] = dict(
+                (filename, entry)
+                for filename, entry in index.get('jars', {}).iteritems()
+                if filename in filenames
+            )
+            self._write(index)
+            return listing
+
+    @classmethod
+    def is_current(cls, entry, stat):
+        """Returns whether the entry still describes a file with the given
+        stat result.
+        """
+        return (
+            entry.get('size') == stat.st_size and
+            entry.get('mtime') == stat.st_mtime
+        )
+
+    def record(self, filename, hashes, expected_hashes=None):
+        """Records the hashes of the jar (and its current size and mtime).
+
+        Args:
+            filename - Filename of the jar inside the jar directory
+            hashes - dict mapping algorithm name to hex digest of the jar
+            expected_hashes - dict mapping algorithm name to the hex digest
+                the jar is expected to have
+        """
+        stat = os.stat(os.path.join(self.jar_directory, filename))
+        self.update({
+            filename: {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'hashes': hashes,
+                'expected_hashes': expected_hashes or {},
+            },
+        })
+
+    def update(self, entries_to_update):
+        """Merges entries into the index.
+
+        Args:
+            entries_to_update - dict mapping filename to entry
+        """
+        with self._lock:
+            entries = self.load()
+            entries.update(entries_to_update)
+            self.save(entries)
@@ -0,0 +1,200 @@
+
+import fcntl
+import os
+import os.path
+import simplejson
+import tempfile
+import threading
+
+import config.application
+from util.files import atomic_open
+from util.files import copy_in_chunks
+from util.files import hash_file
+
+HASH_ALGORITHM = 'sha256'
+URL_INDEX_FILE = 'urls.json'
+
+# ioctl request for cloning a file's extents (btrfs, xfs) from linux/fs.h
+FICLONE = 0x40049409
+
+
+def _reflink(source_path, destination_path):
+    """Makes destination_path a copy-on-write clone of source_path.
+
+    Raises IOError if the filesystem does not support it.
+    """
+    with open(source_path, 'rb') as source_file:
+        with open(destination_path, 'wb') as destination_file:
+            fcntl.ioctl(
+                destination_file.fileno(), FICLONE, source_file.fileno(),
+            )
+
+def _copy(source_path, destination_path):
+    with open(source_path, 'rb') as source_file:
+        with open(destination_path, 'wb') as destination_file:
+            copy_in_chunks(source_file, destination_file)
+            destination_file.flush()
+            os.fsync(destination_file.fileno())
+
+def _materialize_at(source_path, destination_path):
+    """Puts source_path at destination_path as a hardlink, falling back to a
+    reflink and then to a plain copy.
+    """
+    try:
+        os.link(source_path, destination_path)
+        return
+    except OSError:
+        # Cross device, too many links, or not supported by the filesystem
+        pass
+
+    try:
+        _reflink(source_path, destination_path)
+        return
+    except IOError:
+        if os.path.exists(destination_path):
+            os.remove(destination_path)
+
+    _copy(source_path, destination_path)
+
+def _same_file(path_a, path_b):
+    try:
+        return os.path.samefile(path_a, path_b)
+    except OSError:
+        return False
+
+
+class JarStore(object):
+    """A JarStore is a content-addressed store of jar files.
+
+    Each unique jar is stored once under JAR_STORE_PATH keyed by its sha256.
+    Jars inside of jar directories are hardlinks to (or if that is not
+    possible, clones or copies of) the stored blob so disk usage scales with
+    the number of unique jars instead of with the number of jar directories.
+
+    The store also remembers which url each blob was downloaded from so
+    identical downloads can be satisfied without hitting the network.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    @property
+    def path(self):
+        return config.application.JAR_STORE_PATH
+
+    @property
+    def _url_index_path(self):
+        return os.path.join(self.path, URL_INDEX_FILE)
+
+    def get_blob_path(self, digest):
+        return os.path.join(self.path, HASH_ALGORITHM, digest[:2], digest)
+
+    def has_blob(self, digest):
+        return os.path.exists(self.get_blob_path(digest))
+
+    def _read_url_index(self):
+        if not os.path.exists(self._url_index_path):
+            return {}
+        try:
+            with open(self._url_index_path, 'r') as url_index_file:
+                return simplejson.load(url_index_file)
+        except (IOError, ValueError):
+            return {}
+
+    def _write_url_index(self, url_index):
+        with atomic_open(self._url_index_path, 'w') as url_index_file:
+            simplejson.dump(url_index, url_index_file)
+
+    def get_digest_for_url(self, url):
+        """Returns the digest of the blob downloaded from url or None if there
+        is no such blob.
+        """
+        with self._lock:
+            digest = self._read_url_index().get(url)
+        if digest is not None and self.has_blob(digest):
+            return digest
+        return None
+
+    def add(self, path, url=None, digest=None):
+        """Adds the file at path to the store and replaces path with a link to
+        the stored blob.  Returns the digest of the file.
+
+        Args:
+            path - Path of the file to store.
+            url - Optional url the file was downloaded from.
+            digest - Optional precomputed sha256 of the file.
+        """
+        if digest is None:
+            digest = hash_file(path, algorithm=HASH_ALGORITHM)
+        blob_path = self.get_blob_path(digest)
+
+        with self._lock:
+            if not os.path.exists(blob_path):
+                blob_directory = os.path.dirname(blob_path)
+                if not os.path.exists(blob_directory):
+                    os.makedirs(blob_directory)
+                self._place(path, blob_path)
+
+            if not _same_file(path, blob_path):
+                self._place(blob_path, path)
+
+            if url is not None:
+                url_index = self._read_url_index()
+                if url_index.get(url) != digest:
+                    url_index[url] = digest
+                    self._write_url_index(url_index)
+
+        return digest
+
+    def materialize(self, digest, destination_path):
+        """Places the blob identified by digest at destination_path."""
+        self._place(self.get_blob_path(digest), destination_path)
+
+    def _place(self, source_path, destination_path):
+        """Atomically places source_path at destination_path."""
+        directory, filename = os.path.split(destination_path)
+        fd, temp_path = tempfile.mkstemp(
+            prefix='.{0}.'.format(filename), suffix='.tmp', dir=directory,
+        )
+        os.close(fd)
+        os.remove(temp_path)
+        try:
+            _materialize_at(source_path, temp_path)
+            os.rename(temp_path, destination_path)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def collect_garbage(self):
+        """Removes blobs which are no longer linked from any jar directory.
+        Returns the digests of the removed blobs.
+
+        Note: blobs which were copied (instead of linked) into jar directories
+        look unreferenced and are removed as well, which is harmless since the
+        copies are independent.
+        """
+        removed = []
+        with self._lock:
+            blobs_root = os.path.join(self.path, HASH_ALGORITHM)
+            if not os.path.exists(blobs_root):
+                return removed
+
+            for root, _, filenames in os.walk(blobs_root):
+                for filename in filenames:
+                    blob_path = os.path.join(root, filename)
+                    if os.stat(blob_path).st_nlink == 1:
+                        os.remove(blob_path)
+                        removed.append(filename)
+
+            removed_set = set(removed)
+            url_index = self._read_url_index()
+            if any(digest in removed_set for digest in url_index.values()):
+                self._write_url_index(dict(
+                    (url, digest) for url, digest in url_index.iteritems()
+                    if digest not in removed_set
+                ))
+
+        return removed
+
+jar_store = JarStore()
@@ -0,0 +1,187 @@
+
+import os
+import os.path
+import simplejson
+import threading
+import time
+import urllib2
+
+import config.application
+from util.files import atomic_open
+
+DEFAULT_TIMEOUT = 30
+
+NOT_MODIFIED = 304
+
+
+class ManifestCache(object):
+    """A ManifestCache caches a json document served from a remote endpoint.
+
+    The document is kept both in process and on disk (under CACHE_PATH).  While
+    it is younger than the ttl it is returned without touching the network.
+    After that it is revalidated with a conditional GET (If-None-Match /
+    If-Modified-Since) so an unchanged document is never downloaded twice.
+
+    Callers which prefer a fast answer over a fresh one can use
+    get(allow_stale=True) to get an expired document immediately while it is
+    revalidated in the background.
+    """
+
+    def __init__(self, url, cache_filename, ttl=None, timeout=DEFAULT_TIMEOUT):
+        """Initialize the ManifestCache.
+
+        Args:
+            url - Url of the remote json document.
+            cache_filename - Name of the file inside CACHE_PATH used to persist
+                the document.
+            ttl - Number of seconds before the document is revalidated
+                (defaults to MANIFEST_CACHE_TTL).
+            timeout - Timeout in seconds for requests to the remote endpoint.
+        """
+        self.url = url
+        self.cache_filename = cache_filename
+        self._ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # Maps cache path to cache entry.  Keyed by path so the in-process
+        # cache follows CACHE_PATH if it changes.
+        self._entries = {}
+        self._revalidation_thread = None
+        # Time of the last failed background revalidation
+        self._failed_at = None
+
+    @property
+    def ttl(self):
+        if self._ttl is None:
+            return config.application.MANIFEST_CACHE_TTL
+        return self._ttl
+
+    @property
+    def cache_path(self):
+        return os.path.join(
+            config.application.CACHE_PATH, self.cache_filename,
+        )
+
+    def _read_entry(self):
+        """Returns the cache entry from the in-process cache, falling back to
+        the on-disk cache.  Returns None if neither has it.
+        """
+        cache_path = self.cache_path
+        if cache_path in self._entries:
+            return self._entries[cache_path]
+
+        if not os.path.exists(cache_path):
+            return None
+
+        try:
+            with open(cache_path, 'r') as cache_file:
+                entry = simplejson.load(cache_file)
+        except (IOError, ValueError):
+            # A broken cache file is no different than a missing one
+            return None
+
+        self._entries[cache_path] = entry
+        return entry
+
+    def _write_entry(self, entry):
+        cache_path = self.cache_path
+        self._entries[cache_path] = entry
+
+        cache_directory = os.path.dirname(cache_path)
+        if not os.path.exists(cache_directory):
+            os.makedirs(cache_directory)
+        with atomic_open(cache_path, 'w') as cache_file:
+            simplejson.dump(entry, cache_file)
+
+    def _is_fresh(self, entry):
+        return time.time() - entry['fetched_at'] < self.ttl
+
+    def _fetch(self, entry):
+        """Performs a (conditional if we have an entry) request of the
+        document and returns the new cache entry.
+        """
+        request = urllib2.Request(self.url)
+        if entry is not None:
+            if entry.get('etag'):
+                request.add_header('If-None-Match', entry['etag'])
+            if entry.get('last_modified'):
+                request.add_header('If-Modified-Since', entry['last_modified'])
+
+        try:
+            response = urllib2.urlopen(request, timeout=self.timeout)
+        except urllib2.HTTPError as e:
+            if e.code != NOT_MODIFIED or entry is None:
+                raise
+            return dict(entry, fetched_at=time.time())
+
+        headers = response.info()
+        return {
+            'data': simplejson.loads(response.read()),
+            'etag': headers.getheader('ETag'),
+            'last_modified': headers.getheader('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+
+    def get(self, allow_stale=False):
+        """Returns the json document, revalidating it if it has expired.
+
+        Note: this is potentially slow and/or flaky when the document has
+        expired because it hits an external endpoint.
+
+        Args:
+            allow_stale - Return an expired document immediately and
+                revalidate it in the background instead.  The document is
+                still fetched synchronously if there is none at all.
+        """
+        with self._lock:
+            entry = self._read_entry()
+            if entry is not None and self._is_fresh(entry):
+                return entry['data']
+            if entry is not None and allow_stale:
+                self._start_revalidation()
+                return entry['data']
+
+            entry = self._fetch(entry)
+            self._write_entry(entry)
+            return entry['data']
+
+    def _start_revalidation(self):
+        """Starts revalidating in the background unless that is already
+        happening or recently failed.  Must be called with the lock held.
+        """
+        if (
+            self._revalidation_thread is not None and
+            self._revalidation_thread.is_alive()
+        ):
+            return
+        if (
+            self._failed_at is not None and
+            time.time() - self._failed_at < self.ttl
+        ):
+            return
+
+        self._revalidation_thread = threading.Thread(target=self._revalidate)
+        self._revalidation_thread.daemon = True
+        self._revalidation_thread.start()
+
+    def _revalidate(self):
+        try:
+            with self._lock:
+                entry = self._read_entry()
+            # Don't hold the lock during the request so readers aren't blocked
+            new_entry = self._fetch(entry)
+            with self._lock:
+                self._write_entry(new_entry)
+                self._failed_at = None
+        except Exception:
+            # The stale document keeps being served, try again after a while
+            with self._lock:
+                self._failed_at = time.time()
+
+    def invalidate(self):
+        """Drops the cached document so the next get() refetches it."""
+        with self._lock:
+            cache_path = self.cache_path
+            self._entries.pop(cache_path, None)
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
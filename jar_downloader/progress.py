@@ -0,0 +1,78 @@
+
+import collections
+import time
+
+# Stages a jar downloader reports progress for
+DOWNLOAD = 'download'
+VERIFY = 'verify'
+
+# Minimum number of seconds between two progress events of a stage
+MIN_INTERVAL = 0.1
+
+
+class ProgressEvent(collections.namedtuple(
+    'ProgressEvent',
+    ['stage', 'bytes_transferred', 'total_bytes', 'rate', 'eta'],
+)):
+    """A ProgressEvent describes how far along a jar downloader is.
+
+    Properties:
+        stage - What is being done (DOWNLOAD, VERIFY)
+        bytes_transferred - Bytes downloaded (or hashed) so far
+        total_bytes - Total number of bytes or None if unknown
+        rate - Bytes per second or None if unknown
+        eta - Seconds until the stage completes or None if unknown
+    """
+    __slots__ = ()
+
+
+class ProgressTracker(object):
+    """Turns (bytes_transferred, total_bytes) callbacks into ProgressEvents
+    with a rate and an ETA.  Events are emitted at most every MIN_INTERVAL
+    seconds, except for the one completing the stage.
+    """
+
+    def __init__(self, stage, emit, min_interval=MIN_INTERVAL):
+        """Initialize a ProgressTracker.
+
+        Args:
+            stage - Stage the events are for
+            emit - Function called with each ProgressEvent
+            min_interval - Minimum number of seconds between events
+        """
+        self.stage = stage
+        self.emit = emit
+        self.min_interval = min_interval
+        self._started_at = None
+        self._start_bytes = None
+        self._last_emitted_at = None
+
+    def __call__(self, bytes_transferred, total_bytes=None):
+        now = time.time()
+        if self._started_at is None:
+            # A resumed download starts with the bytes it already had, they
+            # don't count towards the rate
+            self._started_at = now
+            self._start_bytes = bytes_transferred
+
+        complete = total_bytes is not None and bytes_transferred >= total_bytes
+        if (
+            not complete and
+            self._last_emitted_at is not None and
+            now - self._last_emitted_at < self.min_interval
+        ):
+            return
+        self._last_emitted_at = now
+
+        rate = None
+        elapsed = now - self._started_at
+        if elapsed > 0:
+            rate = (bytes_transferred - self._start_bytes) / elapsed
+
+        eta = None
+        if total_bytes is not None and rate:
+            eta = max(total_bytes - bytes_transferred, 0) / rate
+
+        self.emit(ProgressEvent(
+            self.stage, bytes_transferred, total_bytes, rate, eta,
+        ))
@@ -3,22 +3,35 @@ import fnmatch
 import re
 import os
 import os.path
-import simplejson
 import urllib2
 
 from jar_downloader.jar_downloader_base import Jar
 from jar_downloader.jar_downloader_base import JarDownloaderBase
+from jar_downloader.manifest_cache import ManifestCache
+from util.decorators import memoize
+from util.dicts import get_deep
 from util.natural_sort import natural_sort
 
 VERSIONS_ENDPOINT = 'https://s3.amazonaws.com/Minecraft.Download/versions/versions.json'
 DOWNLOAD_PATH = 'https://s3.amazonaws.com/Minecraft.Download/versions/{version}/minecraft_server.{version}.jar'
+VERSION_JSON_PATH = 'https://s3.amazonaws.com/Minecraft.Download/versions/{version}/{version}.json'
 
 VERSION_REGEX = re.compile('minecraft_server.(.+).jar')
 JAR_MATCH = 'minecraft_server.*.jar'
 JAR_FILENAME = 'minecraft_server.%s.jar'
 
+DOWNLOAD_TIMEOUT = 60
+
 LATEST_FILE = 'latest.txt'
 
+VERSIONS_CACHE_FILE = 'vanilla_versions.json'
+VERSION_CACHE_FILE = 'vanilla_version_{version}.json'
+
+# A released version's json practically never changes
+VERSION_JSON_TTL = 24 * 60 * 60
+
+NOT_FOUND = 404
+
 RELEASE = 'release'
 SNAPSHOT = 'snapshot'
 
@@ -26,17 +39,40 @@ SNAPSHOT = 'snapshot'
 class InvalidVersionFileError(ValueError): pass
 
 
-def get_versions_json():
+versions_manifest = ManifestCache(VERSIONS_ENDPOINT, VERSIONS_CACHE_FILE)
+
+def get_versions_json(allow_stale=False):
     """Returns the versions json for vanilla minecraft.
 
-    Note: this is potentially slow and/or flaky because it hits an external
-    endpoint
+    The json is shared through versions_manifest so repeated calls cost at
+    most one conditional request per MANIFEST_CACHE_TTL.
+
+    Note: this is potentially slow and/or flaky when the cached json has
+    expired because it hits an external endpoint (unless allow_stale is
+    passed, see ManifestCache.get)
+    """
+    return versions_manifest.get(allow_stale=allow_stale)
+
+@memoize
+def get_version_manifest(version):
+    """Returns the ManifestCache of a single version's json.  Like
+    versions_manifest there is one per process so its in-process cache is
+    shared by every caller.
     """
-    return simplejson.loads(
-        # TODO: add a reasonable timeout here
-        urllib2.urlopen(VERSIONS_ENDPOINT).read()
+    return ManifestCache(
+        VERSION_JSON_PATH.format(version=version),
+        VERSION_CACHE_FILE.format(version=version),
+        ttl=VERSION_JSON_TTL,
     )
 
+def get_version_json(version):
+    """Returns the json describing a single version of vanilla minecraft.
+
+    Note: this is potentially slow and/or flaky when the cached json has
+    expired because it hits an external endpoint
+    """
+    return get_version_manifest(version).get()
+
 
 class VanillaJarDownloader(JarDownloaderBase):
     """The vanilla jar downloader downloads the vanilla version of
@@ -76,8 +112,7 @@ class VanillaJarDownloader(JarDownloaderBase):
             'required': ['jar_type'],
         }
 
-    @property
-    def downloaded_versions(self):
+    def _list_jars(self):
         """Lists all of the files in the directory and returns Jar objects of
         them.
         """
@@ -88,6 +123,17 @@ class VanillaJarDownloader(JarDownloaderBase):
         sorted_filenames = natural_sort(filenames)
         return [self._to_jar(filename) for filename in sorted_filenames]
 
+    @property
+    def downloaded_versions(self):
+        """Returns Jar objects of the downloaded jars.
+
+        The listing is kept in the jar index and only recomputed when the jar
+        directory changes.
+        """
+        return [
+            Jar(*jar) for jar in self.jar_index.get_listing(self._list_jars)
+        ]
+
     def _try_to_get_latest_version(self):
         """Attempts to get the latest version from the LATEST_FILE.
 
@@ -126,7 +172,10 @@ class VanillaJarDownloader(JarDownloaderBase):
         Note: this is potentially expensive and flaky because it hits an
         external endpoint.
         """
-        versions_json = get_versions_json()
+        return self.get_available_versions()
+
+    def get_available_versions(self, allow_stale=False):
+        versions_json = get_versions_json(allow_stale=allow_stale)
 
         version_dict_filter_types = set([RELEASE])
         if self.config['jar_type'] == SNAPSHOT:
@@ -138,6 +187,32 @@ class VanillaJarDownloader(JarDownloaderBase):
             if version_dict['type'] in version_dict_filter_types
         ])
 
+    def get_jar_path(self, version):
+        return os.path.join(self.jar_directory, JAR_FILENAME % version)
+
+    def get_download_url(self, version):
+        return DOWNLOAD_PATH.format(version=version)
+
+    def get_expected_hashes(self, version):
+        """Returns the sha1 of the server jar from the version's json.
+
+        Older versions do not publish one (or have no version json at all), in
+        which case the jar can't be checked and an empty dict is returned.
+        Any other failure to get the version json is raised so the jar isn't
+        downloaded unchecked.
+        """
+        try:
+            version_json = get_version_json(version)
+        except urllib2.HTTPError as e:
+            if e.code != NOT_FOUND:
+                raise
+            return {}
+
+        sha1 = get_deep(version_json, 'downloads.server.sha1')
+        if sha1 is None:
+            return {}
+        return {'sha1': sha1}
+
     def download_specific_version(self, version):
         """Downloads a specific version of minecraft_server.jar
 
@@ -150,37 +225,49 @@ class VanillaJarDownloader(JarDownloaderBase):
         if not version in self.available_versions:
             raise AssertionError('Not a valid version number.')
 
-        jar_filename = os.path.join(self.jar_directory, JAR_FILENAME % version)
-        # Do this before opening the file in case of an error (so we don't
-        # create an empty file)
-        jar_contents = urllib2.urlopen(
-            DOWNLOAD_PATH.format(version=version),
-        ).read()
-        with open(jar_filename, 'wb') as jar_file:
-            jar_file.write(jar_contents)
+        # The jar is streamed into a .part file which is only renamed into
+        # place once complete so a failed download never leaves a truncated
+        # jar behind.  A failed download is resumed on the next attempt and
+        # a jar which doesn't match the published hash is rejected.
+        self.download_jar(
+            self.get_download_url(version),
+            self.get_jar_path(version),
+            timeout=DOWNLOAD_TIMEOUT,
+            expected_hashes=self.get_expected_hashes(version),
+        )
 
     def _get_latest_version(self):
         versions_json = get_versions_json()
         return versions_json['latest'][self.config['jar_type']]
 
-    def update(self):
-        """Downloads the latest version if we haven't already downloaded it."""
+    def get_update_version(self):
+        """Returns the latest version if we haven't already downloaded it."""
         latest_version = self._get_latest_version()
 
         # Try and see what the current downloaded version is
         # This may fail, this is ok
         current_latest_version = None
         try:
-           current_latest_version = self.latest_downloaded_version
+           current_latest_version = self.latest_downloaded_version.short_version
         except InvalidVersionFileError: pass
 
+        if latest_version != current_latest_version:
+            return latest_version
+
+    def set_latest_version(self, version):
+        """Writes version to our version file and returns its Jar object."""
+        latest_jar_filename = JAR_FILENAME % version
+        with open(self._latest_filename, 'w') as latest_file:
+            latest_file.write(latest_jar_filename)
+        return self._to_jar(latest_jar_filename)
+
+    def update(self):
+        """Downloads the latest version if we haven't already downloaded it."""
+        latest_version = self.get_update_version()
+
         # If the latest version is in fact new download it and write to our
         # version file
         # Return the new version number to indicate it was updated
-        if latest_version != current_latest_version:
+        if latest_version is not None:
             self.download_specific_version(latest_version)
-            latest_jar_filename = JAR_FILENAME % latest_version
-            with open(self._latest_filename, 'w') as latest_file:
-                latest_file.write(latest_jar_filename)
-            return self._to_jar(latest_jar_filename)
-
+            return self.set_latest_version(latest_version)
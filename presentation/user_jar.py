@@ -1,19 +1,67 @@
-
-import collections
 import flask
 
-class UserJar(collections.namedtuple(
-    'UserJar',
-    [
-        'jar_type',
-        'name',
-        'jar_directory',
-        'available_versions',
-        'downloaded_versions',
-        'latest_downloaded_version',
-    ],
-)):
-    __slots__ = ()
+from util.decorators import cached_property
+
+NO_JARS_DOWNLOADED = 'No Jars Downloaded!'
+
+class UserJar(object):
+    """Presents a user jar.  Fields are computed from the jar downloader
+    instance when first used and cached so rendering doesn't touch the disk or
+    network more than once per field.
+    """
+
+    def __init__(self, jar_type, name, instance):
+        """Initialize the presenter.
+
+        Args:
+            jar_type - The type of the jar (name of the JarDownloader class)
+            name - Name given by the user for the jar
+            instance - JarDownloader instance of the jar
+        """
+        self.jar_type = jar_type
+        self.name = name
+        self.instance = instance
+
+    @property
+    def jar_directory(self):
+        return self.instance.jar_directory
+
+    @cached_property
+    def _available_versions_or_error(self):
+        try:
+            return self.instance.get_available_versions(allow_stale=True), None
+        except Exception as e:
+            return [], e
+
+    @property
+    def available_versions(self):
+        """The available versions, possibly slightly out of date.  Empty if
+        they can't be retrieved (see available_versions_error).
+        """
+        return self._available_versions_or_error[0]
+
+    @property
+    def available_versions_error(self):
+        """The error retrieving available_versions or None."""
+        return self._available_versions_or_error[1]
+
+    @cached_property
+    def downloaded_versions(self):
+        return self.instance.downloaded_versions
+
+    @cached_property
+    def downloaded_short_versions(self):
+        # A set of the downloaded versions so has_version is constant time
+        return frozenset(jar.short_version for jar in self.downloaded_versions)
+
+    @cached_property
+    def latest_downloaded_version(self):
+        # If there is no downloaded version we raise here
+        try:
+            return self.instance.latest_downloaded_version
+        # TODO: this is not a very specific exception type
+        except Exception:
+            return NO_JARS_DOWNLOADED
 
     @property
     def update_url(self):
@@ -32,25 +80,8 @@ class UserJar(collections.namedtuple(
         )
 
     def has_version(self, version):
-        return any(
-            jar.short_version == version
-            for jar in self.downloaded_versions
-        )
+        return version in self.downloaded_short_versions
 
     @classmethod
     def from_user_jar(cls, instance, jar_type, name):
-        # If there is no downloaded version we raise here
-        try:
-            latest_downloaded_version = instance.latest_downloaded_version
-        # TODO: this is not a very specific exception type
-        except Exception:
-            latest_downloaded_version = 'No Jars Downloaded!'
-
-        return cls(
-            jar_type,
-            name,
-            instance.jar_directory,
-            instance.available_versions,
-            instance.downloaded_versions,
-            latest_downloaded_version,
-        )
+        return cls(jar_type, name, instance)
@@ -1,4 +1,5 @@
 
+from schemaform.helpers import html_to_pq
 from schemaform.helpers import validate_default_value
 from schemaform.helpers import validate_enum_values
 from util.iter import truthy
@@ -42,5 +43,10 @@ class BaseProperty(object):
         else:
             return unicode(value)
 
-    def __pq__(self):
+    def __html__(self):
+        """Returns the html (markupsafe.Markup) representing this object."""
         raise NotImplementedError
+
+    def __pq__(self):
+        """Returns the pyquery object representing this object."""
+        return html_to_pq(self.__html__())
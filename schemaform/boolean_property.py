@@ -1,6 +1,6 @@
 
 from schemaform.base_property import BaseProperty
-from schemaform.helpers import el
+from schemaform.helpers import html_el
 from schemaform.helpers import get_type_from_schema
 from schemaform.types import Types
 
@@ -29,8 +29,8 @@ class BooleanProperty(BaseProperty):
         if get_type_from_schema(self.property_dict) != Types.BOOLEAN:
             raise ValueError('Unexpected schema for boolean property.')
 
-    def __pq__(self):
-        """Returns the pyquery object representing this object."""
+    def __html__(self):
+        """Returns the html representing this object."""
         label_text = self.get_label_text()
         input_name = self.get_input_name()
         input_id = 'id_' + input_name
@@ -43,6 +43,6 @@ class BooleanProperty(BaseProperty):
         if self.property_dict.get('default', False):
             input_attrs['checked'] = 'checked'
 
-        input_element = el('input', **input_attrs)
-        label_element = el('label', text=label_text, **{'for': input_id})
+        input_element = html_el('input', **input_attrs)
+        label_element = html_el('label', text=label_text, **{'for': input_id})
         return input_element + label_element
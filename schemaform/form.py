@@ -1,16 +1,13 @@
 
-import jsonschema.validators
-
 from util.decorators import cached_property
-from util.dicts import set_deep
 from schemaform.boolean_property import BooleanProperty
 from schemaform.error_adapter import ErrorAdapter
 from schemaform.radio_enum_property import RadioEnumProperty
-from schemaform.helpers import flatten_schema
-from schemaform.helpers import get_type_from_schema
-from schemaform.helpers import el
-from schemaform.helpers import transform_value
+from schemaform.helpers import html_el
+from schemaform.helpers import html_to_pq
+from schemaform.helpers import get_validator
 from schemaform.helpers import validate_schema_against_draft4
+from schemaform.load_plan import LoadPlan
 from schemaform.object_property import ObjectProperty
 from schemaform.single_input_property import SingleInputProperty
 from schemaform.types import Types
@@ -44,8 +41,8 @@ class Form(object):
         }
 
     @cached_property
-    def _flattened_schema(self):
-        return flatten_schema(self.schema)
+    def _load_plan(self):
+        return LoadPlan.from_schema(self.schema)
 
     def _load_data_from_form(self, form):
         """For each value in our schema, we attempt to set it into values.
@@ -53,22 +50,7 @@ class Form(object):
         Args:
             form - Dictlike
         """
-        values = {}
-        # For each value in our schema we'll attempt to set values
-        for schema_path, schema in self._flattened_schema.iteritems():
-            submitted_value = form.get(schema_path)
-            # Fixes booleans, because when they are unchecked they do not send
-            # a value
-            if get_type_from_schema(schema) == Types.BOOLEAN:
-                submitted_value = bool(submitted_value)
-
-            if submitted_value is None:
-                continue
-
-            new_value = transform_value(submitted_value, schema)
-            set_deep(values, schema_path, new_value)
-
-        return values
+        return self._load_plan.load(form)
 
     def _validate(self, values):
         """Validates the values.  Returns a dictionary containing dotted path
@@ -78,7 +60,7 @@ class Form(object):
             values - dict of values (usually returned from _load_data_from_form
         """
         errors = {}
-        validator = jsonschema.validators.Draft4Validator(self.schema)
+        validator = get_validator(self.schema)
         for error in validator.iter_errors(values):
             error = ErrorAdapter.from_validation_error(error)
             errors[error.dotted_path] = error.message
@@ -106,13 +88,27 @@ class Form(object):
         errors = self._validate(values)
         return values, errors
 
-    def __pq__(self):
-        """Returns the pyquery representation of this object."""
+    def render(self, before=(), after=()):
+        """Returns the html (markupsafe.Markup) of the form.
+
+        Args:
+            before - html (see combine_html) placed in the form before the
+                properties
+            after - html placed in the form after the properties
+        """
         contents = self.get_property_type_cls_map()[Types.OBJECT](
             '',
             '',
             self.schema,
             self.get_property_type_cls_map()
-        ).__pq__()
-        return contents.wrapAll(el('form', **self.form_attrs).__html__())
+        )
+        return html_el('form', before, contents, after, **self.form_attrs)
+
+    def __html__(self):
+        """Returns the html representation of this object."""
+        return self.render()
+
+    def __pq__(self):
+        """Returns the pyquery representation of this object."""
+        return html_to_pq(self.__html__())
 
@@ -1,52 +1,105 @@
 
 import collections
-import itertools
+import markupsafe
 import pyquery
 import jsonschema
 import jsonschema._utils
+import jsonschema.validators
+import simplejson
+import threading
 
 from schemaform.types import Types
 from util.iter import flatten
-from util.iter import truthy
 
-def el(element_name, **attrs):
-    """Constructs a pyquery element.
+# Elements which don't have a closing tag
+VOID_ELEMENTS = frozenset(['input'])
+
+def html_el(element_name, *contents, **attrs):
+    """Returns the html for an element as markupsafe.Markup.  The string is
+    built directly instead of being parsed.
 
     Args:
         element_name - element name such as div
-        text - kwarg only.  Text for element
+        *contents - Children of the element.  Strings are escaped, Markup and
+            objects which implement __html__ are not.
+        text - kwarg only.  Text for element (before the contents)
         classname - kwarg only.  Class to set on element
         **attrs - attributes to set
     """
     text = attrs.pop('text', '')
     classname = attrs.pop('classname', '')
-
-    element = pyquery.PyQuery('<%s>' % element_name)
-    if text:
-        element.text(text)
     if classname:
-        element.attr('class', classname)
-    if attrs:
-        element.attr(**attrs)
-    return element
+        attrs['class'] = classname
+
+    parts = ['<', element_name]
+    # Sorted so the output doesn't depend on dict ordering
+    for attr, value in sorted(attrs.iteritems()):
+        parts.extend([' ', attr, '="', markupsafe.escape(value), '"'])
+    parts.append('>')
+
+    if element_name in VOID_ELEMENTS:
+        assert not text and not contents
+    else:
+        parts.append(markupsafe.escape(text))
+        parts.append(combine_html(contents))
+        parts.extend(['</', element_name, '>'])
+    return markupsafe.Markup(''.join(parts))
+
+def html_to_pq(html):
+    """Adapts html (for example from __html__) to a pyquery object."""
+    return pyquery.PyQuery(unicode(html), parser='html_fragments')
 
 draft4_schema = jsonschema._utils.load_schema('draft4')
 
+def get_schema_fingerprint(schema):
+    """Returns a string which is equal for equal schemas."""
+    return simplejson.dumps(schema, sort_keys=True)
+
+# Maps schema fingerprints to validators.  Schemas come from code (not from
+# users) so this stays small.
+_validators = {}
+# Fingerprints of schemas which are known to be valid draft4 schemas
+_valid_draft4_fingerprints = set()
+_lock = threading.Lock()
+
+def get_validator(schema):
+    """Returns a jsonschema validator for the schema.  The schema is checked
+    (raising jsonschema.SchemaError) and compiled once for equal schemas.
+    """
+    fingerprint = get_schema_fingerprint(schema)
+    validator = _validators.get(fingerprint)
+    if validator is None:
+        validator_cls = jsonschema.validators.validator_for(
+            schema, default=jsonschema.Draft4Validator,
+        )
+        validator_cls.check_schema(schema)
+        # The validator gets its own copy so later changes to schema can't
+        # change what is cached under its fingerprint
+        validator = validator_cls(simplejson.loads(fingerprint))
+        with _lock:
+            validator = _validators.setdefault(fingerprint, validator)
+    return validator
+
 def validate_schema_against_draft4(schema):
-    jsonschema.validate(schema, draft4_schema)
+    fingerprint = get_schema_fingerprint(schema)
+    if fingerprint not in _valid_draft4_fingerprints:
+        get_validator(draft4_schema).validate(schema)
+        with _lock:
+            _valid_draft4_fingerprints.add(fingerprint)
 
 NO_VALUE = object()
 
 def validate_default_value(schema):
     """Validates that the default value conforms to itself."""
     if schema.get('default', NO_VALUE) is not NO_VALUE:
-        jsonschema.validate(schema['default'], schema)
+        get_validator(schema).validate(schema['default'])
 
 def validate_enum_values(schema):
     """Validates the possible values in the enum conform to itself."""
     if 'enum' in schema:
+        validator = get_validator(schema)
         for value in schema['enum']:
-            jsonschema.validate(value, schema)
+            validator.validate(value)
 
 def get_type_from_schema(schema):
     """Returns the type from the schema."""
@@ -63,12 +116,12 @@ def get_value_type_from_schema(schema):
     """
     return schema.get('type', Types.STRING)
 
-def combine_pqables(*args, **kwargs):
-    """Combines pyquery object or objects which implement __pq__ into a single
-    pyquery object.
+def combine_html(*args, **kwargs):
+    """Combines strings (which are escaped), Markup or objects which
+    implement __html__ into a single markupsafe.Markup.
 
     Args:
-        *args - Positional arguments will be converted flattened
+        *args - Positional arguments will be flattened
         acceptable_iterable_type - Optional list of additionally allowable
             iterable types (for example: to exclude a specific namedtuple)
     """
@@ -77,61 +130,51 @@ def combine_pqables(*args, **kwargs):
     )
     # Don't expect any other kwargs
     assert not kwargs
-    # needs to be a tuple because this is passed to isinstance
     acceptable_iterable_type = tuple(
-        [pyquery.PyQuery] + (
-            # This allows both type and iterable of type to be passed in
+        [basestring] + (
             list(additional_acceptable_iterable_type)
             if isinstance(additional_acceptable_iterable_type, collections.Iterable)
             else [additional_acceptable_iterable_type]
         )
     )
-
-    to_pyquery = (
-        obj if isinstance(obj, pyquery.PyQuery) else obj.__pq__()
-        for obj in flatten(
-            args,
-            acceptable_iterable_type=acceptable_iterable_type,
-        )
+    return markupsafe.Markup('').join(
+        flatten(args, acceptable_iterable_type=acceptable_iterable_type)
     )
-    return pyquery.PyQuery(list(itertools.chain(*to_pyquery)))
 
 def transform_value_noop(value):
     return value
 
-TRANSFORM_FUNCTIONS = {
-    Types.OBJECT: transform_value_noop,
-    Types.STRING: transform_value_noop,
-    Types.INTEGER: int,
-    Types.NUMBER: float,
-    Types.BOOLEAN: bool,
+# Submitted values of booleans (a checked checkbox submits 'on')
+BOOLEAN_VALUES = {
+    'true': True,
+    '1': True,
+    'on': True,
+    'false': False,
+    '0': False,
 }
 
-def transform_value(value, schema):
-    value_type = get_value_type_from_schema(schema)
+def transform_boolean(value):
+    """Converts a submitted boolean.  Unchecked checkboxes are not submitted
+    so a missing value (None) is False.
 
-    # In the error case we just return the value -- A validator will invalidate
-    # this value regardless
-    try:
-        return TRANSFORM_FUNCTIONS[value_type](value)
-    except ValueError:
+    Raises ValueError if the value is not a boolean.
+    """
+    if value is None:
+        return False
+    elif isinstance(value, bool):
         return value
-
-def _flatten_schema_helper(schema, path, out_schema):
-    if get_type_from_schema(schema) == Types.OBJECT:
-        for key, value in schema['properties'].iteritems():
-            _flatten_schema_helper(
-                value,
-                # This oddness prevents the leading '.' for keys
-                # For example (without ths):
-                # {'.a.b': 'c'} from {'a': {'b': 'c'}}
-                '.'.join(truthy([path, key])),
-                out_schema,
-            )
+    elif (
+        isinstance(value, basestring) and
+        value.lower() in BOOLEAN_VALUES
+    ):
+        return BOOLEAN_VALUES[value.lower()]
     else:
-        out_schema[path] = schema
+        raise ValueError('Not a boolean: {0!r}'.format(value))
 
-def flatten_schema(schema):
-    out_schema = {}
-    _flatten_schema_helper(schema, '', out_schema)
-    return out_schema
+TRANSFORM_FUNCTIONS = {
+    Types.OBJECT: transform_value_noop,
+    Types.STRING: transform_value_noop,
+    Types.INTEGER: int,
+    Types.NUMBER: float,
+    Types.BOOLEAN: transform_boolean,
+}
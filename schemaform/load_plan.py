@@ -0,0 +1,127 @@
+
+import collections
+
+from schemaform.helpers import get_type_from_schema
+from schemaform.helpers import get_value_type_from_schema
+from schemaform.helpers import transform_value_noop
+from schemaform.helpers import TRANSFORM_FUNCTIONS
+from schemaform.types import Types
+from util.iter import truthy
+
+# Index of the root container (the returned values)
+ROOT = 0
+
+class FieldLoader(collections.namedtuple(
+    'FieldLoader',
+    ['input_name', 'container_index', 'key', 'transform', 'is_boolean'],
+)):
+    """How to load a single (non-object) property of a schema.
+
+    Properties:
+        input_name - Dotted path the value is submitted as
+        container_index - Index of the dict the value is set into
+        key - Key the value is set at in that dict
+        transform - Function converting the submitted value or None if the
+            submitted value is used as is
+        is_boolean - Booleans are always set since unchecked ones are not
+            submitted
+    """
+    __slots__ = ()
+
+class LoadPlan(object):
+    """A LoadPlan loads values submitted from a Form.  Everything depending
+    only on the schema (types, conversions, where values go) is worked out
+    once so loading is a single loop over the fields.
+    """
+
+    def __init__(self, containers, fields):
+        """Constructs a LoadPlan, see from_schema.
+
+        Args:
+            containers - List of (parent container index, key) for each
+                nested dict, parents before their children.  The first entry
+                is the root and is ignored.
+            fields - List of FieldLoader
+        """
+        self.containers = containers
+        self.fields = fields
+
+    @classmethod
+    def from_schema(cls, schema):
+        containers = [(None, None)]
+        fields = []
+        cls._add_object(schema, '', ROOT, containers, fields)
+        return cls(containers, fields)
+
+    @classmethod
+    def _add_object(cls, schema, path, container_index, containers, fields):
+        for key, property_schema in schema['properties'].iteritems():
+            # This oddness prevents the leading '.' for keys
+            input_name = '.'.join(truthy([path, key]))
+            property_type = get_type_from_schema(property_schema)
+
+            if property_type == Types.OBJECT:
+                containers.append((container_index, key))
+                cls._add_object(
+                    property_schema,
+                    input_name,
+                    len(containers) - 1,
+                    containers,
+                    fields,
+                )
+                continue
+
+            transform = TRANSFORM_FUNCTIONS[
+                get_value_type_from_schema(property_schema)
+            ]
+            if transform is transform_value_noop:
+                transform = None
+            is_boolean = property_type == Types.BOOLEAN
+            fields.append(FieldLoader(
+                input_name, container_index, key, transform, is_boolean,
+            ))
+
+    def _get_container(self, loaded_containers, container_index):
+        """Creates the dict at container_index (and its missing parents)."""
+        parent_index, key = self.containers[container_index]
+        parent = loaded_containers[parent_index]
+        if parent is None:
+            parent = self._get_container(loaded_containers, parent_index)
+        container = loaded_containers[container_index] = parent[key] = {}
+        return container
+
+    def load(self, form):
+        """Returns the values loaded from form.  Nested dicts are only created
+        for objects which have a submitted value.
+
+        Args:
+            form - dictlike object where keys are paths like 'foo.bar'
+        """
+        values = {}
+        loaded_containers = [None] * len(self.containers)
+        loaded_containers[ROOT] = values
+
+        for input_name, container_index, key, transform, is_boolean in (
+            self.fields
+        ):
+            value = form.get(input_name)
+            # Booleans are always loaded, because when they are unchecked they
+            # do not send a value
+            if value is None and not is_boolean:
+                continue
+            elif transform is not None:
+                # In the error case we keep the value -- A validator will
+                # invalidate this value regardless
+                try:
+                    value = transform(value)
+                except ValueError:
+                    pass
+
+            container = loaded_containers[container_index]
+            if container is None:
+                container = self._get_container(
+                    loaded_containers, container_index,
+                )
+            container[key] = value
+
+        return values
@@ -1,7 +1,6 @@
 
 from schemaform.base_property import BaseProperty
-from schemaform.helpers import combine_pqables
-from schemaform.helpers import el
+from schemaform.helpers import html_el
 from schemaform.helpers import get_type_from_schema
 from schemaform.types import Types
 
@@ -78,10 +77,10 @@ class ObjectProperty(BaseProperty):
 
             yield self.property_type_cls_map[property_type](*args)
 
-    def __pq__(self):
-        """Returns the pyquery object representing this object."""
-        contents = combine_pqables(
-            el('legend', text=self.get_label_text()),
-            self._get_properties()
+    def __html__(self):
+        """Returns the html representing this object."""
+        return html_el(
+            'fieldset',
+            html_el('legend', text=self.get_label_text()),
+            self._get_properties(),
         )
-        return contents.wrapAll(el('fieldset').__html__())
@@ -3,8 +3,8 @@ import collections
 import itertools
 
 from schemaform.base_property import BaseProperty
-from schemaform.helpers import combine_pqables
-from schemaform.helpers import el
+from schemaform.helpers import html_el
+from schemaform.helpers import html_to_pq
 from schemaform.helpers import get_type_from_schema
 from schemaform.types import Types
 
@@ -18,8 +18,8 @@ class RadioInput(collections.namedtuple(
     def id(self):
         return 'id_%s_%s' % (self.name, self.value)
 
-    def __pq__(self):
-        """Returns the pyQuery representation."""
+    def __html__(self):
+        """Returns the html representation."""
         input_attrs = {
             'id': self.id,
             'name': self.name,
@@ -30,10 +30,14 @@ class RadioInput(collections.namedtuple(
         if self.checked:
             input_attrs['checked'] = 'checked'
 
-        input_element = el('input', **input_attrs)
-        label_element = el('label', text=self.label, **{'for': self.id})
+        input_element = html_el('input', **input_attrs)
+        label_element = html_el('label', text=self.label, **{'for': self.id})
         return input_element + label_element
 
+    def __pq__(self):
+        """Returns the pyQuery representation."""
+        return html_to_pq(self.__html__())
+
 class RadioEnumProperty(BaseProperty):
     """A RadioEnumProperty represents a property that represents an enum
     and results in radio elements.
@@ -92,11 +96,12 @@ class RadioEnumProperty(BaseProperty):
                 value == default_value,
             )
 
-    def __pq__(self):
-        """Returns the pyquery object representing this object."""
-        contents = combine_pqables(
-            el('legend', text=self.get_label_text()), self._get_inputs(),
-            acceptable_iterable_type=RadioInput,
+    def __html__(self):
+        """Returns the html representing this object."""
+        return html_el(
+            'fieldset',
+            html_el('legend', text=self.get_label_text()),
+            # RadioInputs are tuples, keep them from being flattened
+            [radio_input.__html__() for radio_input in self._get_inputs()],
         )
-        return contents.wrapAll(el('fieldset').__html__())
 
@@ -1,6 +1,6 @@
 
 from schemaform.base_property import BaseProperty
-from schemaform.helpers import el
+from schemaform.helpers import html_el
 from schemaform.helpers import get_type_from_schema
 from schemaform.types import Types
 
@@ -35,8 +35,8 @@ class SingleInputProperty(BaseProperty):
                 'Unexpected type for single input property.'
             )
 
-    def __pq__(self):
-        """Returns the pyquery object representing this object."""
+    def __html__(self):
+        """Returns the html representing this object."""
         label_text = self.get_label_text()
         default_value = self.normalize_value(
             self.property_dict.get('default', ''),
@@ -44,8 +44,8 @@ class SingleInputProperty(BaseProperty):
         input_name = self.get_input_name()
         input_id = 'id_' + input_name
 
-        label_element = el('label', text=label_text, **{'for': input_id})
-        input_element = el(
+        label_element = html_el('label', text=label_text, **{'for': input_id})
+        input_element = html_el(
             'input',
             name=input_name,
             id=input_id,
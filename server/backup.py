@@ -0,0 +1,373 @@
+
+import collections
+import contextlib
+import hashlib
+import optparse
+import os
+import os.path
+import simplejson
+import sys
+import time
+
+import config.application
+from server.rcon import RconNotEnabledError
+from server.user_server import get_server_dir
+from server.user_server import UserServer
+from util.files import atomic_open
+from util.fs_watch import RACY_MTIME_WINDOW
+
+HASH_ALGORITHM = 'sha256'
+CHUNKS_DIRECTORY = 'chunks'
+SNAPSHOTS_DIRECTORY = 'snapshots'
+
+# Region files are made of 4 KiB sectors and a save only rewrites the
+# sectors of the chunks which changed, so fixed size pieces aligned to the
+# sectors stay identical between snapshots
+CHUNK_SIZE = 64 * 1024
+
+DEFAULT_LEVEL_NAME = 'world'
+# Directories of the other dimensions next to the world (bukkit and friends)
+DIMENSION_SUFFIXES = ('', '_nether', '_the_end')
+
+# Console commands pausing saves during a backup, with the output they are
+# done at
+SAVE_OFF = ('save-off', 'Automatic saving is now disabled')
+SAVE_ALL = ('save-all flush', 'Saved the game')
+SAVE_ON = ('save-on', 'Automatic saving is now enabled')
+
+
+class ChunkStore(object):
+    """A ChunkStore is a content-addressed store of file pieces.  Each unique
+    piece is stored once no matter how many files or snapshots contain it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_chunk_path(self, digest):
+        return os.path.join(
+            self.path, CHUNKS_DIRECTORY, HASH_ALGORITHM, digest[:2], digest,
+        )
+
+    def put(self, data):
+        """Stores data (unless it is already stored).  Returns
+        (digest, whether it was written).
+        """
+        digest = hashlib.new(HASH_ALGORITHM, data).hexdigest()
+        chunk_path = self.get_chunk_path(digest)
+        if os.path.exists(chunk_path):
+            return digest, False
+
+        chunk_directory = os.path.dirname(chunk_path)
+        if not os.path.exists(chunk_directory):
+            try:
+                os.makedirs(chunk_directory)
+            except OSError:
+                # Made by a concurrent backup
+                if not os.path.isdir(chunk_directory):
+                    raise
+        with atomic_open(chunk_path) as chunk_file:
+            chunk_file.write(data)
+        return digest, True
+
+    def get(self, digest):
+        with open(self.get_chunk_path(digest), 'rb') as chunk_file:
+            return chunk_file.read()
+
+
+class BackupResult(collections.namedtuple(
+    'BackupResult',
+    ['snapshot_id', 'files', 'changed_files', 'new_chunks', 'bytes_read'],
+)):
+    """A BackupResult describes a snapshot which was taken.
+
+    Properties:
+        snapshot_id - Id of the snapshot
+        files - Number of files in the snapshot
+        changed_files - Number of files which were read (the others were
+            unchanged since the previous snapshot)
+        new_chunks - Number of chunks which were not stored yet
+        bytes_read - Number of bytes read from the changed files
+    """
+    __slots__ = ()
+
+
+def get_world_directories(user_server):
+    """Returns the paths (relative to the server directory) of the existing
+    world directories of the server.
+    """
+    try:
+        level_name = user_server.server_properties.get(
+            'level-name', DEFAULT_LEVEL_NAME,
+        )
+    except IOError:
+        # Servers which never started have no server.properties yet
+        level_name = DEFAULT_LEVEL_NAME
+    return [
+        level_name + suffix for suffix in DIMENSION_SUFFIXES
+        if os.path.isdir(
+            os.path.join(user_server.server_dir, level_name + suffix),
+        )
+    ]
+
+def _iter_files(root, directories):
+    """Yields the (relative path, os.stat) of the files in directories."""
+    for directory in directories:
+        for dirpath, dirnames, filenames in os.walk(
+            os.path.join(root, directory),
+        ):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, root), os.stat(path)
+
+@contextlib.contextmanager
+def saves_paused(run_command):
+    """Flushes the world to disk and keeps the server from saving for the
+    duration of the context.
+
+    Args:
+        run_command - Function taking (command, expected output) which
+            returns once the command is done (see rcon_command_runner and
+            Supervisor.run_command).  None to not pause saves.
+    """
+    if run_command is None:
+        yield
+        return
+
+    run_command(*SAVE_OFF)
+    try:
+        run_command(*SAVE_ALL)
+        yield
+    finally:
+        run_command(*SAVE_ON)
+
+def rcon_command_runner(user_server):
+    """Returns a run_command for saves_paused talking to the server through
+    RCON.
+    """
+    def run_command(command, expected_output):
+        # RCON replies once the command is done
+        user_server.rcon.command(command)
+    return run_command
+
+def supervisor_command_runner(supervisor, name):
+    """Returns a run_command for saves_paused talking to a server of a
+    Supervisor through its console.
+    """
+    def run_command(command, expected_output):
+        supervisor.run_command(name, command, expected_output)
+    return run_command
+
+def _get_snapshot_sort_key(snapshot_id):
+    """Sorts ids of snapshots taken within the same second by their suffix
+    (so that 'T.10' comes after 'T.9').
+    """
+    timestamp, _, suffix = snapshot_id.partition('.')
+    return timestamp, int(suffix or 0)
+
+
+class BackupEngine(object):
+    """Takes incremental snapshots of the worlds of servers.
+
+    A snapshot is a manifest listing the chunks of every world file.
+    Files whose size and mtime didn't change since the previous snapshot
+    aren't read again, so backups scale with what changed instead of with
+    the size of the world.
+    """
+
+    def __init__(self, path=None):
+        """Initialize a BackupEngine.
+
+        Args:
+            path - Directory backups are stored in (defaults to BACKUPS_PATH)
+        """
+        self.path = path or config.application.BACKUPS_PATH
+        self.chunk_store = ChunkStore(self.path)
+
+    def _get_snapshots_directory(self, server_name):
+        return os.path.join(self.path, SNAPSHOTS_DIRECTORY, server_name)
+
+    def _get_manifest_path(self, server_name, snapshot_id):
+        return os.path.join(
+            self._get_snapshots_directory(server_name), snapshot_id + '.json',
+        )
+
+    def list_snapshots(self, server_name):
+        """Returns the snapshot ids of a server, oldest first."""
+        snapshots_directory = self._get_snapshots_directory(server_name)
+        if not os.path.isdir(snapshots_directory):
+            return []
+        return sorted(
+            (
+                filename[:-len('.json')]
+                for filename in os.listdir(snapshots_directory)
+                if filename.endswith('.json')
+            ),
+            key=_get_snapshot_sort_key,
+        )
+
+    def get_manifest(self, server_name, snapshot_id):
+        with open(
+            self._get_manifest_path(server_name, snapshot_id), 'r',
+        ) as manifest_file:
+            return simplejson.load(manifest_file)
+
+    def _get_latest_manifest(self, server_name):
+        snapshot_ids = self.list_snapshots(server_name)
+        if not snapshot_ids:
+            return None
+        return self.get_manifest(server_name, snapshot_ids[-1])
+
+    def _store_file(self, path):
+        """Returns (chunk digests, number of new chunks, bytes read)."""
+        chunks = []
+        new_chunks = 0
+        bytes_read = 0
+        with open(path, 'rb') as world_file:
+            while True:
+                data = world_file.read(CHUNK_SIZE)
+                if not data:
+                    break
+                digest, written = self.chunk_store.put(data)
+                chunks.append(digest)
+                new_chunks += written
+                bytes_read += len(data)
+        return chunks, new_chunks, bytes_read
+
+    def _get_snapshot_id(self, server_name, started_at):
+        snapshot_id = time.strftime(
+            '%Y%m%dT%H%M%SZ', time.gmtime(started_at),
+        )
+        # Snapshots taken within the same second
+        existing = set(self.list_snapshots(server_name))
+        unique_id = snapshot_id
+        suffix = 1
+        while unique_id in existing:
+            unique_id = '{0}.{1}'.format(snapshot_id, suffix)
+            suffix += 1
+        return unique_id
+
+    def backup(self, user_server, run_command=None):
+        """Takes a snapshot of the worlds of a UserServer.  Returns a
+        BackupResult.
+
+        Args:
+            user_server - The UserServer
+            run_command - See saves_paused
+        """
+        server_name = os.path.basename(os.path.normpath(user_server.server_dir))
+        previous = self._get_latest_manifest(server_name)
+        previous_files = previous['files'] if previous else {}
+        # Files changed right before the previous snapshot could have
+        # changed again without changing their mtime
+        trusted_before = (
+            previous['started_at'] - RACY_MTIME_WINDOW if previous else 0
+        )
+
+        started_at = time.time()
+        files = {}
+        changed_files = new_chunks = bytes_read = 0
+        with saves_paused(run_command):
+            for relative_path, stat in _iter_files(
+                user_server.server_dir, get_world_directories(user_server),
+            ):
+                entry = previous_files.get(relative_path)
+                if (
+                    entry is not None and
+                    entry['size'] == stat.st_size and
+                    entry['mtime'] == stat.st_mtime and
+                    stat.st_mtime < trusted_before
+                ):
+                    files[relative_path] = entry
+                    continue
+
+                chunks, file_new_chunks, file_bytes_read = self._store_file(
+                    os.path.join(user_server.server_dir, relative_path),
+                )
+                files[relative_path] = {
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                    'chunks': chunks,
+                }
+                changed_files += 1
+                new_chunks += file_new_chunks
+                bytes_read += file_bytes_read
+
+        snapshot_id = self._get_snapshot_id(server_name, started_at)
+        manifest_path = self._get_manifest_path(server_name, snapshot_id)
+        if not os.path.exists(os.path.dirname(manifest_path)):
+            os.makedirs(os.path.dirname(manifest_path))
+        with atomic_open(manifest_path, 'w') as manifest_file:
+            simplejson.dump(
+                {'started_at': started_at, 'files': files}, manifest_file,
+            )
+
+        return BackupResult(
+            snapshot_id, len(files), changed_files, new_chunks, bytes_read,
+        )
+
+    def restore(self, server_name, snapshot_id, destination):
+        """Writes the files of a snapshot into the destination directory."""
+        manifest = self.get_manifest(server_name, snapshot_id)
+        for relative_path, entry in sorted(manifest['files'].iteritems()):
+            path = os.path.join(destination, relative_path)
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with atomic_open(path) as world_file:
+                for digest in entry['chunks']:
+                    world_file.write(self.chunk_store.get(digest))
+            os.utime(path, (entry['mtime'], entry['mtime']))
+
+
+def format_result(result):
+    return (
+        '{0.snapshot_id}: {0.files} files, {0.changed_files} changed, '
+        '{0.new_chunks} new chunks, {0.bytes_read} bytes read'
+    ).format(result)
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options] SERVER_NAME...\n\n'
+        'Takes an incremental snapshot of the worlds of each server.  Saves '
+        'are paused through RCON while it is taken if RCON is enabled.',
+    )
+    parser.add_option(
+        '--no-pause',
+        action='store_true', default=False,
+        help="Don't pause saves during the backup.",
+    )
+    opts, args = parser.parse_args(argv)
+    if not args:
+        parser.error('Expected at least one server.')
+
+    try:
+        user_servers = [
+            UserServer(get_server_dir(server_name)) for server_name in args
+        ]
+    except AssertionError:
+        parser.error('Unknown server.')
+
+    engine = BackupEngine()
+    for server_name, user_server in zip(args, user_servers):
+        run_command = None
+        if not opts.no_pause:
+            try:
+                user_server.rcon
+                run_command = rcon_command_runner(user_server)
+            except RconNotEnabledError:
+                print '{0}: RCON is not enabled, saves are not paused'.format(
+                    server_name,
+                )
+            except IOError:
+                # Servers which never started have no server.properties yet
+                print (
+                    '{0}: server.properties is missing, saves are not paused'
+                ).format(server_name)
+        print '{0}: {1}'.format(
+            server_name, format_result(engine.backup(user_server, run_command)),
+        )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,254 @@
+
+import collections
+import os
+import os.path
+import threading
+import time
+
+# Log file minecraft servers write their console to (relative to the server
+# directory)
+LATEST_LOG = os.path.join('logs', 'latest.log')
+
+# Number of lines kept per server
+DEFAULT_MAX_LINES = 1000
+# Longer lines are cut so memory per server stays bounded
+MAX_LINE_LENGTH = 4096
+DEFAULT_PAGE_SIZE = 100
+
+# At most this many bytes of the end of a log are read when following it
+# starts (or falls behind), the rest can't fit in the buffer anyway
+MAX_CATCH_UP_BYTES = DEFAULT_MAX_LINES * 256
+
+# Seconds between checks of the followed log while waiting for lines
+FOLLOW_POLL_INTERVAL = 1
+
+
+def split_lines(partial_line, data):
+    """Splits the data following partial_line into complete lines.  Returns
+    (lines, the new partial line).
+
+    A partial line reaching MAX_LINE_LENGTH is flushed as a line so output
+    which never ends its line can't grow it without bound.
+    """
+    lines = (partial_line + data).split('\n')
+    partial_line = lines.pop()
+    if len(partial_line) >= MAX_LINE_LENGTH:
+        lines.append(partial_line)
+        partial_line = ''
+    return [line.rstrip('\r') for line in lines], partial_line
+
+
+class ConsoleLogPage(collections.namedtuple(
+    'ConsoleLogPage', ['lines', 'next_cursor', 'truncated'],
+)):
+    """A page of a ConsoleLog.
+
+    Properties:
+        lines - List of (cursor, line) in order
+        next_cursor - Cursor to request the following page with
+        truncated - Whether lines after the requested cursor were already
+            dropped from the buffer
+    """
+    __slots__ = ()
+
+    def to_dict(self):
+        return {
+            'lines': [
+                {'cursor': cursor, 'line': line} for cursor, line in self.lines
+            ],
+            'next_cursor': self.next_cursor,
+            'truncated': self.truncated,
+        }
+
+
+class ConsoleLog(object):
+    """A ConsoleLog is a ring buffer of the latest console lines of a server.
+
+    Every line gets the next cursor (its sequence number) so readers can
+    page through or follow the lines without seeing any twice.
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES):
+        self._lines = collections.deque(maxlen=max_lines)
+        # Cursor of the next appended line
+        self.next_cursor = 0
+        self._condition = threading.Condition()
+
+    @property
+    def first_cursor(self):
+        """Cursor of the oldest line in the buffer."""
+        return self.next_cursor - len(self._lines)
+
+    def extend(self, lines):
+        with self._condition:
+            for line in lines:
+                self._lines.append(line[:MAX_LINE_LENGTH])
+                self.next_cursor += 1
+            self._condition.notify_all()
+
+    def append(self, line):
+        self.extend([line])
+
+    def get_page(self, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """Returns a ConsoleLogPage of the lines starting at cursor.
+
+        Cursors outside of the buffer are clamped to it: older ones start at
+        the oldest line (and the page is truncated), newer ones are at the end.
+
+        Raises ValueError if limit is less than 1.
+
+        Args:
+            cursor - Cursor of the first line (a next_cursor of an earlier
+                page), None for the latest limit lines
+            limit - Maximum number of lines
+        """
+        if limit < 1:
+            raise ValueError('Expected a limit of at least 1.')
+
+        with self._condition:
+            first_cursor = self.first_cursor
+            if cursor is None:
+                cursor = max(self.next_cursor - limit, first_cursor)
+            truncated = cursor < first_cursor
+            start = min(max(cursor, first_cursor), self.next_cursor)
+            end = min(start + limit, self.next_cursor)
+            # Only the requested lines are visited, deque indexing walks
+            # from the nearest end which is where readers usually are
+            lines = [
+                (line_cursor, self._lines[line_cursor - first_cursor])
+                for line_cursor in xrange(start, end)
+            ]
+        return ConsoleLogPage(lines, end, truncated)
+
+    def wait(self, cursor, timeout):
+        """Blocks until there is a line at cursor or timeout seconds passed.
+        """
+        with self._condition:
+            if self.next_cursor <= cursor:
+                self._condition.wait(timeout)
+
+
+class LogFollower(object):
+    """Follows a log file by offset, feeding new complete lines into a
+    ConsoleLog.  Only bytes written since the last poll are read and
+    rotated (replaced or truncated) files are followed from their start.
+    """
+
+    def __init__(self, path, console_log):
+        self.path = path
+        self.console_log = console_log
+        self._inode = None
+        self._offset = 0
+        self._partial_line = ''
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """Reads what was appended to the log.  Returns the number of lines
+        added.
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return 0
+
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                # New (or rotated) file
+                self._inode = stat.st_ino
+                self._offset = 0
+                self._partial_line = ''
+            if stat.st_size == self._offset:
+                return 0
+
+            skip_partial_line = False
+            if stat.st_size - self._offset > MAX_CATCH_UP_BYTES:
+                self._offset = stat.st_size - MAX_CATCH_UP_BYTES
+                self._partial_line = ''
+                # Reading starts in the middle of a line
+                skip_partial_line = True
+
+            with open(self.path, 'rb') as log_file:
+                log_file.seek(self._offset)
+                data = log_file.read(stat.st_size - self._offset)
+            self._offset += len(data)
+
+            lines, self._partial_line = split_lines(self._partial_line, data)
+            if skip_partial_line:
+                lines = lines[1:]
+            self.console_log.extend(lines)
+            return len(lines)
+
+
+class ServerConsole(object):
+    """The console of a server: a ConsoleLog fed either by following the
+    server's log file or by the output of the process (see feed_from).
+    """
+
+    def __init__(self, server_dir, max_lines=DEFAULT_MAX_LINES):
+        self.log = ConsoleLog(max_lines)
+        self.follower = LogFollower(
+            os.path.join(server_dir, LATEST_LOG), self.log,
+        )
+
+    def feed_from(self, managed_server):
+        """Feeds the console from the output of a ManagedServer (in the
+        supervisor's process) instead of following the log file.
+        """
+        self.follower = None
+        managed_server.output_listeners.append(
+            lambda _, line: self.log.append(line),
+        )
+
+    def poll(self):
+        if self.follower is not None:
+            self.follower.poll()
+
+    def get_page(self, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        self.poll()
+        return self.log.get_page(cursor, limit)
+
+    def iter_lines(self, cursor=None, keepalive_interval=None):
+        """Yields (cursor, line) as lines arrive, starting at cursor (defaults
+        to new lines only).  Yields None every keepalive_interval seconds
+        without a line.
+        """
+        self.poll()
+        if cursor is None:
+            cursor = self.log.next_cursor
+        idle_since = time.time()
+        while True:
+            page = self.log.get_page(cursor)
+            for line in page.lines:
+                yield line
+            cursor = page.next_cursor
+            if page.lines:
+                idle_since = time.time()
+                continue
+
+            self.log.wait(cursor, FOLLOW_POLL_INTERVAL)
+            self.poll()
+            if (
+                keepalive_interval is not None and
+                time.time() - idle_since >= keepalive_interval
+            ):
+                idle_since = time.time()
+                yield None
+
+
+# Maps server directory to its ServerConsole
+_server_consoles = {}
+_server_consoles_lock = threading.Lock()
+
+def get_server_console(server_dir):
+    """Returns the process-wide ServerConsole of the server directory."""
+    with _server_consoles_lock:
+        server_console = _server_consoles.get(server_dir)
+        if server_console is None:
+            server_console = _server_consoles[server_dir] = ServerConsole(
+                server_dir,
+            )
+        return server_console
+
+def clear_server_consoles():
+    with _server_consoles_lock:
+        _server_consoles.clear()
@@ -0,0 +1,400 @@
+
+import collections
+import contextlib
+import functools
+import itertools
+import multiprocessing.pool
+import optparse
+import select
+import simplejson
+import socket
+import struct
+import sys
+import threading
+import time
+
+# Packet types of the (Source) RCON protocol minecraft speaks
+LOGIN = 3
+COMMAND = 2
+AUTH_RESPONSE = 2
+RESPONSE_VALUE = 0
+
+# request id, type
+HEADER = struct.Struct('<ii')
+LENGTH = struct.Struct('<i')
+# Payloads are terminated by a null byte and followed by an empty string
+PADDING = '\x00\x00'
+# Largest packet a server sends (responses are split into 4096 byte payloads)
+MAX_PACKET_SIZE = 4096 + HEADER.size + len(PADDING)
+# Request id of replies to a failed login
+AUTH_FAILED_ID = -1
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 25575
+# Seconds to wait on connecting / replies
+DEFAULT_TIMEOUT = 5
+DEFAULT_MAX_CONNECTIONS = 2
+# Connections idle for longer than this many seconds are pinged before they
+# are used again
+HEALTH_CHECK_INTERVAL = 30
+
+DEFAULT_MAX_WORKERS = 16
+
+
+class RconError(Exception): pass
+class RconAuthenticationError(RconError): pass
+class RconNotEnabledError(RconError): pass
+
+
+def encode_packet(request_id, packet_type, payload):
+    if isinstance(payload, unicode):
+        payload = payload.encode('utf-8')
+    body = HEADER.pack(request_id, packet_type) + payload + PADDING
+    return LENGTH.pack(len(body)) + body
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise RconError('Connection closed.')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+def read_packet(sock):
+    """Reads a packet from sock.  Returns (request id, type, payload)."""
+    length, = LENGTH.unpack(_recv_exactly(sock, LENGTH.size))
+    if not HEADER.size + len(PADDING) <= length <= MAX_PACKET_SIZE:
+        raise RconError('Invalid packet length: {0}'.format(length))
+    body = _recv_exactly(sock, length)
+    request_id, packet_type = HEADER.unpack(body[:HEADER.size])
+    return request_id, packet_type, body[HEADER.size:-len(PADDING)]
+
+
+class RconConfig(collections.namedtuple(
+    'RconConfig', ['host', 'port', 'password'],
+)):
+    """Where and how to connect to the RCON of a server.
+
+    Properties:
+        host - Host the server listens on
+        port - rcon.port of the server
+        password - rcon.password of the server
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_server_properties(cls, server_properties):
+        """Raises RconNotEnabledError if the properties don't enable RCON."""
+        if server_properties.get('enable-rcon') != 'true':
+            raise RconNotEnabledError('enable-rcon is not true.')
+        password = server_properties.get('rcon.password')
+        if not password:
+            raise RconNotEnabledError('rcon.password is not set.')
+        try:
+            port = int(server_properties.get('rcon.port', DEFAULT_PORT))
+        except ValueError:
+            raise RconNotEnabledError('rcon.port is not a number.')
+        return cls(
+            server_properties.get('server-ip') or DEFAULT_HOST, port, password,
+        )
+
+
+class RconConnection(object):
+    """An authenticated connection to the RCON of a server."""
+
+    def __init__(self, config, timeout=DEFAULT_TIMEOUT):
+        """Connects and logs in.
+
+        Raises RconAuthenticationError if the password is wrong and RconError
+        on any other failure.
+        """
+        self._request_ids = itertools.count(1)
+        try:
+            self._socket = socket.create_connection(
+                (config.host, config.port), timeout,
+            )
+        except socket.error as e:
+            raise RconError('Could not connect: {0}'.format(e))
+        self.last_used = time.time()
+
+        try:
+            request_id = self._send(LOGIN, config.password)
+            while True:
+                reply_id, packet_type, _ = self._read()
+                if packet_type == AUTH_RESPONSE:
+                    break
+        except:
+            self.close()
+            raise
+        if reply_id != request_id:
+            self.close()
+            raise RconAuthenticationError('Wrong rcon.password.')
+
+    def _send(self, packet_type, payload):
+        request_id = next(self._request_ids)
+        try:
+            self._socket.sendall(
+                encode_packet(request_id, packet_type, payload),
+            )
+        except socket.error as e:
+            raise RconError('Could not send: {0}'.format(e))
+        return request_id
+
+    def _read(self):
+        try:
+            return read_packet(self._socket)
+        except socket.error as e:
+            raise RconError('Could not read: {0}'.format(e))
+
+    def _read_until_end(self, request_id=None):
+        """Marks the end of the replies so far with an empty packet.  The
+        server answers in order so its reply comes after them.  Returns the
+        payloads of the replies to request_id (long outputs arrive in several
+        packets).
+        """
+        end_id = self._send(RESPONSE_VALUE, '')
+        payloads = []
+        while True:
+            reply_id, _, payload = self._read()
+            if reply_id == end_id:
+                break
+            elif reply_id == request_id:
+                payloads.append(payload)
+        self.last_used = time.time()
+        return payloads
+
+    def command(self, command):
+        """Runs a console command and returns its output."""
+        return ''.join(self._read_until_end(self._send(COMMAND, command)))
+
+    def ping(self):
+        """Raises RconError if the server doesn't answer."""
+        self._read_until_end()
+
+    @property
+    def closed_by_server(self):
+        """Whether the server closed the (idle) connection."""
+        readable, _, _ = select.select([self._socket], [], [], 0)
+        if not readable:
+            return False
+        try:
+            # Idle connections have nothing to read unless they are closed
+            return not self._socket.recv(1, socket.MSG_PEEK)
+        except socket.error:
+            return True
+
+    def is_healthy(self):
+        """Checks an idle connection, pinging it if it was idle for longer
+        than HEALTH_CHECK_INTERVAL.
+        """
+        if self.closed_by_server:
+            return False
+        if time.time() - self.last_used < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            self.ping()
+        except RconError:
+            return False
+        return True
+
+    def close(self):
+        self._socket.close()
+
+
+class RconPool(object):
+    """A pool of persistent RconConnections to a single server."""
+
+    def __init__(
+        self,
+        config,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.config = config
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._closed = False
+
+    def _get_connection(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                # Most recently used first, it is the most likely to be alive
+                connection = self._idle.pop()
+            if connection.is_healthy():
+                return connection
+            connection.close()
+        return RconConnection(self.config, self.timeout)
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Checks out a connection for the duration of the context.  Blocks
+        while max_connections are checked out.
+        """
+        with self._semaphore:
+            connection = self._get_connection()
+            try:
+                yield connection
+            except:
+                # It could be in the middle of a reply
+                connection.close()
+                raise
+            with self._lock:
+                if self._closed:
+                    connection.close()
+                else:
+                    self._idle.append(connection)
+
+    def command(self, command):
+        """Runs a console command and returns its output."""
+        with self.connection() as connection:
+            return connection.command(command)
+
+    def close(self):
+        """Closes the idle connections, checked out ones are closed once they
+        are returned.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+# Maps server directory to its RconPool
+_rcon_pools = {}
+_rcon_pools_lock = threading.Lock()
+
+def get_rcon_pool(user_server):
+    """Returns the process-wide RconPool of a UserServer.  The pool is
+    replaced when the server's RCON settings change.
+
+    Raises RconNotEnabledError if the server doesn't have RCON enabled.
+    """
+    config = RconConfig.from_server_properties(user_server.server_properties)
+    with _rcon_pools_lock:
+        pool = _rcon_pools.get(user_server.server_dir)
+        if pool is not None and pool.config != config:
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = _rcon_pools[user_server.server_dir] = RconPool(config)
+        return pool
+
+def close_rcon_pools():
+    with _rcon_pools_lock:
+        pools = _rcon_pools.values()
+        _rcon_pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class CommandResult(collections.namedtuple(
+    'CommandResult', ['server_dir', 'command', 'response', 'error'],
+)):
+    """A CommandResult is the outcome of running a command on a server.
+
+    Properties:
+        server_dir - Directory of the server
+        command - The console command
+        response - Output of the command (None if it failed)
+        error - Error message if the command failed, otherwise None
+    """
+    __slots__ = ()
+
+    @property
+    def success(self):
+        return self.error is None
+
+
+def _run_command(command, user_server):
+    try:
+        response = get_rcon_pool(user_server).command(command)
+    except (RconError, IOError, OSError) as e:
+        return CommandResult(
+            user_server.server_dir,
+            command,
+            None,
+            '{0}: {1}'.format(type(e).__name__, e),
+        )
+    return CommandResult(user_server.server_dir, command, response, None)
+
+def run_command_on_servers(
+    user_servers, command, max_workers=DEFAULT_MAX_WORKERS,
+):
+    """Runs a console command on many servers concurrently.  Returns a list
+    of CommandResult in the order of user_servers.
+
+    Args:
+        user_servers - Iterable of UserServer
+        command - The console command
+        max_workers - Maximum number of threads used
+    """
+    user_servers = list(user_servers)
+    if not user_servers:
+        return []
+    pool = multiprocessing.pool.ThreadPool(
+        min(max_workers, len(user_servers)),
+    )
+    try:
+        return pool.map(functools.partial(_run_command, command), user_servers)
+    finally:
+        pool.close()
+        pool.join()
+
+def format_result(result):
+    if result.error is not None:
+        return '{0}: error: {1}'.format(result.server_dir, result.error)
+    return '{0}: {1}'.format(result.server_dir, result.response)
+
+def main(argv=None):
+    # Imported here since user_server uses this module
+    from server.user_server import get_server_dir
+    from server.user_server import UserServer
+
+    parser = optparse.OptionParser(
+        usage='%prog [options] COMMAND SERVER_NAME...\n\n'
+        'Runs a console command on each of the servers through RCON.',
+    )
+    parser.add_option(
+        '--max-workers',
+        type='int', default=DEFAULT_MAX_WORKERS,
+        help='Maximum number of servers talked to at once.',
+    )
+    parser.add_option(
+        '--json',
+        action='store_true', default=False,
+        help='Output the results as json.',
+    )
+    opts, args = parser.parse_args(argv)
+    if len(args) < 2:
+        parser.error('Expected a command and at least one server.')
+
+    command, server_names = args[0], args[1:]
+    try:
+        user_servers = [
+            UserServer(get_server_dir(server_name))
+            for server_name in server_names
+        ]
+    except AssertionError:
+        parser.error('Unknown server.')
+
+    results = run_command_on_servers(
+        user_servers, command, max_workers=opts.max_workers,
+    )
+    close_rcon_pools()
+
+    if opts.json:
+        print simplejson.dumps([result._asdict() for result in results])
+    else:
+        for result in results:
+            print format_result(result)
+    return int(not all(result.success for result in results))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,659 @@
+
+import collections
+import errno
+import fcntl
+import optparse
+import os
+import os.path
+import Queue
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from jar_downloader.discovery import get_jar_downloader_map
+from jar_downloader.helpers import get_jar_directory
+from server.console_log import split_lines
+from server.user_server import UserServer
+
+DEFAULT_JAVA = 'java'
+DEFAULT_HEAP = '1G'
+DEFAULT_GC_FLAGS = ('-XX:+UseG1GC',)
+
+# Written into the server directory while the server runs
+PID_FILENAME = 'server.pid'
+
+# Sent to the server's stdin to shut it down gracefully
+STOP_COMMAND = 'stop'
+
+# States of a ManagedServer
+STOPPED = 'stopped'
+RUNNING = 'running'
+STOPPING = 'stopping'
+# Crashed and waiting to be restarted
+BACKOFF = 'backoff'
+
+# Seconds before the first restart after a crash, doubled for each further
+# crash in a row up to MAX_BACKOFF
+INITIAL_BACKOFF = 1
+MAX_BACKOFF = 5 * 60
+# A server running at least this many seconds didn't crash in a row
+STABLE_UPTIME = 60
+
+# Seconds a server has to stop after STOP_COMMAND before it is terminated,
+# and after that before it is killed
+STOP_TIMEOUT = 60
+KILL_TIMEOUT = 10
+
+READ_SIZE = 64 * 1024
+
+# Seconds run_command waits for the expected output
+DEFAULT_COMMAND_TIMEOUT = 60
+
+# Longest the event loop sleeps when nothing is scheduled (so exits of
+# processes which closed their stdout early are still noticed)
+MAX_POLL_INTERVAL = 1
+
+
+class SupervisorError(Exception): pass
+
+
+class JvmOptions(collections.namedtuple(
+    'JvmOptions', ['java', 'min_heap', 'max_heap', 'gc_flags', 'extra_flags'],
+)):
+    """How the JVM of a server is started.
+
+    Properties:
+        java - Path of the java executable
+        min_heap - Initial heap size (-Xms) such as '1G'
+        max_heap - Maximum heap size (-Xmx) such as '2G'
+        gc_flags - Sequence of garbage collector flags
+        extra_flags - Sequence of any other JVM flags
+    """
+    __slots__ = ()
+
+    def __new__(
+        cls,
+        java=DEFAULT_JAVA,
+        min_heap=DEFAULT_HEAP,
+        max_heap=DEFAULT_HEAP,
+        gc_flags=DEFAULT_GC_FLAGS,
+        extra_flags=(),
+    ):
+        return super(JvmOptions, cls).__new__(
+            cls, java, min_heap, max_heap, tuple(gc_flags), tuple(extra_flags),
+        )
+
+    def get_command(self, jar_path):
+        return (
+            [self.java, '-Xms' + self.min_heap, '-Xmx' + self.max_heap] +
+            list(self.gc_flags) +
+            list(self.extra_flags) +
+            ['-jar', jar_path, 'nogui']
+        )
+
+
+def get_server_jar_path(jar_type, user_jar_name):
+    """Returns the path of the latest downloaded jar of a user jar (a link
+    into the jar store).
+    """
+    jar_downloader = get_jar_downloader_map()[jar_type](
+        get_jar_directory(jar_type, user_jar_name),
+    )
+    return jar_downloader.get_jar_path(
+        jar_downloader.latest_downloaded_version.short_version,
+    )
+
+def _set_nonblocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+class ManagedServer(object):
+    """A ManagedServer is a UserServer whose JVM is run by a Supervisor.
+
+    All of the methods are called from the Supervisor's event loop.
+    """
+
+    def __init__(self, name, user_server, jar_path, jvm_options=JvmOptions()):
+        """Initialize a ManagedServer.
+
+        Args:
+            name - Name the server is managed under
+            user_server - UserServer of the server directory
+            jar_path - Path of the server jar (see get_server_jar_path)
+            jvm_options - JvmOptions to start the JVM with
+        """
+        self.name = name
+        self.user_server = user_server
+        self.jar_path = jar_path
+        self.jvm_options = jvm_options
+        self.state = STOPPED
+        self.process = None
+        self.started_at = None
+        self.returncode = None
+        # Why the last start failed (None if it didn't)
+        self.error = None
+        # Number of crashes in a row
+        self.crashes = 0
+        # Time of the next restart / termination (depending on the state)
+        self.deadline = None
+        self._terminated = False
+        self._partial_line = ''
+        # Console input not taken by the stdin pipe yet
+        self._pending_input = ''
+        # Functions called with (server, line) for each line of output
+        self.output_listeners = []
+
+    @property
+    def pid(self):
+        return None if self.process is None else self.process.pid
+
+    @property
+    def pid_path(self):
+        return os.path.join(self.user_server.server_dir, PID_FILENAME)
+
+    @property
+    def command(self):
+        return self.jvm_options.get_command(self.jar_path)
+
+    def start(self, now):
+        """Starts the JVM.  Returns whether it started, a server which can't
+        be started (java is missing for instance) backs off like a crashed one.
+        """
+        self.started_at = now
+        self.returncode = None
+        self._terminated = False
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                cwd=self.user_server.server_dir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                close_fds=True,
+            )
+        except OSError as e:
+            self.process = None
+            self.error = 'Could not start: {0}'.format(e)
+            self._back_off(now)
+            return False
+        self.error = None
+        self._pending_input = ''
+        # A server which stops reading its console must not block the loop
+        _set_nonblocking(self.process.stdin.fileno())
+        _set_nonblocking(self.process.stdout.fileno())
+        with open(self.pid_path, 'w') as pid_file:
+            pid_file.write('{0}\n'.format(self.process.pid))
+        self.state = RUNNING
+        self.deadline = None
+        return True
+
+    @property
+    def has_pending_input(self):
+        return bool(self._pending_input)
+
+    def send_command(self, command):
+        """Writes a console command to the server's stdin, what the pipe
+        doesn't take right away is written by write_input.  Returns whether
+        the server was running to receive it.
+        """
+        if self.state not in (RUNNING, STOPPING):
+            return False
+        self._pending_input += command + '\n'
+        return self.write_input() is not None
+
+    def write_input(self):
+        """Writes as much of the pending input as the stdin pipe takes.
+        Returns the number of bytes still pending or None once the input is
+        closed.
+        """
+        while self._pending_input:
+            try:
+                written = os.write(
+                    self.process.stdin.fileno(), self._pending_input,
+                )
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                # The server exited, which the event loop notices on its own
+                if e.errno != errno.EPIPE:
+                    raise
+                self._pending_input = ''
+                return None
+            self._pending_input = self._pending_input[written:]
+        return len(self._pending_input)
+
+    def stop(self, now):
+        if self.state == BACKOFF:
+            self.state = STOPPED
+            self.deadline = None
+        elif self.state == RUNNING:
+            self.state = STOPPING
+            self.deadline = now + STOP_TIMEOUT
+            self.send_command(STOP_COMMAND)
+
+    def read_output(self):
+        """Reads the available output and passes complete lines to the
+        output listeners.  Returns the number of bytes read or None once the
+        output is closed.
+        """
+        try:
+            data = os.read(self.process.stdout.fileno(), READ_SIZE)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return 0
+            raise
+        if not data:
+            self._flush_partial_line()
+            return None
+
+        lines, self._partial_line = split_lines(self._partial_line, data)
+        for line in lines:
+            self._emit(line)
+        return len(data)
+
+    def _flush_partial_line(self):
+        if self._partial_line:
+            self._emit(self._partial_line)
+            self._partial_line = ''
+
+    def _emit(self, line):
+        for listener in self.output_listeners:
+            listener(self, line)
+
+    def check_deadline(self, now):
+        """Restarts a crashed server or terminates a server which doesn't
+        stop once their deadline passed.  Returns whether it restarted.
+        """
+        if self.deadline is None or now < self.deadline:
+            return False
+        if self.state == BACKOFF:
+            return self.start(now)
+        elif self.state == STOPPING:
+            if self._terminated:
+                self.process.kill()
+                self.deadline = None
+            else:
+                self.process.terminate()
+                self._terminated = True
+                self.deadline = now + KILL_TIMEOUT
+        return False
+
+    def check_exited(self, now):
+        """Handles the exit of the process.  Returns whether it exited."""
+        self.returncode = self.process.poll()
+        if self.returncode is None:
+            return False
+
+        # Drain what the server wrote before exiting (a process it started
+        # could still hold the output open so don't wait for the end)
+        while self.read_output():
+            pass
+        self._flush_partial_line()
+        self._pending_input = ''
+        for pipe in (self.process.stdin, self.process.stdout):
+            pipe.close()
+        if os.path.exists(self.pid_path):
+            os.remove(self.pid_path)
+
+        if self.state == STOPPING:
+            self.state = STOPPED
+            self.deadline = None
+            self.crashes = 0
+        else:
+            self._back_off(now)
+        return True
+
+    def _back_off(self, now):
+        """Schedules the restart of a server which crashed."""
+        if now - self.started_at >= STABLE_UPTIME:
+            self.crashes = 0
+        self.crashes += 1
+        self.state = BACKOFF
+        self.deadline = now + min(
+            INITIAL_BACKOFF * 2 ** (self.crashes - 1), MAX_BACKOFF,
+        )
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'state': self.state,
+            'pid': self.pid if self.state in (RUNNING, STOPPING) else None,
+            'returncode': self.returncode,
+            'crashes': self.crashes,
+            'started_at': self.started_at,
+            'error': self.error,
+        }
+
+
+class Supervisor(object):
+    """Runs the JVMs of any number of ManagedServers from a single event loop.
+
+    The loop polls the output of every running server and handles restarts
+    and stop timeouts, so no thread is needed per server.  The public
+    methods may be called from any thread; they are carried out by the loop.
+    """
+
+    def __init__(self, clock=time.time):
+        self.servers = {}
+        # Names of the added servers, known before the loop adds them so the
+        # public methods can reject unknown names right away
+        self._names = set()
+        self._clock = clock
+        self._commands = Queue.Queue()
+        self._wake_read_fd, self._wake_write_fd = os.pipe()
+        _set_nonblocking(self._wake_read_fd)
+        _set_nonblocking(self._wake_write_fd)
+        self._poller = select.poll()
+        self._poller.register(self._wake_read_fd, select.POLLIN)
+        # fd -> ManagedServer whose output is polled
+        self._polled = {}
+        # fd -> ManagedServer whose pending input is polled
+        self._writing = {}
+        self._shutdown_requested = False
+        self._shutting_down = False
+
+    def _wake(self):
+        try:
+            os.write(self._wake_write_fd, 'x')
+        except OSError as e:
+            # The loop is already going to wake up
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def _call(self, func, *args):
+        """Has the event loop call func(*args)."""
+        self._commands.put((func, args))
+        self._wake()
+
+    def _check_name(self, name):
+        if name not in self._names:
+            raise SupervisorError('Unknown server: {0}'.format(name))
+
+    def add_server(self, server, start=True):
+        self._names.add(server.name)
+        self._call(self._add_server, server, start)
+
+    def start(self, name):
+        """Raises SupervisorError if there is no server named name (as do
+        the other methods taking a name).
+        """
+        self._check_name(name)
+        self._call(self._start, name)
+
+    def stop(self, name):
+        self._check_name(name)
+        self._call(self._stop, name)
+
+    def send_command(self, name, command):
+        self._check_name(name)
+        self._call(self._send_command, name, command)
+
+    def run_command(
+        self, name, command, expected_output, timeout=DEFAULT_COMMAND_TIMEOUT,
+    ):
+        """Sends a console command and blocks until a line of output contains
+        expected_output (for instance 'Saved the game' for save-all).  Must
+        not be called from the event loop.
+
+        Raises SupervisorError if the server isn't running or the output
+        doesn't show up within timeout seconds.
+        """
+        self._check_name(name)
+        deadline = time.time() + timeout
+        matched = threading.Event()
+        sent = Queue.Queue(1)
+
+        def listener(_, line):
+            if expected_output in line:
+                matched.set()
+
+        self._call(
+            self._send_command_with_listener, name, command, listener, sent,
+        )
+        try:
+            try:
+                was_sent = sent.get(timeout=timeout)
+            except Queue.Empty:
+                raise SupervisorError('The event loop is not running.')
+            if not was_sent:
+                raise SupervisorError('{0} is not running.'.format(name))
+            matched.wait(max(deadline - time.time(), 0))
+            if not matched.is_set():
+                raise SupervisorError(
+                    'No output of {0!r} from {1}.'.format(command, name),
+                )
+        finally:
+            self._call(self._remove_output_listener, name, listener)
+
+    def shutdown(self):
+        """Stops all of the servers, run() returns once they stopped.  Safe to
+        call from a signal handler.
+        """
+        self._shutdown_requested = True
+        self._wake()
+
+    def _add_server(self, server, start):
+        self.servers[server.name] = server
+        if start:
+            self._start(server.name)
+
+    def _start(self, name):
+        server = self.servers[name]
+        if server.state in (STOPPED, BACKOFF):
+            server.crashes = 0
+            if server.start(self._clock()):
+                self._poll_output(server)
+
+    def _stop(self, name):
+        server = self.servers[name]
+        server.stop(self._clock())
+        self._poll_input(server)
+
+    def _send_command(self, name, command):
+        server = self.servers[name]
+        server.send_command(command)
+        self._poll_input(server)
+
+    def _send_command_with_listener(self, name, command, listener, sent):
+        """Adds an output listener and sends a command, putting whether it was
+        sent into the sent queue.
+        """
+        server = self.servers[name]
+        server.output_listeners.append(listener)
+        sent.put(server.send_command(command))
+        self._poll_input(server)
+
+    def _remove_output_listener(self, name, listener):
+        self.servers[name].output_listeners.remove(listener)
+
+    def _shutdown(self):
+        self._shutting_down = True
+        self._shutdown_requested = False
+        for name in self.servers:
+            self._stop(name)
+
+    def _poll_output(self, server):
+        fd = server.process.stdout.fileno()
+        self._polled[fd] = server
+        self._poller.register(fd, select.POLLIN)
+
+    def _unpoll_output(self, fd):
+        self._poller.unregister(fd)
+        del self._polled[fd]
+
+    def _poll_input(self, server):
+        """Polls for the stdin of a server with pending input to be
+        writable.
+        """
+        if server.has_pending_input:
+            fd = server.process.stdin.fileno()
+            if fd not in self._writing:
+                self._writing[fd] = server
+                self._poller.register(fd, select.POLLOUT)
+
+    def _unpoll_input(self, fd):
+        self._poller.unregister(fd)
+        del self._writing[fd]
+
+    def _get_timeout(self, now):
+        deadlines = [
+            server.deadline for server in self.servers.itervalues()
+            if server.deadline is not None
+        ]
+        timeout = MAX_POLL_INTERVAL
+        if deadlines:
+            timeout = min(timeout, max(min(deadlines) - now, 0))
+        return timeout
+
+    def _run_commands(self):
+        try:
+            while os.read(self._wake_read_fd, READ_SIZE):
+                pass
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+        while True:
+            try:
+                func, args = self._commands.get_nowait()
+            except Queue.Empty:
+                break
+            func(*args)
+        if self._shutdown_requested:
+            self._shutdown()
+
+    def run_once(self, timeout=None):
+        """Runs a single iteration of the event loop, waiting at most timeout
+        seconds (defaults to until the next deadline) for something to happen.
+        """
+        self._run_commands()
+        if timeout is None:
+            timeout = self._get_timeout(self._clock())
+
+        try:
+            events = self._poller.poll(timeout * 1000)
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            events = []
+
+        for fd, _ in events:
+            if fd == self._wake_read_fd:
+                self._run_commands()
+            elif fd in self._polled:
+                if self._polled[fd].read_output() is None:
+                    self._unpoll_output(fd)
+            elif fd in self._writing:
+                if not self._writing[fd].write_input():
+                    self._unpoll_input(fd)
+
+        now = self._clock()
+        for server in self.servers.itervalues():
+            if server.state in (RUNNING, STOPPING):
+                stdout_fd = server.process.stdout.fileno()
+                stdin_fd = server.process.stdin.fileno()
+                if server.check_exited(now):
+                    if stdout_fd in self._polled:
+                        self._unpoll_output(stdout_fd)
+                    if stdin_fd in self._writing:
+                        self._unpoll_input(stdin_fd)
+            if server.check_deadline(now):
+                self._poll_output(server)
+
+    @property
+    def stopped(self):
+        return all(
+            server.state == STOPPED for server in self.servers.itervalues()
+        )
+
+    def run(self):
+        """Runs the event loop until shutdown() and all servers stopped."""
+        while not (self._shutting_down and self.stopped):
+            self.run_once()
+
+    def close(self):
+        os.close(self._wake_read_fd)
+        os.close(self._wake_write_fd)
+
+    def to_dict(self):
+        return dict(
+            (name, server.to_dict())
+            for name, server in self.servers.iteritems()
+        )
+
+
+def _parse_server(arg, jvm_options):
+    """Parses a SERVER_DIR:JAR_TYPE/USER_JAR_NAME argument."""
+    server_dir, _, user_jar = arg.rpartition(':')
+    jar_type, _, user_jar_name = user_jar.partition('/')
+    if not (server_dir and jar_type and user_jar_name):
+        raise ValueError('Expected SERVER_DIR:JAR_TYPE/USER_JAR_NAME')
+    return ManagedServer(
+        os.path.basename(os.path.normpath(server_dir)),
+        UserServer(server_dir),
+        get_server_jar_path(jar_type, user_jar_name),
+        jvm_options,
+    )
+
+def _print_output(managed_server, line):
+    print '[{0}] {1}'.format(managed_server.name, line)
+    sys.stdout.flush()
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options] SERVER_DIR:JAR_TYPE/USER_JAR_NAME...\n\n'
+        'Runs each server with the latest downloaded jar of the user jar, '
+        'restarting servers which crash until interrupted.',
+    )
+    parser.add_option('--java', default=DEFAULT_JAVA, help='java executable.')
+    parser.add_option('--min-heap', default=DEFAULT_HEAP, help='-Xms value.')
+    parser.add_option('--max-heap', default=DEFAULT_HEAP, help='-Xmx value.')
+    parser.add_option(
+        '--gc-flag',
+        action='append', dest='gc_flags',
+        help='Garbage collector flag (repeatable, defaults to {0}).'.format(
+            ' '.join(DEFAULT_GC_FLAGS),
+        ),
+    )
+    opts, args = parser.parse_args(argv)
+    if not args:
+        parser.error('Expected at least one server.')
+
+    jvm_options = JvmOptions(
+        java=opts.java,
+        min_heap=opts.min_heap,
+        max_heap=opts.max_heap,
+        gc_flags=opts.gc_flags or DEFAULT_GC_FLAGS,
+    )
+    try:
+        servers = [_parse_server(arg, jvm_options) for arg in args]
+    except (ValueError, KeyError, AssertionError) as e:
+        parser.error('Invalid server: {0}'.format(e))
+    # Servers are managed under the basename of their directory
+    names = [managed_server.name for managed_server in servers]
+    duplicates = sorted(
+        name for name, count in collections.Counter(names).iteritems()
+        if count > 1
+    )
+    if duplicates:
+        parser.error('Duplicate server name: {0}'.format(
+            ', '.join(duplicates),
+        ))
+
+    supervisor = Supervisor()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: supervisor.shutdown())
+    for managed_server in servers:
+        managed_server.output_listeners.append(_print_output)
+        supervisor.add_server(managed_server)
+    try:
+        supervisor.run()
+    finally:
+        supervisor.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
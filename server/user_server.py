@@ -1,10 +1,63 @@
 
+import os
 import os.path
+import re
+import threading
+import time
 
-from util.properties import Properties
+import config.application
+from server.console_log import get_server_console
+from server.rcon import get_rcon_pool
+from util.fs_watch import RACY_MTIME_WINDOW
+from util.properties import FrozenProperties
 
 SERVER_PROPERTIES_FILENAME = 'server.properties'
 
+SERVER_NAME_REGEX = re.compile('^[a-zA-Z0-9-_]+$')
+
+def get_server_dir(server_name):
+    return os.path.join(config.application.SERVERS_PATH, server_name)
+
+# Maps server.properties path to (stat key, FrozenProperties)
+_server_properties_cache = {}
+_server_properties_cache_lock = threading.Lock()
+
+def load_server_properties(path):
+    """Returns the FrozenProperties of the properties file at path.  Files
+    are only parsed again once their mtime, size or inode changes (or while
+    their mtime is too recent to be trusted) so in the steady state this
+    costs a single stat.
+
+    Raises IOError if the file can't be read (like open() would).
+    """
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        # Don't hold on to removed servers
+        with _server_properties_cache_lock:
+            _server_properties_cache.pop(path, None)
+        raise IOError(e.errno, e.strerror, path)
+    stat_key = (stat.st_mtime, stat.st_size, stat.st_ino)
+
+    with _server_properties_cache_lock:
+        cached = _server_properties_cache.get(path)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
+
+    with open(path, 'r') as server_properties_file:
+        server_properties = FrozenProperties.load(server_properties_file)
+    if time.time() - stat.st_mtime < RACY_MTIME_WINDOW:
+        # The file could still change without changing its mtime, cache it
+        # but don't trust it next time
+        stat_key = None
+    with _server_properties_cache_lock:
+        _server_properties_cache[path] = (stat_key, server_properties)
+    return server_properties
+
+def clear_server_properties_cache():
+    with _server_properties_cache_lock:
+        _server_properties_cache.clear()
+
 class UserServer(object):
     """Class repesenting a user's server.  A server has settings to configure
     a jar for which the minecraft server runs on.
@@ -20,5 +73,16 @@ class UserServer(object):
 
     @property
     def server_properties(self):
-        with open(self.server_properties_path, 'r') as server_properties_file:
-            return Properties.load(server_properties_file)
+        """Snapshot of the server's properties, see load_server_properties.
+        """
+        return load_server_properties(self.server_properties_path)
+
+    @property
+    def console(self):
+        """The ServerConsole of the server."""
+        return get_server_console(self.server_dir)
+
+    @property
+    def rcon(self):
+        """The RconPool of the server, see get_rcon_pool."""
+        return get_rcon_pool(self)
@@ -20,6 +20,10 @@ class PymsmServerTestCase(FlaskTestCase, TempdirTestCase):
         self.app_root = self.tempdir
         self.data_path = os.path.join(self.app_root, 'data')
         self.jars_path = os.path.join(self.data_path, 'jars')
+        self.cache_path = os.path.join(self.data_path, 'cache')
+        self.jar_store_path = os.path.join(self.data_path, 'store')
+        self.servers_path = os.path.join(self.data_path, 'servers')
+        self.backups_path = os.path.join(self.data_path, 'backups')
         with contextlib.nested(
             mock.patch.object(
                 config.application, 'APP_ROOT', self.app_root,
@@ -30,5 +34,17 @@ class PymsmServerTestCase(FlaskTestCase, TempdirTestCase):
             mock.patch.object(
                 config.application, 'JARS_PATH', self.jars_path,
             ),
+            mock.patch.object(
+                config.application, 'CACHE_PATH', self.cache_path,
+            ),
+            mock.patch.object(
+                config.application, 'JAR_STORE_PATH', self.jar_store_path,
+            ),
+            mock.patch.object(
+                config.application, 'SERVERS_PATH', self.servers_path,
+            ),
+            mock.patch.object(
+                config.application, 'BACKUPS_PATH', self.backups_path,
+            ),
         ):
             yield
@@ -0,0 +1,112 @@
+
+import BaseHTTPServer
+import contextlib
+import hashlib
+import re
+import threading
+
+RANGE_RE = re.compile('^bytes=(\d+)-$')
+
+# Seconds between shutdown checks of the serving thread
+POLL_INTERVAL = 0.01
+
+class FakeHttpServer(object):
+    """A FakeHttpServer serves in-memory files over http on localhost.
+
+    It understands Range / If-Range requests and can be told to drop
+    connections part way through a response to simulate a flaky link.
+
+    Usage:
+
+    with FakeHttpServer({'/foo.jar': 'contents'}).serving() as server:
+        urllib2.urlopen(server.url('/foo.jar'))
+    """
+
+    def __init__(self, files=None):
+        """Initialize a FakeHttpServer.
+
+        Args:
+            files - dict mapping url path to file contents.
+        """
+        self.files = dict(files or {})
+        # Each entry is the number of bytes to send before dropping the
+        # connection on a subsequent response (None sends all of it)
+        self.drop_after = []
+        # Received request headers, one dict per request
+        self.requests = []
+        self._server = None
+
+    @classmethod
+    def get_etag(cls, contents):
+        return '"{0}"'.format(hashlib.sha1(contents).hexdigest())
+
+    def url(self, path):
+        return 'http://127.0.0.1:{0}{1}'.format(
+            self._server.server_address[1], path,
+        )
+
+    def _get_handler_cls(self):
+        fake_server = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake_server.requests.append(dict(self.headers.items()))
+                if self.path not in fake_server.files:
+                    self.send_error(404)
+                    return
+
+                contents = fake_server.files[self.path]
+                etag = fake_server.get_etag(contents)
+                offset = 0
+                range_match = RANGE_RE.match(self.headers.get('Range', ''))
+                if_range = self.headers.get('If-Range')
+                if range_match and (if_range is None or if_range == etag):
+                    offset = int(range_match.group(1))
+                    if offset >= len(contents):
+                        self.send_error(416)
+                        return
+
+                if offset:
+                    self.send_response(206)
+                    self.send_header(
+                        'Content-Range',
+                        'bytes {0}-{1}/{2}'.format(
+                            offset, len(contents) - 1, len(contents),
+                        ),
+                    )
+                else:
+                    self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', len(contents) - offset)
+                self.end_headers()
+
+                body = contents[offset:]
+                if fake_server.drop_after:
+                    body = body[:fake_server.drop_after.pop(0)]
+                self.wfile.write(body)
+
+        return Handler
+
+    @contextlib.contextmanager
+    def serving(self):
+        """Serves on an ephemeral port for the duration of the context."""
+        self._server = BaseHTTPServer.HTTPServer(
+            ('127.0.0.1', 0), self._get_handler_cls(),
+        )
+        thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={'poll_interval': POLL_INTERVAL},
+        )
+        thread.daemon = True
+        thread.start()
+        try:
+            yield self
+        finally:
+            # The socket is only closed once the serving thread is done with
+            # it, otherwise its select fails on the closed socket
+            self._server.shutdown()
+            thread.join()
+            self._server.server_close()
@@ -0,0 +1,144 @@
+import contextlib
+import socket
+import SocketServer
+import threading
+
+from server.rcon import AUTH_FAILED_ID
+from server.rcon import AUTH_RESPONSE
+from server.rcon import COMMAND
+from server.rcon import encode_packet
+from server.rcon import LOGIN
+from server.rcon import RconError
+from server.rcon import read_packet
+from server.rcon import RESPONSE_VALUE
+
+# Size minecraft splits long outputs into
+FRAGMENT_SIZE = 4096
+
+# Seconds between shutdown checks of the serving thread
+POLL_INTERVAL = 0.01
+
+class FakeRconServer(object):
+    """A FakeRconServer speaks the RCON protocol like a minecraft server on
+    localhost.
+
+    Usage:
+
+    with FakeRconServer('hunter2', {'list': 'There are 0 players'}).serving(
+    ) as server:
+        RconConnection(RconConfig('127.0.0.1', server.port, 'hunter2'))
+    """
+
+    def __init__(self, password, responses=None):
+        """Initialize a FakeRconServer.
+
+        Args:
+            password - rcon.password
+            responses - dict mapping command to output, unknown commands
+                output 'Unknown command'
+        """
+        self.password = password
+        self.responses = dict(responses or {})
+        # Commands received by logged in connections
+        self.commands = []
+        # Number of connections made
+        self.connections = 0
+        self._sockets = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def drop_connections(self):
+        """Closes every open connection (like a restarting server)."""
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            # Shutting down wakes up the handler blocked reading the socket
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            sock.close()
+
+    def _get_handler_cls(self):
+        fake_server = self
+
+        class Handler(SocketServer.BaseRequestHandler):
+            def handle(self):
+                with fake_server._lock:
+                    fake_server.connections += 1
+                    fake_server._sockets.append(self.request)
+                logged_in = False
+                while True:
+                    try:
+                        request_id, packet_type, payload = read_packet(
+                            self.request,
+                        )
+                    except (RconError, IOError):
+                        return
+
+                    if packet_type == LOGIN:
+                        logged_in = payload == fake_server.password
+                        self._send(
+                            request_id if logged_in else AUTH_FAILED_ID,
+                            AUTH_RESPONSE,
+                            '',
+                        )
+                    elif not logged_in:
+                        self._send(AUTH_FAILED_ID, AUTH_RESPONSE, '')
+                    elif packet_type == COMMAND:
+                        fake_server.commands.append(payload)
+                        self._send_output(
+                            request_id,
+                            fake_server.responses.get(
+                                payload, 'Unknown command',
+                            ),
+                        )
+                    else:
+                        self._send(
+                            request_id,
+                            RESPONSE_VALUE,
+                            'Unknown request {0:x}'.format(packet_type),
+                        )
+
+            def _send_output(self, request_id, output):
+                fragments = [
+                    output[i:i + FRAGMENT_SIZE]
+                    for i in xrange(0, len(output), FRAGMENT_SIZE)
+                ] or ['']
+                for fragment in fragments:
+                    self._send(request_id, RESPONSE_VALUE, fragment)
+
+            def _send(self, request_id, packet_type, payload):
+                try:
+                    self.request.sendall(
+                        encode_packet(request_id, packet_type, payload),
+                    )
+                except IOError:
+                    pass
+
+        return Handler
+
+    @contextlib.contextmanager
+    def serving(self):
+        """Serves on an ephemeral port for the duration of the context."""
+        self._server = SocketServer.ThreadingTCPServer(
+            ('127.0.0.1', 0), self._get_handler_cls(),
+        )
+        self._server.daemon_threads = True
+        thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={'poll_interval': POLL_INTERVAL},
+        )
+        thread.daemon = True
+        thread.start()
+        try:
+            yield self
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+            self.drop_connections()
+            thread.join()
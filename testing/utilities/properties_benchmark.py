@@ -0,0 +1,178 @@
+"""Benchmarks util.properties loading against the reference implementation it
+replaced.
+
+Usage: python -m testing.utilities.properties_benchmark [num_keys]
+"""
+import random
+import re
+import sys
+import timeit
+
+from util.properties import COMMENT_RE
+from util.properties import InvalidPropertiesFileError
+from util.properties import KEY_ESCAPED_CHARACTERS
+from util.properties import Properties
+from util.properties import VALUE_ESCAPED_CHARACTERS
+
+DEFAULT_NUM_KEYS = 5000
+NUMBER = 5
+
+# Escaped snippets (and plain text) values and keys are built from
+ESCAPED_SNIPPETS = (
+    r'\=', r'\:', r'\#', r'\!', r'\ ', r'\\', r'\t', r'\n', r'\u00e9', 'plain',
+)
+
+def generate_properties(num_keys, seed=0):
+    """Returns the text of a server.properties-like file with heavily escaped
+    keys and values, comments and continued lines.
+    """
+    rand = random.Random(seed)
+
+    def snippet():
+        return ''.join(rand.choice(ESCAPED_SNIPPETS) for _ in xrange(4))
+
+    lines = ['#Minecraft server properties', '#Generated for benchmarking']
+    for i in xrange(num_keys):
+        key = 'key-{0}-{1}'.format(i, snippet())
+        value = snippet()
+        if i % 10 == 0:
+            lines.append('! a comment')
+            lines.append('{0} = {1}\\'.format(key, value))
+            lines.append('    {0}'.format(snippet()))
+        else:
+            lines.append('{0}={1}'.format(key, value))
+    return '\n'.join(lines) + '\n'
+
+
+# The rest of this module is the implementation Properties.loads replaced
+
+# Line continuation regex matches an odd number of backslashes terminating a
+# line
+LINE_CONTINUATION_RE = re.compile(
+    r'''
+        # beginning of string or non backslash character
+        (\A|[^\\])
+        # An odd number of backslashes
+        [\\](\\\\)*
+        # Terminating the string
+        $
+    ''',
+    re.VERBOSE,
+)
+
+UNESCAPE_RE_SKELETON = r'''
+    (
+        # Beginning of string or a non-backslash character
+        (?:\A|[^\\])
+        # A chunk of even regexes
+        (?:\\\\)*
+    )
+    # Our replace character is 0
+    \\[{0}]
+'''
+
+def _blank_line_stripping_helper(iterable):
+    """Skips blank lines as described in java.util.Properties:
+        A natural line that contains only white space characters is considered
+        blank and is ignored.
+
+    Args:
+        iterable - An iterable of lines
+    """
+    for line in iterable:
+        if line.strip():
+            yield line
+
+def _comment_stripping_helper(iterable):
+    """Generator to strip comments from a properties file.
+
+    Args:
+        iterable - An iterable of lines
+    """
+    for line in iterable:
+        if not COMMENT_RE.search(line):
+            yield line
+
+def _line_continuation_helper(iterable):
+    """Generator to assist with line continuation as described in
+    java.util.Properties:
+        A logical line holds all the data of a key-element pair, which may be
+        spread out across several adjacent natural lines by escaping the line
+        terminator sequence with a backslash character \.
+
+    Args:
+        iterable - An iterable of lines
+    """
+    lines = iter(iterable)
+    for line in lines:
+        while LINE_CONTINUATION_RE.search(line):
+            try:
+                line = line[:-1] + lines.next().lstrip()
+            except StopIteration:
+                raise InvalidPropertiesFileError('Unexpected EOF')
+        yield line
+
+def _legacy_split(line):
+    line = line.lstrip()
+    position = 0
+    in_escape = False
+    while not (
+        position == len(line) or
+        (not in_escape and line[position] in (' ', '\t', '\f', '=', ':'))
+    ):
+        in_escape = not in_escape and line[position] == '\\'
+        position += 1
+    value = line[position:].lstrip()
+    if len(value) and value[0] in ('=', ':'):
+        value = value[1:].lstrip()
+    return line[:position], value
+
+def _legacy_decode_chars(s, chars):
+    for char in chars:
+        unescape_re = re.compile(
+            UNESCAPE_RE_SKELETON.format(char), re.VERBOSE,
+        )
+        while unescape_re.search(s):
+            s = unescape_re.sub(r'\1{0}'.format(char), s)
+    return s
+
+def legacy_loads(s):
+    """The character by character implementation Properties.loads replaced,
+    kept as a reference for the output and the speed.
+    """
+    values = {}
+    for line in _line_continuation_helper(
+        _comment_stripping_helper(_blank_line_stripping_helper(
+            s.splitlines()
+        ))
+    ):
+        key, value = _legacy_split(line)
+        key = _legacy_decode_chars(key, KEY_ESCAPED_CHARACTERS)
+        value = _legacy_decode_chars(value, VALUE_ESCAPED_CHARACTERS)
+        values[key.decode('unicode_escape')] = value.decode('unicode_escape')
+    return Properties(values)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    num_keys = int(argv[0]) if argv else DEFAULT_NUM_KEYS
+    text = generate_properties(num_keys)
+
+    if Properties.loads(text) != legacy_loads(text):
+        print 'Outputs differ!'
+        return 1
+
+    legacy_time = min(timeit.repeat(
+        lambda: legacy_loads(text), number=1, repeat=NUMBER,
+    ))
+    new_time = min(timeit.repeat(
+        lambda: Properties.loads(text), number=1, repeat=NUMBER,
+    ))
+    print '{0} keys ({1} bytes), identical output'.format(num_keys, len(text))
+    print 'legacy: {0:.3f}s'.format(legacy_time)
+    print 'Properties.loads: {0:.3f}s'.format(new_time)
+    print 'speedup: {0:.1f}x'.format(legacy_time / new_time)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import contextlib
+import cStringIO
+import mock
+import os
+import os.path
+import simplejson
+import sys
+import testify as T
+
+import config.application
+import jar_downloader.bulk_import
+import jar_downloader.config_form
+from jar_downloader.bulk_import import format_result
+from jar_downloader.bulk_import import import_jars
+from jar_downloader.bulk_import import ImportResult
+from jar_downloader.bulk_import import InvalidRow
+from jar_downloader.bulk_import import main
+from jar_downloader.bulk_import import read_csv_rows
+from jar_downloader.bulk_import import read_json_lines_rows
+from jar_downloader.helpers import CONFIG_FILE
+from jar_downloader.helpers import get_jar_directory
+from jar_downloader.vanilla_jar_downloader import VanillaJarDownloader
+from schemaform.form import Form
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+from testing.data.generators import get_fake_jar_downloader_cls
+
+FakeJarDownloader = get_fake_jar_downloader_cls('FakeJarDownloader', {
+    'type': 'object',
+    'properties': {
+        'port': {'type': 'integer'},
+        'motd': {
+            'type': 'object',
+            'properties': {'text': {'type': 'string'}},
+        },
+    },
+    'required': ['port'],
+})
+
+JAR_DOWNLOADER_MAP = {'FakeJarDownloader': FakeJarDownloader}
+
+def get_row(user_jar_name, **config):
+    row = {
+        'jar_downloader': 'FakeJarDownloader', 'user_jar_name': user_jar_name,
+    }
+    row.update(config)
+    return row
+
+class TestImportJars(TempdirTestCase):
+
+    @T.setup_teardown
+    def patch_jars_path(self):
+        with mock.patch.object(config.application, 'JARS_PATH', self.tempdir):
+            yield
+
+    def import_jars(self, rows, **kwargs):
+        return list(import_jars(
+            rows, jar_downloader_map=JAR_DOWNLOADER_MAP, **kwargs
+        ))
+
+    def get_config(self, user_jar_name):
+        config_path = os.path.join(
+            get_jar_directory('FakeJarDownloader', user_jar_name), CONFIG_FILE,
+        )
+        with open(config_path, 'r') as config_file:
+            return simplejson.load(config_file)
+
+    def test_creates_valid_rows(self):
+        results = self.import_jars([
+            get_row('a', port='25565', **{'motd.text': 'hi'}),
+            get_row('b', port='25566'),
+        ])
+        T.assert_equal(results, [
+            ImportResult(1, 'FakeJarDownloader', 'a', True, {}),
+            ImportResult(2, 'FakeJarDownloader', 'b', True, {}),
+        ])
+        T.assert_equal(
+            self.get_config('a'), {'port': 25565, 'motd': {'text': 'hi'}},
+        )
+        T.assert_equal(self.get_config('b'), {'port': 25566})
+
+    def test_reports_errors_per_row(self):
+        results = self.import_jars([
+            get_row('a', port='nope'),
+            get_row('b'),
+            get_row('c', port='1'),
+        ])
+        T.assert_equal(results, [
+            ImportResult(
+                1, 'FakeJarDownloader', 'a', False,
+                {'port': "'nope' is not of type 'integer'"},
+            ),
+            ImportResult(
+                2, 'FakeJarDownloader', 'b', False,
+                {'port': "'port' is a required property"},
+            ),
+            ImportResult(3, 'FakeJarDownloader', 'c', True, {}),
+        ])
+        T.assert_equal(
+            os.listdir(os.path.join(self.tempdir, 'FakeJarDownloader')),
+            ['c'],
+        )
+
+    def test_unknown_jar_type(self):
+        results = self.import_jars([
+            {'jar_downloader': 'Nope', 'user_jar_name': 'a'},
+        ])
+        T.assert_equal(results, [ImportResult(
+            1, 'Nope', 'a', False,
+            {'jar_downloader': 'Unknown jar type: Nope'},
+        )])
+
+    def test_config_with_its_own_jar_type(self):
+        results = list(import_jars(
+            [
+                {
+                    'jar_downloader': 'VanillaJarDownloader',
+                    'user_jar_name': 'a',
+                    'jar_type': 'snapshot',
+                },
+                {
+                    'jar_downloader': 'VanillaJarDownloader',
+                    'user_jar_name': 'b',
+                    'jar_type': 'nope',
+                },
+            ],
+            jar_downloader_map={'VanillaJarDownloader': VanillaJarDownloader},
+        ))
+        T.assert_equal(results, [
+            ImportResult(1, 'VanillaJarDownloader', 'a', True, {}),
+            ImportResult(
+                2, 'VanillaJarDownloader', 'b', False,
+                {'jar_type': "'nope' is not one of ['release', 'snapshot']"},
+            ),
+        ])
+        config_path = os.path.join(
+            get_jar_directory('VanillaJarDownloader', 'a'), CONFIG_FILE,
+        )
+        with open(config_path, 'r') as config_file:
+            T.assert_equal(
+                simplejson.load(config_file), {'jar_type': 'snapshot'},
+            )
+
+    def test_invalid_rows(self):
+        results = self.import_jars([
+            InvalidRow('Invalid json on line 1: nope'),
+            get_row('a', port='1'),
+        ])
+        T.assert_equal(results, [
+            ImportResult(
+                1, None, None, False,
+                {'row': 'Invalid json on line 1: nope'},
+            ),
+            ImportResult(2, 'FakeJarDownloader', 'a', True, {}),
+        ])
+
+    def test_invalid_user_jar_name(self):
+        results = self.import_jars([get_row('../a', port='1')])
+        T.assert_equal(
+            results[0].errors, {'user_jar_name': 'Invalid jar name: ../a'},
+        )
+
+    def test_duplicate_rows(self):
+        results = self.import_jars([
+            get_row('a', port='1'), get_row('a', port='2'),
+        ])
+        T.assert_equal(
+            [result.errors for result in results],
+            [{}, {'user_jar_name': 'Jar already exists.'}],
+        )
+        T.assert_equal(self.get_config('a'), {'port': 1})
+
+    def test_dry_run_creates_nothing(self):
+        results = self.import_jars(
+            [get_row('a', port='1'), get_row('a', port='2')], dry_run=True,
+        )
+        T.assert_equal(results, [
+            ImportResult(1, 'FakeJarDownloader', 'a', False, {}),
+            ImportResult(
+                2, 'FakeJarDownloader', 'a', False,
+                {'user_jar_name': 'Jar already exists.'},
+            ),
+        ])
+        T.assert_equal(os.listdir(self.tempdir), [])
+
+    def test_form_is_built_once_per_jar_type(self):
+        with contextlib.nested(
+            mock.patch.object(
+                jar_downloader.config_form, 'Form', wraps=Form,
+            ),
+            mock.patch.dict(
+                jar_downloader.config_form._compiled_forms, clear=True,
+            ),
+        ) as (Form_mock, _):
+            self.import_jars([get_row(name, port='1') for name in 'abc'])
+            T.assert_equal(Form_mock.call_count, 1)
+
+    def test_boolean_columns(self):
+        jar_downloader_cls = get_fake_jar_downloader_cls('BooleanJar', {
+            'type': 'object',
+            'properties': {'online': {'type': 'boolean'}},
+        })
+        results = list(import_jars(
+            [
+                {'jar_downloader': 'BooleanJar', 'user_jar_name': name,
+                 'online': online}
+                for name, online in (('a', 'FALSE'), ('b', '1'), ('c', 'y'))
+            ],
+            jar_downloader_map={'BooleanJar': jar_downloader_cls},
+        ))
+        T.assert_equal(
+            [result.errors for result in results],
+            [{}, {}, {'online': "'y' is not of type 'boolean'"}],
+        )
+        for user_jar_name, online in (('a', False), ('b', True)):
+            config_path = os.path.join(
+                get_jar_directory('BooleanJar', user_jar_name), CONFIG_FILE,
+            )
+            with open(config_path, 'r') as config_file:
+                T.assert_equal(
+                    simplejson.load(config_file), {'online': online},
+                )
+
+    def test_results_are_streamed(self):
+        def rows():
+            yield get_row('a', port='1')
+            raise AssertionError('Read too far.')
+
+        results = import_jars(rows(), jar_downloader_map=JAR_DOWNLOADER_MAP)
+        T.assert_equal(next(results).created, True)
+
+    def test_main(self):
+        input_path = os.path.join(self.tempdir, 'jars.csv')
+        with open(input_path, 'w') as input_file:
+            input_file.write(
+                'jar_downloader,user_jar_name,port,motd.text\n'
+                'FakeJarDownloader,a,1,\n'
+                'FakeJarDownloader,b,x,hi\n'
+            )
+        with contextlib.nested(
+            mock.patch.object(
+                jar_downloader.bulk_import,
+                'get_jar_downloader_map',
+                return_value=JAR_DOWNLOADER_MAP,
+            ),
+            mock.patch.object(sys, 'stdout', cStringIO.StringIO()),
+        ) as (
+            _,
+            stdout,
+        ):
+            T.assert_equal(main([input_path]), 1)
+            T.assert_equal(
+                stdout.getvalue(),
+                'row 1 (FakeJarDownloader/a): created\n'
+                "row 2 (FakeJarDownloader/b): error: port: 'x' is not of type "
+                "'integer'\n",
+            )
+        T.assert_equal(self.get_config('a'), {'port': 1})
+
+
+class TestReadCsvRows(T.TestCase):
+
+    def test_empty_cells_are_left_out(self):
+        rows = read_csv_rows(cStringIO.StringIO('a,b\n1,\n'))
+        T.assert_equal(list(rows), [{'a': '1'}])
+
+
+class TestReadJsonLinesRows(T.TestCase):
+
+    def test_invalid_lines_are_reported(self):
+        rows = list(read_json_lines_rows(cStringIO.StringIO(
+            '{"a": "1"}\n\n{nope\n[1]\n{"b": "2"}\n',
+        )))
+        T.assert_equal(rows[0], {'a': '1'})
+        T.assert_isinstance(rows[1], InvalidRow)
+        T.assert_equal(
+            rows[1].error.startswith('Invalid json on line 3: '), True,
+        )
+        T.assert_equal(
+            rows[2], InvalidRow('Expected a json object on line 4.'),
+        )
+        T.assert_equal(rows[3], {'b': '2'})
+
+
+class TestFormatResult(T.TestCase):
+
+    def test_valid(self):
+        T.assert_equal(
+            format_result(ImportResult(1, 'A', 'a', False, {})),
+            'row 1 (A/a): valid',
+        )
+
+    def test_errors_are_sorted(self):
+        T.assert_equal(
+            format_result(
+                ImportResult(2, 'A', 'a', False, {'b': 'x', 'a': 'y'}),
+            ),
+            'row 2 (A/a): error: a: y; b: x',
+        )
@@ -0,0 +1,91 @@
+import contextlib
+import mock
+import pyquery
+import testify as T
+
+import jar_downloader.config_form
+from jar_downloader.config_form import get_compiled_form
+from testing.data.generators import get_fake_jar_downloader_cls
+
+class TestGetCompiledForm(T.TestCase):
+
+    @T.setup_teardown
+    def patch_out_jar_downloader_map(self):
+        with contextlib.nested(
+            mock.patch.object(
+                jar_downloader.config_form,
+                'get_jar_downloader_map',
+                autospec=True,
+            ),
+            mock.patch.dict(
+                jar_downloader.config_form._compiled_forms, clear=True,
+            ),
+        ) as (self.get_jar_downloader_map_mock, _):
+            self.get_jar_downloader_map_mock.return_value = {
+                'A': get_fake_jar_downloader_cls('A'),
+            }
+            yield
+
+    def test_action_is_substituted(self):
+        ret_pq = pyquery.PyQuery(
+            get_compiled_form('A').render('/create_jar/A?a=1&b=2'),
+        )
+        T.assert_equal(ret_pq.attr('action'), '/create_jar/A?a=1&b=2')
+
+    def test_unknown_jar_type(self):
+        with T.assert_raises(KeyError):
+            get_compiled_form('B')
+
+    def test_jar_downloader_map(self):
+        jar_downloader_cls = get_fake_jar_downloader_cls('B')
+        compiled_form = get_compiled_form('B', {'B': jar_downloader_cls})
+        T.assert_is(compiled_form.jar_downloader_cls, jar_downloader_cls)
+        T.assert_equal(self.get_jar_downloader_map_mock.call_count, 0)
+
+    def test_compiled_form_is_reused(self):
+        compiled_form = get_compiled_form('A')
+        with contextlib.nested(
+            mock.patch.object(
+                jar_downloader.config_form, 'Form', autospec=True,
+            ),
+            mock.patch.object(
+                jar_downloader.config_form,
+                'get_schema_fingerprint',
+                autospec=True,
+            ),
+        ) as (Form_mock, get_schema_fingerprint_mock):
+            T.assert_is(get_compiled_form('A'), compiled_form)
+            T.assert_equal(Form_mock.call_count, 0)
+            T.assert_equal(get_schema_fingerprint_mock.call_count, 0)
+
+    def test_compiled_form_is_reused_for_a_new_class_with_the_same_schema(
+        self,
+    ):
+        compiled_form = get_compiled_form('A')
+        jar_downloader_cls = get_fake_jar_downloader_cls(
+            'A', compiled_form.jar_downloader_cls.get_config_schema(),
+        )
+        self.get_jar_downloader_map_mock.return_value = {
+            'A': jar_downloader_cls,
+        }
+        new_compiled_form = get_compiled_form('A')
+        T.assert_is(new_compiled_form.form, compiled_form.form)
+        T.assert_is(new_compiled_form.jar_downloader_cls, jar_downloader_cls)
+
+    def test_compiled_form_is_rebuilt_for_a_new_class(self):
+        compiled_form = get_compiled_form('A')
+        jar_downloader_cls = get_fake_jar_downloader_cls('A', {
+            'type': 'object', 'properties': {'baz': {}},
+        })
+        self.get_jar_downloader_map_mock.return_value = {
+            'A': jar_downloader_cls,
+        }
+        new_compiled_form = get_compiled_form('A')
+        T.assert_is_not(new_compiled_form, compiled_form)
+        T.assert_is(new_compiled_form.jar_downloader_cls, jar_downloader_cls)
+        T.assert_length(
+            pyquery.PyQuery(new_compiled_form.render('')).find(
+                'input[name=baz]',
+            ),
+            1,
+        )
@@ -3,15 +3,27 @@ import mock
 import os
 import os.path
 import testify as T
+import time
+
+import config.application
 
 import jar_downloader.discovery
 from jar_downloader.discovery import get_jar_downloaders
+from jar_downloader.discovery import JAR_DOWNLOADER_DIRECTORY
+from jar_downloader.discovery import load_manifest
+from jar_downloader.discovery import write_manifest
 from jar_downloader.discovery import get_jar_downloader_map
 from jar_downloader.discovery import get_user_jars
 from jar_downloader.discovery import is_jar_downloader
+from jar_downloader.discovery import scan_user_jars
+from jar_downloader.discovery import UserJarRegistry
 from jar_downloader.helpers import get_jar_directory
 from jar_downloader.jar_downloader_base import JarDownloaderBase
+from testing.base_classes.tempdir_test_case import TempdirTestCase
 from testing.utilities.mock_returns import MockReturns
+from util.discovery import discover
+from util.fs_watch import InotifyWatcher
+from util.fs_watch import MtimeWatcher
 
 class TestIsJarDownloader(T.TestCase):
     """Tests the is_jar_downloader method."""
@@ -40,11 +52,41 @@ class TestIsJarDownloader(T.TestCase):
 
         T.assert_equal(is_jar_downloader(ButIAm), True)
 
-class TestGetJarDownloaders(T.TestCase):
+class TestGetJarDownloaders(TempdirTestCase):
+
+    @T.setup_teardown
+    def clear_cache(self):
+        get_jar_downloaders.clear_cache()
+        with mock.patch.object(config.application, 'CACHE_PATH', self.tempdir):
+            yield
+        get_jar_downloaders.clear_cache()
+
     # XXX: this method is pretty nuts so this is more of a smoke test
     def test_get_jar_downloaders(self):
         assert get_jar_downloaders()
 
+    def test_discovery_is_memoized(self):
+        with mock.patch.object(
+            jar_downloader.discovery, 'discover', autospec=True,
+        ) as discover_mock:
+            discover_mock.return_value = set([object])
+            T.assert_equal(get_jar_downloaders(), frozenset([object]))
+            T.assert_equal(get_jar_downloaders(), frozenset([object]))
+        T.assert_equal(discover_mock.call_count, 1)
+
+    def test_manifest(self):
+        T.assert_equal(load_manifest(), None)
+        manifest = write_manifest()
+        T.assert_equal(load_manifest(), manifest)
+        T.assert_equal(
+            manifest['jar_downloader.vanilla_jar_downloader']['classes'],
+            ['VanillaJarDownloader'],
+        )
+        T.assert_equal(
+            get_jar_downloaders(),
+            frozenset(discover(JAR_DOWNLOADER_DIRECTORY, is_jar_downloader)),
+        )
+
 
 class TestGetJarDownloaderMap(T.TestCase):
     def test_get_jar_downloader_map(self):
@@ -61,9 +103,9 @@ class TestGetJarDownloaderMap(T.TestCase):
             T.assert_equal(ret, {'Foo': Foo, 'Bar': Bar})
 
 
-class TestGetUserJars(T.TestCase):
+class TestScanUserJars(T.TestCase):
 
-    def test_get_user_jars(self):
+    def test_scan_user_jars(self):
         with mock.patch.object(
             os, 'listdir', MockReturns(spec=lambda s: None)
         ) as mock_listdir:
@@ -76,7 +118,7 @@ class TestGetUserJars(T.TestCase):
                 'bar',
             ])
 
-            ret = get_user_jars()
+            ret = scan_user_jars()
             T.assert_equal(
                 ret,
                 {
@@ -94,3 +136,86 @@ class TestGetUserJars(T.TestCase):
                     },
                 }
             )
+
+
+class UserJarRegistryTestMixin(object):
+    """Tests UserJarRegistry with the watcher returned by get_watcher."""
+
+    @T.setup_teardown
+    def patch_jars_path(self):
+        with mock.patch.object(
+            config.application, 'JARS_PATH', self.tempdir,
+        ):
+            yield
+
+    def age(self, *paths):
+        """Moves mtimes out of the racy window of MtimeWatcher."""
+        old = time.time() - 60
+        for path in paths:
+            os.utime(path, (old, old))
+
+    def make_user_jar(self, jar_type, user_jar_name):
+        os.makedirs(get_jar_directory(jar_type, user_jar_name))
+        self.age(self.tempdir, os.path.join(self.tempdir, jar_type))
+
+    def get_registry(self):
+        return UserJarRegistry(get_watcher=self.get_watcher)
+
+    def test_lookups_do_not_rescan(self):
+        self.make_user_jar('Foo', 'bar')
+        registry = self.get_registry()
+        T.assert_equal(
+            registry.get_user_jars(),
+            {'Foo': {'bar': get_jar_directory('Foo', 'bar')}},
+        )
+        with mock.patch.object(
+            jar_downloader.discovery, 'scan_user_jars', autospec=True,
+        ) as scan_mock:
+            registry.get_user_jars()
+        T.assert_equal(scan_mock.call_count, 0)
+
+    def test_new_user_jar_is_noticed(self):
+        self.make_user_jar('Foo', 'bar')
+        registry = self.get_registry()
+        registry.get_user_jars()
+
+        self.make_user_jar('Foo', 'baz')
+        self.make_user_jar('Other', 'qux')
+        T.assert_equal(
+            registry.get_user_jars(),
+            {
+                'Foo': {
+                    'bar': get_jar_directory('Foo', 'bar'),
+                    'baz': get_jar_directory('Foo', 'baz'),
+                },
+                'Other': {'qux': get_jar_directory('Other', 'qux')},
+            },
+        )
+
+    def test_removed_user_jar_is_noticed(self):
+        self.make_user_jar('Foo', 'bar')
+        registry = self.get_registry()
+        registry.get_user_jars()
+
+        os.rmdir(get_jar_directory('Foo', 'bar'))
+        self.age(os.path.join(self.tempdir, 'Foo'))
+        T.assert_equal(registry.get_user_jars(), {})
+
+
+class TestUserJarRegistryInotify(UserJarRegistryTestMixin, TempdirTestCase):
+    get_watcher = InotifyWatcher
+
+
+class TestUserJarRegistryMtime(UserJarRegistryTestMixin, TempdirTestCase):
+    get_watcher = MtimeWatcher
+
+
+class TestGetUserJars(T.TestCase):
+
+    def test_get_user_jars_uses_registry(self):
+        with mock.patch.object(
+            jar_downloader.discovery.user_jar_registry,
+            'get_user_jars',
+            autospec=True,
+        ) as get_user_jars_mock:
+            T.assert_equal(get_user_jars(), get_user_jars_mock.return_value)
@@ -0,0 +1,284 @@
+
+import contextlib
+import cStringIO
+import hashlib
+import mock
+import os
+import os.path
+import sys
+import testify as T
+import threading
+import time
+
+import config.application
+import jar_downloader.fleet_update
+import jar_downloader.jar_store
+from jar_downloader.fleet_update import format_result
+from jar_downloader.fleet_update import HostLimiter
+from jar_downloader.fleet_update import main
+from jar_downloader.fleet_update import update_all
+from jar_downloader.fleet_update import UpdateResult
+from jar_downloader.jar_downloader_base import Jar
+from jar_downloader.jar_downloader_base import JarDownloaderBase
+from jar_downloader.jar_index import JarIndex
+from jar_downloader.jar_store import jar_store
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+
+class FakeJarDownloader(JarDownloaderBase):
+    """Jar downloader which "downloads" by writing the version to a file."""
+    __jar_downloader__ = False
+
+    latest_version = '1.0'
+    downloads = []
+    failing_versions = set()
+
+    def get_jar_path(self, version):
+        return os.path.join(self.jar_directory, '%s.jar' % version)
+
+    def get_download_url(self, version):
+        return 'http://example.com/%s.jar' % version
+
+    def get_update_version(self):
+        if os.path.exists(self.get_jar_path(self.latest_version)):
+            return None
+        return self.latest_version
+
+    def download_specific_version(self, version):
+        self.downloads.append((self.jar_directory, version))
+        if version in self.failing_versions:
+            raise IOError('Download failed.')
+        with open(self.get_jar_path(version), 'w') as jar_file:
+            jar_file.write(version)
+
+    def set_latest_version(self, version):
+        return Jar('%s.jar' % version, version)
+
+
+class NoUrlJarDownloader(FakeJarDownloader):
+    """Jar downloader which only implements update() (no download urls)."""
+    __jar_downloader__ = False
+
+    get_download_url = JarDownloaderBase.get_download_url
+
+
+class TestUpdateAll(TempdirTestCase):
+
+    @T.setup_teardown
+    def patch_jar_downloader_map(self):
+        with mock.patch.object(
+            jar_downloader.fleet_update,
+            'get_jar_downloader_map',
+            return_value={
+                'FakeJarDownloader': FakeJarDownloader,
+                'NoUrlJarDownloader': NoUrlJarDownloader,
+            },
+        ):
+            with contextlib.nested(
+                mock.patch.object(FakeJarDownloader, 'downloads', []),
+                mock.patch.object(
+                    config.application,
+                    'JAR_STORE_PATH',
+                    os.path.join(self.tempdir, 'store'),
+                ),
+            ):
+                yield
+
+    def _make_user_jars(self, jar_type, *names):
+        user_jars = {}
+        for name in names:
+            path = os.path.join(self.tempdir, name)
+            os.mkdir(path)
+            user_jars[name] = path
+        return {jar_type: user_jars}
+
+    def _get_jar_path(self, user_jars, name, version):
+        return os.path.join(
+            user_jars['FakeJarDownloader'][name], '%s.jar' % version,
+        )
+
+    def test_identical_downloads_happen_once(self):
+        user_jars = self._make_user_jars('FakeJarDownloader', 'a', 'b', 'c')
+        results = update_all(user_jars)
+
+        T.assert_equal(len(FakeJarDownloader.downloads), 1)
+        T.assert_equal(
+            results,
+            [
+                UpdateResult('FakeJarDownloader', name, '1.0', True, None)
+                for name in ('a', 'b', 'c')
+            ],
+        )
+        for name in ('a', 'b', 'c'):
+            jar_path = self._get_jar_path(user_jars, name, '1.0')
+            with open(jar_path, 'r') as jar_file:
+                T.assert_equal(jar_file.read(), '1.0')
+
+    def test_identical_jars_share_a_blob(self):
+        user_jars = self._make_user_jars('FakeJarDownloader', 'a', 'b')
+        update_all(user_jars)
+        T.assert_equal(
+            os.path.samefile(
+                self._get_jar_path(user_jars, 'a', '1.0'),
+                self._get_jar_path(user_jars, 'b', '1.0'),
+            ),
+            True,
+        )
+
+    def test_stored_downloads_are_not_hashed_again(self):
+        download_specific_version = FakeJarDownloader.download_specific_version
+
+        def download_through_store(instance, version):
+            download_specific_version(instance, version)
+            jar_store.add(
+                instance.get_jar_path(version),
+                url=instance.get_download_url(version),
+            )
+
+        user_jars = self._make_user_jars('FakeJarDownloader', 'a', 'b')
+        with contextlib.nested(
+            mock.patch.object(
+                FakeJarDownloader,
+                'download_specific_version',
+                download_through_store,
+            ),
+            mock.patch.object(
+                jar_downloader.jar_store,
+                'hash_file',
+                wraps=jar_downloader.jar_store.hash_file,
+            ),
+        ) as (_, hash_file_mock):
+            update_all(user_jars)
+        # Only by the download itself
+        T.assert_equal(hash_file_mock.call_count, 1)
+        T.assert_equal(
+            os.path.samefile(
+                self._get_jar_path(user_jars, 'a', '1.0'),
+                self._get_jar_path(user_jars, 'b', '1.0'),
+            ),
+            True,
+        )
+
+    def test_shared_jars_are_verified_and_indexed(self):
+        user_jars = self._make_user_jars('FakeJarDownloader', 'a', 'b')
+        update_all(user_jars)
+        jar_index = JarIndex(user_jars['FakeJarDownloader']['b'])
+        T.assert_equal(
+            jar_index.load()['1.0.jar']['hashes'],
+            {'sha256': hashlib.sha256('1.0').hexdigest()},
+        )
+
+    def test_shared_jar_with_wrong_hash_is_rejected(self):
+        user_jars = self._make_user_jars('FakeJarDownloader', 'a', 'b')
+        with mock.patch.object(
+            FakeJarDownloader,
+            'get_expected_hashes',
+            return_value={'sha256': 'nope'},
+        ):
+            results = update_all(user_jars)
+        T.assert_equal(results[0].success, True)
+        T.assert_equal(
+            results[1].error.startswith('ChecksumMismatchError: '), True,
+        )
+        T.assert_equal(
+            os.path.exists(self._get_jar_path(user_jars, 'b', '1.0')), False,
+        )
+
+    def test_missing_download_url_is_reported_per_jar(self):
+        user_jars = self._make_user_jars('NoUrlJarDownloader', 'a')
+        user_jars.update(self._make_user_jars('FakeJarDownloader', 'b'))
+        results = update_all(user_jars)
+        T.assert_equal(results, [
+            UpdateResult('FakeJarDownloader', 'b', '1.0', True, None),
+            UpdateResult(
+                'NoUrlJarDownloader', 'a', None, False,
+                'NotImplementedError: ',
+            ),
+        ])
+
+    def test_up_to_date_jars_are_not_downloaded(self):
+        user_jars = self._make_user_jars('FakeJarDownloader', 'a')
+        update_all(user_jars)
+        results = update_all(user_jars)
+
+        T.assert_equal(len(FakeJarDownloader.downloads), 1)
+        T.assert_equal(
+            results, [UpdateResult('FakeJarDownloader', 'a', None, False, None)],
+        )
+
+    def test_failed_download_reports_errors_for_group(self):
+        user_jars = self._make_user_jars('FakeJarDownloader', 'a', 'b')
+        with mock.patch.object(FakeJarDownloader, 'failing_versions', set(['1.0'])):
+            results = update_all(user_jars)
+
+        T.assert_equal(
+            [result.error for result in results],
+            ['IOError: Download failed.'] * 2,
+        )
+        T.assert_equal(any(result.success for result in results), False)
+
+    def test_unknown_jar_type(self):
+        results = update_all({'Nope': {'a': self.tempdir}})
+        T.assert_equal(
+            results,
+            [UpdateResult('Nope', 'a', None, False, 'Unknown jar type: Nope')],
+        )
+
+    def test_main(self):
+        user_jars = self._make_user_jars('FakeJarDownloader', 'a')
+        with contextlib.nested(
+            mock.patch.object(
+                jar_downloader.fleet_update,
+                'get_user_jars',
+                return_value=user_jars,
+            ),
+            mock.patch.object(sys, 'stdout', cStringIO.StringIO()),
+        ) as (
+            _,
+            stdout,
+        ):
+            T.assert_equal(main(['--max-workers', '2']), 0)
+            T.assert_equal(
+                stdout.getvalue(), 'FakeJarDownloader/a: updated to 1.0\n',
+            )
+
+
+class TestHostLimiter(T.TestCase):
+
+    def test_limits_concurrency_per_host(self):
+        limiter = HostLimiter(2)
+        lock = threading.Lock()
+        active = {'current': 0, 'max': 0}
+
+        def work():
+            with limiter.limit('http://example.com/foo.jar'):
+                with lock:
+                    active['current'] += 1
+                    active['max'] = max(active['max'], active['current'])
+                time.sleep(0.01)
+                with lock:
+                    active['current'] -= 1
+
+        threads = [threading.Thread(target=work) for _ in xrange(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        T.assert_equal(active['max'], 2)
+
+
+class TestFormatResult(T.TestCase):
+
+    def test_format_result(self):
+        T.assert_equal(
+            format_result(UpdateResult('Foo', 'bar', '1.0', True, None)),
+            'Foo/bar: updated to 1.0',
+        )
+        T.assert_equal(
+            format_result(UpdateResult('Foo', 'bar', None, False, None)),
+            'Foo/bar: up to date',
+        )
+        T.assert_equal(
+            format_result(UpdateResult('Foo', 'bar', None, False, 'womp')),
+            'Foo/bar: error: womp',
+        )
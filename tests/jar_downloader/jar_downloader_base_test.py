@@ -1,15 +1,20 @@
 
-import __builtin__
-
-import contextlib
 import jsonschema
+import hashlib
 import mock
+import os
 import os.path
 import simplejson
 import testify as T
+import time
 
+from jar_downloader import jar_downloader_base
 from jar_downloader.jar_downloader_base import CONFIG_FILE
+from jar_downloader.jar_downloader_base import Jar
 from jar_downloader.jar_downloader_base import JarDownloaderBase
+from jar_downloader.jar_downloader_base import VerifyResult
+from jar_downloader.progress import VERIFY
+from testing.base_classes.tempdir_test_case import TempdirTestCase
 
 class TestJarDownloaderBaseConstructor(T.TestCase):
     """Tests the JarDownloaderBase."""
@@ -34,25 +39,166 @@ class TestJarDownloaderBaseConstructor(T.TestCase):
         self.exists_mock.assert_called_once_with(self.directory)
         T.assert_equal(jar_downloader.jar_directory, self.directory)
 
+
+class FakeJarDownloader(JarDownloaderBase):
+    __jar_downloader__ = False
+
+    @property
+    def downloaded_versions(self):
+        return [Jar('foo.jar', 'foo')]
+
+
+class TestVerify(TempdirTestCase):
+
+    @property
+    def jar_path(self):
+        return os.path.join(self.tempdir, 'foo.jar')
+
+    def write_jar(self, contents):
+        with open(self.jar_path, 'wb') as jar_file:
+            jar_file.write(contents)
+
+    def test_unindexed_jar_has_nothing_to_check(self):
+        self.write_jar('foo')
+        jar_downloader = FakeJarDownloader(self.tempdir)
+        T.assert_equal(
+            jar_downloader.verify(),
+            [VerifyResult(Jar('foo.jar', 'foo'), None)],
+        )
+        T.assert_equal(
+            jar_downloader.jar_index.load()['foo.jar']['hashes']['sha256'],
+            hashlib.sha256('foo').hexdigest(),
+        )
+
+    def test_unchanged_jar_is_not_rehashed(self):
+        self.write_jar('foo')
+        jar_downloader = FakeJarDownloader(self.tempdir)
+        jar_downloader.jar_index.record(
+            'foo.jar',
+            {'sha1': hashlib.sha1('foo').hexdigest()},
+            {'sha1': hashlib.sha1('foo').hexdigest()},
+        )
+        with mock.patch.object(
+            jar_downloader_base, 'get_file_hashes', autospec=True,
+        ) as get_file_hashes_mock:
+            T.assert_equal(
+                jar_downloader.verify(),
+                [VerifyResult(Jar('foo.jar', 'foo'), True)],
+            )
+        T.assert_equal(get_file_hashes_mock.call_count, 0)
+
+    def test_changed_jar_is_invalid(self):
+        self.write_jar('foo')
+        jar_downloader = FakeJarDownloader(self.tempdir)
+        jar_downloader.jar_index.record(
+            'foo.jar', {'sha1': hashlib.sha1('foo').hexdigest()},
+        )
+        self.write_jar('corrupt')
+        T.assert_equal(
+            jar_downloader.verify(),
+            [VerifyResult(Jar('foo.jar', 'foo'), False)],
+        )
+
+    def test_full_verify_rehashes(self):
+        self.write_jar('foo')
+        jar_downloader = FakeJarDownloader(self.tempdir)
+        jar_downloader.jar_index.record(
+            'foo.jar', {'sha1': '0' * 40}, {'sha1': '0' * 40},
+        )
+        T.assert_equal(
+            jar_downloader.verify(),
+            [VerifyResult(Jar('foo.jar', 'foo'), True)],
+        )
+        T.assert_equal(
+            jar_downloader.verify(full=True),
+            [VerifyResult(Jar('foo.jar', 'foo'), False)],
+        )
+
+    def test_verify_emits_progress(self):
+        self.write_jar('foo')
+        events = []
+        jar_downloader = FakeJarDownloader(self.tempdir)
+        jar_downloader.add_progress_listener(events.append)
+        jar_downloader.verify()
+
+        T.assert_equal(
+            [(event.stage, event.bytes_transferred) for event in events],
+            [(VERIFY, 3)],
+        )
+
+
+class StrictJarDownloader(JarDownloaderBase):
+    __jar_downloader__ = False
+
+    @classmethod
+    def get_config_schema(cls):
+        return {
+            'type': 'object',
+            'properties': {'foo': {'type': 'integer'}},
+            'required': ['foo'],
+        }
+
+
+class TestConfig(TempdirTestCase):
+    """Tests reading and caching the config of a JarDownloaderBase."""
+
+    def write_config(self, config, age=60):
+        """Writes the config with an mtime age seconds in the past."""
+        config_path = os.path.join(self.tempdir, CONFIG_FILE)
+        with open(config_path, 'w') as config_file:
+            simplejson.dump(config, config_file)
+        mtime = time.time() - age
+        os.utime(config_path, (mtime, mtime))
+
     def test_config(self):
-        with contextlib.nested(
-            mock.patch.object(__builtin__, 'open', autospec=True),
-            mock.patch.object(simplejson, 'load', autospec=True),
-            mock.patch.object(jsonschema, 'validate', autospec=True),
-        ) as (
-            open_mock,
-            load_mock,
-            validate_mock,
+        self.write_config({'foo': 1})
+        T.assert_equal(StrictJarDownloader(self.tempdir).config, {'foo': 1})
+
+    def test_invalid_config_raises(self):
+        self.write_config({'foo': 'bar'})
+        with T.assert_raises(jsonschema.ValidationError):
+            StrictJarDownloader(self.tempdir).config
+
+    def test_config_is_shared_while_file_is_unchanged(self):
+        self.write_config({'foo': 1})
+        config = StrictJarDownloader(self.tempdir).config
+        with mock.patch.object(simplejson, 'load', autospec=True) as load_mock:
+            T.assert_is(StrictJarDownloader(self.tempdir).config, config)
+            T.assert_equal(load_mock.call_count, 0)
+
+    def test_config_is_reloaded_when_file_changes(self):
+        self.write_config({'foo': 1})
+        jar_downloader = StrictJarDownloader(self.tempdir)
+        T.assert_equal(jar_downloader.config, {'foo': 1})
+        # Different size so the change is seen within the mtime granularity
+        self.write_config({'foo': 12345})
+        T.assert_equal(jar_downloader.config, {'foo': 12345})
+
+    def test_recently_modified_config_is_reloaded(self):
+        # Could change again within the mtime's granularity without changing
+        # its stat
+        self.write_config({'foo': 1}, age=0)
+        jar_downloader = StrictJarDownloader(self.tempdir)
+        T.assert_equal(jar_downloader.config, {'foo': 1})
+        with mock.patch.object(
+            simplejson, 'load', autospec=True, return_value={'foo': 2},
         ):
-            jar_downloader = JarDownloaderBase(self.directory)
-            T.assert_equal(jar_downloader.config, load_mock.return_value)
-            open_mock.assert_called_once_with(
-                os.path.join(jar_downloader.jar_directory, CONFIG_FILE),
-                'r',
-            )
-            load_mock.assert_called_once_with(
-                open_mock.return_value.__enter__.return_value
-            )
-            validate_mock.assert_called_once_with(
-                load_mock.return_value, {'type': 'object'}
-            )
+            T.assert_equal(jar_downloader.config, {'foo': 2})
+
+    def test_config_is_cached_per_class(self):
+        self.write_config({'foo': 1})
+        StrictJarDownloader(self.tempdir).config
+        with mock.patch.object(simplejson, 'load', autospec=True) as load_mock:
+            load_mock.return_value = {}
+            T.assert_equal(FakeJarDownloader(self.tempdir).config, {})
+            T.assert_equal(load_mock.call_count, 1)
+
+    def test_config_validator_is_compiled_once(self):
+        T.assert_is(
+            StrictJarDownloader.get_config_validator(),
+            StrictJarDownloader.get_config_validator(),
+        )
+        T.assert_is_not(
+            StrictJarDownloader.get_config_validator(),
+            FakeJarDownloader.get_config_validator(),
+        )
@@ -0,0 +1,120 @@
+
+import mock
+import os
+import os.path
+import testify as T
+import time
+
+from jar_downloader.jar_index import INDEX_DIRECTORY
+from jar_downloader.jar_index import INDEX_FILE
+from jar_downloader.jar_index import JarIndex
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+
+class TestJarIndex(TempdirTestCase):
+
+    def write_jar(self, contents):
+        with open(os.path.join(self.tempdir, 'foo.jar'), 'wb') as jar_file:
+            jar_file.write(contents)
+
+    def test_missing_index_is_empty(self):
+        T.assert_equal(JarIndex(self.tempdir).load(), {})
+
+    def test_broken_index_is_empty(self):
+        os.mkdir(os.path.join(self.tempdir, INDEX_DIRECTORY))
+        with open(
+            os.path.join(self.tempdir, INDEX_DIRECTORY, INDEX_FILE), 'w',
+        ) as index_file:
+            index_file.write('{')
+        T.assert_equal(JarIndex(self.tempdir).load(), {})
+
+    def test_record(self):
+        self.write_jar('foo')
+        jar_index = JarIndex(self.tempdir)
+        jar_index.record('foo.jar', {'sha1': 'abc'}, {'sha1': 'abc'})
+
+        entry = jar_index.load()['foo.jar']
+        stat = os.stat(os.path.join(self.tempdir, 'foo.jar'))
+        T.assert_equal(entry['hashes'], {'sha1': 'abc'})
+        T.assert_equal(entry['expected_hashes'], {'sha1': 'abc'})
+        T.assert_equal(JarIndex.is_current(entry, stat), True)
+
+    def test_is_current_notices_changes(self):
+        self.write_jar('foo')
+        jar_index = JarIndex(self.tempdir)
+        jar_index.record('foo.jar', {})
+        self.write_jar('foobar')
+
+        T.assert_equal(
+            JarIndex.is_current(
+                jar_index.load()['foo.jar'],
+                os.stat(os.path.join(self.tempdir, 'foo.jar')),
+            ),
+            False,
+        )
+
+    def test_update_merges(self):
+        jar_index = JarIndex(self.tempdir)
+        jar_index.update({'a.jar': {'size': 1}})
+        jar_index.update({'b.jar': {'size': 2}})
+        T.assert_equal(
+            jar_index.load(), {'a.jar': {'size': 1}, 'b.jar': {'size': 2}},
+        )
+
+
+class TestJarIndexListing(TempdirTestCase):
+
+    def age_directory(self):
+        """Moves the directory's mtime out of the racy window."""
+        old = time.time() - 60
+        os.utime(self.tempdir, (old, old))
+
+    def get_listing(self, jar_index):
+        list_jars = mock.Mock(return_value=[('foo.jar', 'foo')])
+        return jar_index.get_listing(list_jars), list_jars.call_count
+
+    def test_listing_is_cached(self):
+        jar_index = JarIndex(self.tempdir)
+        jar_index.get_listing(lambda: [])
+        self.age_directory()
+
+        T.assert_equal(self.get_listing(jar_index), ([('foo.jar', 'foo')], 1))
+        T.assert_equal(self.get_listing(jar_index), ([('foo.jar', 'foo')], 0))
+        # Survives across instances
+        T.assert_equal(
+            self.get_listing(JarIndex(self.tempdir)), ([('foo.jar', 'foo')], 0),
+        )
+
+    def test_directory_change_invalidates_listing(self):
+        jar_index = JarIndex(self.tempdir)
+        jar_index.get_listing(lambda: [])
+        self.age_directory()
+        self.get_listing(jar_index)
+
+        with open(os.path.join(self.tempdir, 'bar.jar'), 'w'):
+            pass
+        T.assert_equal(self.get_listing(jar_index)[1], 1)
+
+    def test_recent_directory_is_not_trusted(self):
+        jar_index = JarIndex(self.tempdir)
+        self.get_listing(jar_index)
+        T.assert_equal(self.get_listing(jar_index)[1], 1)
+
+    def test_relisting_drops_entries_of_missing_jars(self):
+        jar_index = JarIndex(self.tempdir)
+        jar_index.update({'foo.jar': {'size': 1}, 'bar.jar': {'size': 2}})
+        self.get_listing(jar_index)
+        T.assert_equal(jar_index.load(), {'foo.jar': {'size': 1}})
+
+    def test_recording_does_not_invalidate_listing(self):
+        self.write_jar('foo')
+        jar_index = JarIndex(self.tempdir)
+        jar_index.get_listing(lambda: [])
+        self.age_directory()
+        self.get_listing(jar_index)
+
+        jar_index.record('foo.jar', {})
+        T.assert_equal(self.get_listing(jar_index)[1], 0)
+
+    def write_jar(self, contents):
+        with open(os.path.join(self.tempdir, 'foo.jar'), 'wb') as jar_file:
+            jar_file.write(contents)
@@ -0,0 +1,103 @@
+
+import contextlib
+import hashlib
+import mock
+import os
+import os.path
+import testify as T
+
+import config.application
+import jar_downloader.jar_store
+from jar_downloader.jar_store import JarStore
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+
+class TestJarStore(TempdirTestCase):
+
+    contents = 'jar contents'
+    digest = hashlib.sha256(contents).hexdigest()
+    url = 'http://example.com/foo.jar'
+
+    @T.setup_teardown
+    def patch_jar_store_path(self):
+        with mock.patch.object(
+            config.application,
+            'JAR_STORE_PATH',
+            os.path.join(self.tempdir, 'store'),
+        ):
+            self.jar_store = JarStore()
+            yield
+
+    def _write_jar(self, name, contents=None):
+        path = os.path.join(self.tempdir, name)
+        with open(path, 'wb') as jar_file:
+            jar_file.write(contents or self.contents)
+        return path
+
+    def test_add_stores_blob_and_links_file(self):
+        path = self._write_jar('a.jar')
+        T.assert_equal(self.jar_store.add(path), self.digest)
+
+        blob_path = self.jar_store.get_blob_path(self.digest)
+        T.assert_equal(os.path.samefile(path, blob_path), True)
+        T.assert_equal(os.stat(blob_path).st_nlink, 2)
+
+    def test_add_links_identical_file_to_existing_blob(self):
+        path_a = self._write_jar('a.jar')
+        path_b = self._write_jar('b.jar')
+        self.jar_store.add(path_a)
+        self.jar_store.add(path_b)
+
+        T.assert_equal(os.path.samefile(path_a, path_b), True)
+        with open(path_b, 'rb') as jar_file:
+            T.assert_equal(jar_file.read(), self.contents)
+
+    def test_get_digest_for_url(self):
+        T.assert_is(self.jar_store.get_digest_for_url(self.url), None)
+        self.jar_store.add(self._write_jar('a.jar'), url=self.url)
+        T.assert_equal(self.jar_store.get_digest_for_url(self.url), self.digest)
+
+    def test_get_digest_for_url_with_missing_blob(self):
+        self.jar_store.add(self._write_jar('a.jar'), url=self.url)
+        os.remove(self.jar_store.get_blob_path(self.digest))
+        T.assert_is(self.jar_store.get_digest_for_url(self.url), None)
+
+    def test_materialize(self):
+        self.jar_store.add(self._write_jar('a.jar'))
+        destination = os.path.join(self.tempdir, 'b.jar')
+        self.jar_store.materialize(self.digest, destination)
+        T.assert_equal(
+            os.path.samefile(
+                destination, self.jar_store.get_blob_path(self.digest),
+            ),
+            True,
+        )
+
+    def test_materialize_falls_back_to_copy(self):
+        self.jar_store.add(self._write_jar('a.jar'))
+        destination = os.path.join(self.tempdir, 'b.jar')
+        with contextlib.nested(
+            mock.patch.object(os, 'link', side_effect=OSError),
+            mock.patch.object(
+                jar_downloader.jar_store, '_reflink', side_effect=IOError,
+            ),
+        ):
+            self.jar_store.materialize(self.digest, destination)
+
+        T.assert_equal(
+            os.path.samefile(
+                destination, self.jar_store.get_blob_path(self.digest),
+            ),
+            False,
+        )
+        with open(destination, 'rb') as jar_file:
+            T.assert_equal(jar_file.read(), self.contents)
+
+    def test_collect_garbage(self):
+        path = self._write_jar('a.jar')
+        self.jar_store.add(path, url=self.url)
+        T.assert_equal(self.jar_store.collect_garbage(), [])
+
+        os.remove(path)
+        T.assert_equal(self.jar_store.collect_garbage(), [self.digest])
+        T.assert_equal(self.jar_store.has_blob(self.digest), False)
+        T.assert_is(self.jar_store.get_digest_for_url(self.url), None)
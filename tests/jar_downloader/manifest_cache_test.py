@@ -0,0 +1,162 @@
+
+import mock
+import os.path
+import simplejson
+import testify as T
+import threading
+import time
+import urllib2
+
+import config.application
+from jar_downloader.manifest_cache import ManifestCache
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+
+URL = 'http://example.com/versions.json'
+
+def get_fake_response(data, etag='"etag"', last_modified=None):
+    response = mock.Mock()
+    response.read.return_value = simplejson.dumps(data)
+    headers = {'ETag': etag, 'Last-Modified': last_modified}
+    response.info.return_value.getheader.side_effect = headers.get
+    return response
+
+def get_not_modified_error():
+    return urllib2.HTTPError(URL, 304, 'Not Modified', {}, None)
+
+class TestManifestCache(TempdirTestCase):
+
+    @T.setup_teardown
+    def patch_cache_path_and_urlopen(self):
+        with mock.patch.object(
+            config.application, 'CACHE_PATH', self.tempdir,
+        ):
+            with mock.patch.object(
+                urllib2, 'urlopen', autospec=True,
+            ) as self.urlopen_mock:
+                yield
+
+    def test_cache_path(self):
+        cache = ManifestCache(URL, 'foo.json')
+        T.assert_equal(cache.cache_path, os.path.join(self.tempdir, 'foo.json'))
+
+    def test_ttl_defaults_to_config(self):
+        with mock.patch.object(config.application, 'MANIFEST_CACHE_TTL', 5):
+            T.assert_equal(ManifestCache(URL, 'foo.json').ttl, 5)
+        T.assert_equal(ManifestCache(URL, 'foo.json', ttl=10).ttl, 10)
+
+    def test_get_fetches_and_persists(self):
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'bar'})
+        cache = ManifestCache(URL, 'foo.json', ttl=60)
+
+        T.assert_equal(cache.get(), {'foo': 'bar'})
+        T.assert_equal(self.urlopen_mock.call_count, 1)
+        with open(cache.cache_path, 'r') as cache_file:
+            T.assert_equal(simplejson.load(cache_file)['data'], {'foo': 'bar'})
+
+    def test_get_within_ttl_does_not_hit_network(self):
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'bar'})
+        cache = ManifestCache(URL, 'foo.json', ttl=60)
+        cache.get()
+        T.assert_equal(cache.get(), {'foo': 'bar'})
+        T.assert_equal(self.urlopen_mock.call_count, 1)
+
+    def test_get_reads_disk_cache_from_other_instance(self):
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'bar'})
+        ManifestCache(URL, 'foo.json', ttl=60).get()
+        T.assert_equal(ManifestCache(URL, 'foo.json', ttl=60).get(), {'foo': 'bar'})
+        T.assert_equal(self.urlopen_mock.call_count, 1)
+
+    def test_expired_revalidates_with_conditional_get(self):
+        self.urlopen_mock.return_value = get_fake_response(
+            {'foo': 'bar'},
+            last_modified='Tue, 06 Aug 2013 14:00:00 GMT',
+        )
+        cache = ManifestCache(URL, 'foo.json', ttl=0)
+        cache.get()
+
+        self.urlopen_mock.side_effect = get_not_modified_error()
+        T.assert_equal(cache.get(), {'foo': 'bar'})
+
+        request = self.urlopen_mock.call_args[0][0]
+        T.assert_equal(request.get_header('If-none-match'), '"etag"')
+        T.assert_equal(
+            request.get_header('If-modified-since'),
+            'Tue, 06 Aug 2013 14:00:00 GMT',
+        )
+
+    def test_not_modified_refreshes_fetched_at(self):
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'bar'})
+        cache = ManifestCache(URL, 'foo.json', ttl=60)
+        with mock.patch.object(time, 'time', return_value=0):
+            cache.get()
+
+        self.urlopen_mock.side_effect = get_not_modified_error()
+        with mock.patch.object(time, 'time', return_value=100):
+            cache.get()
+        with mock.patch.object(time, 'time', return_value=120):
+            cache.get()
+        T.assert_equal(self.urlopen_mock.call_count, 2)
+
+    def test_expired_replaces_changed_document(self):
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'bar'})
+        cache = ManifestCache(URL, 'foo.json', ttl=0)
+        cache.get()
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'baz'})
+        T.assert_equal(cache.get(), {'foo': 'baz'})
+
+    def test_other_http_errors_are_raised(self):
+        self.urlopen_mock.side_effect = urllib2.HTTPError(
+            URL, 500, 'Internal Server Error', {}, None,
+        )
+        with T.assert_raises(urllib2.HTTPError):
+            ManifestCache(URL, 'foo.json').get()
+
+    def test_invalidate(self):
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'bar'})
+        cache = ManifestCache(URL, 'foo.json', ttl=60)
+        cache.get()
+        cache.invalidate()
+        T.assert_equal(os.path.exists(cache.cache_path), False)
+        cache.get()
+        T.assert_equal(self.urlopen_mock.call_count, 2)
+
+    def test_allow_stale_returns_stale_and_revalidates_in_background(self):
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'bar'})
+        cache = ManifestCache(URL, 'foo.json', ttl=0)
+        cache.get()
+
+        release = threading.Event()
+        def slow_urlopen(request, timeout):
+            release.wait(5)
+            return get_fake_response({'foo': 'baz'})
+        self.urlopen_mock.side_effect = slow_urlopen
+
+        T.assert_equal(cache.get(allow_stale=True), {'foo': 'bar'})
+        # Only one revalidation at a time
+        T.assert_equal(cache.get(allow_stale=True), {'foo': 'bar'})
+        release.set()
+        cache._revalidation_thread.join()
+
+        T.assert_equal(self.urlopen_mock.call_count, 2)
+        T.assert_equal(cache._read_entry()['data'], {'foo': 'baz'})
+
+    def test_allow_stale_survives_unreachable_endpoint(self):
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'bar'})
+        cache = ManifestCache(URL, 'foo.json', ttl=60)
+        with mock.patch.object(time, 'time', return_value=0):
+            cache.get()
+
+        self.urlopen_mock.side_effect = urllib2.URLError('unreachable')
+        with mock.patch.object(time, 'time', return_value=100):
+            T.assert_equal(cache.get(allow_stale=True), {'foo': 'bar'})
+            cache._revalidation_thread.join()
+            # A failed revalidation isn't retried right away
+            T.assert_equal(cache.get(allow_stale=True), {'foo': 'bar'})
+        T.assert_equal(cache._revalidation_thread.is_alive(), False)
+        T.assert_equal(self.urlopen_mock.call_count, 2)
+
+    def test_allow_stale_without_document_fetches(self):
+        self.urlopen_mock.return_value = get_fake_response({'foo': 'bar'})
+        cache = ManifestCache(URL, 'foo.json', ttl=60)
+        T.assert_equal(cache.get(allow_stale=True), {'foo': 'bar'})
+        T.assert_equal(cache._revalidation_thread, None)
@@ -0,0 +1,44 @@
+
+import mock
+import testify as T
+import time
+
+from jar_downloader.progress import DOWNLOAD
+from jar_downloader.progress import ProgressEvent
+from jar_downloader.progress import ProgressTracker
+
+class TestProgressTracker(T.TestCase):
+
+    def track(self, times, calls, min_interval=1):
+        events = []
+        tracker = ProgressTracker(DOWNLOAD, events.append, min_interval)
+        with mock.patch.object(time, 'time', side_effect=times):
+            for call in calls:
+                tracker(*call)
+        return events
+
+    def test_rate_and_eta(self):
+        events = self.track([10, 12], [(0, 400), (100, 400)])
+        T.assert_equal(
+            events,
+            [
+                ProgressEvent(DOWNLOAD, 0, 400, None, None),
+                ProgressEvent(DOWNLOAD, 100, 400, 50, 6),
+            ],
+        )
+
+    def test_resumed_bytes_do_not_count_towards_rate(self):
+        events = self.track([10, 12], [(1000, 1400), (1100, 1400)])
+        T.assert_equal(events[-1], ProgressEvent(DOWNLOAD, 1100, 1400, 50, 6))
+
+    def test_unknown_total(self):
+        events = self.track([10, 12], [(0, None), (100, None)])
+        T.assert_equal(events[-1], ProgressEvent(DOWNLOAD, 100, None, 50, None))
+
+    def test_events_are_throttled_except_completion(self):
+        events = self.track(
+            [10, 10.5, 10.6, 11.5], [(0, 30), (10, 30), (30, 30), (30, 30)],
+        )
+        T.assert_equal(
+            [event.bytes_transferred for event in events], [0, 30, 30],
+        )
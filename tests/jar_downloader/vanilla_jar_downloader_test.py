@@ -3,15 +3,21 @@ import __builtin__
 
 import contextlib
 import fnmatch
+import hashlib
 import mock
+import os
 import os.path
 import simplejson
 import testify as T
+import time
 import urllib2
 
+import config.application
 from jar_downloader.jar_downloader_base import Jar
+from jar_downloader.progress import DOWNLOAD
+from jar_downloader.progress import VERIFY
 import jar_downloader.vanilla_jar_downloader
-from jar_downloader.vanilla_jar_downloader import DOWNLOAD_PATH
+from jar_downloader.vanilla_jar_downloader import get_version_manifest
 from jar_downloader.vanilla_jar_downloader import get_versions_json
 from jar_downloader.vanilla_jar_downloader import InvalidVersionFileError
 from jar_downloader.vanilla_jar_downloader import JAR_FILENAME
@@ -23,27 +29,33 @@ from jar_downloader.vanilla_jar_downloader import VanillaJarDownloader
 from jar_downloader.vanilla_jar_downloader import VERSION_REGEX
 from jar_downloader.vanilla_jar_downloader import VERSIONS_ENDPOINT
 from testing.assertions.version_json import assert_json_structure
+from testing.base_classes.tempdir_test_case import TempdirTestCase
 from testing.data.generators import get_fake_versions_json
 from testing.utilities.fake_file import FakeFile
+from testing.utilities.fake_http_server import FakeHttpServer
+from util.download import ChecksumMismatchError
+from util.download import IncompleteDownloadError
+from util.download import RetryPolicy
 from util.natural_sort import natural_sort
 
 class TestGetVersionsJson(T.TestCase):
     """Tests the get_versions_json method."""
 
     def test_get_versions_json(self):
-        with contextlib.nested(
-            mock.patch.object(simplejson, 'loads', autospec=True),
-            mock.patch.object(urllib2, 'urlopen', autospec=True),
-        ) as (
-            loads_mock,
-            urlopen_mock,
-        ):
+        with mock.patch.object(
+            jar_downloader.vanilla_jar_downloader.versions_manifest,
+            'get',
+            autospec=True,
+        ) as get_mock:
             retval = get_versions_json()
-            urlopen_mock.assert_called_once_with(VERSIONS_ENDPOINT)
-            loads_mock.assert_called_once_with(
-                urlopen_mock.return_value.read.return_value
-            )
-            T.assert_equal(retval, loads_mock.return_value)
+            get_mock.assert_called_once_with(allow_stale=False)
+            T.assert_equal(retval, get_mock.return_value)
+
+    def test_versions_manifest_endpoint(self):
+        T.assert_equal(
+            jar_downloader.vanilla_jar_downloader.versions_manifest.url,
+            VERSIONS_ENDPOINT,
+        )
 
     @T.suite('integration')
     @T.suite('external')
@@ -115,7 +127,7 @@ class TestVanillaJarDownloader(T.TestCase):
         T.assert_equal(jar_out.filename, filename)
         T.assert_equal(jar_out.short_version, version)
 
-    def test_download_versions(self):
+    def test_list_jars(self):
         with mock.patch.object(os, 'listdir', autospec=True) as listdir_mock:
             listdir_mock.return_value = [
                 # Some garbage
@@ -128,7 +140,7 @@ class TestVanillaJarDownloader(T.TestCase):
                 JAR_FILENAME % 'herp',
             ]
             instance = VanillaJarDownloader(self.directory)
-            downloaded_versions = instance.downloaded_versions
+            downloaded_versions = instance._list_jars()
             T.assert_equal(
                 downloaded_versions,
                 [
@@ -138,7 +150,7 @@ class TestVanillaJarDownloader(T.TestCase):
                 ]
             )
 
-    def test_downloaded_versions_sorts(self):
+    def test_list_jars_sorts(self):
         with mock.patch.object(os, 'listdir', autospec=True) as listdir_mock:
             listdir_mock.return_value = [
                 JAR_FILENAME % '1.6.2',
@@ -146,7 +158,7 @@ class TestVanillaJarDownloader(T.TestCase):
                 JAR_FILENAME % '1.6.4',
             ]
             instance = VanillaJarDownloader(self.directory)
-            downloaded_versions = instance.downloaded_versions
+            downloaded_versions = instance._list_jars()
             T.assert_equal(
                 downloaded_versions,
                 [
@@ -282,35 +294,6 @@ class TestVanillaJarDownloader(T.TestCase):
             instance = VanillaJarDownloader(self.directory)
             instance.download_specific_version('version_dne')
 
-    def test_download_specific_version_performs_download(self):
-        version = str(object())
-        with contextlib.nested(
-            mock.patch.object(urllib2, 'urlopen', autospec=True),
-            mock.patch.object(__builtin__, 'open', autospec=True),
-            mock.patch.object(
-                VanillaJarDownloader,
-                'available_versions',
-                [version,],
-            ),
-        ) as (
-            urlopen_mock,
-            open_mock,
-            _,
-        ):
-            open_mock.return_value = FakeFile()
-            instance = VanillaJarDownloader(self.directory)
-            instance.download_specific_version(version)
-            urlopen_mock.assert_called_once_with(
-                DOWNLOAD_PATH.format(version=version)
-            )
-            open_mock.assert_called_once_with(
-                os.path.join(self.directory, JAR_FILENAME % version),
-                'wb',
-            )
-            open_mock.return_value.write.assert_called_once_with(
-                urlopen_mock.return_value.read.return_value
-            )
-
     def test_get_latest_version(self):
         release_version = '1.6.2'
         snapshot_version = '19w32a'
@@ -336,7 +319,7 @@ class TestVanillaJarDownloader(T.TestCase):
         with mock.patch.object(
             VanillaJarDownloader,
             'latest_downloaded_version',
-            version,
+            Jar(JAR_FILENAME % version, version),
         ):
             self.get_versions_json_mock.return_value = get_fake_versions_json(
                 release_version=version,
@@ -357,7 +340,7 @@ class TestVanillaJarDownloader(T.TestCase):
             mock.patch.object(
                 VanillaJarDownloader,
                 'latest_downloaded_version',
-                None,
+                Jar(JAR_FILENAME % 'old', 'old'),
             ),
         ) as (
             download_specific_version_mock,
@@ -411,3 +394,212 @@ class TestVanillaJarDownloader(T.TestCase):
 
             # Only really care that it updates when its version file is borked
             T.assert_equal(retval, Jar(JAR_FILENAME % version, version))
+
+
+class TestVanillaJarDownloaderDownload(TempdirTestCase):
+    """Tests downloading jars into a real directory."""
+
+    version = '1.6.2'
+    jar_contents = 'jar contents' * 10000
+
+    def _get_version_json(self, sha1):
+        return simplejson.dumps({
+            'id': self.version,
+            'downloads': {'server': {'sha1': sha1}},
+        })
+
+    @T.setup_teardown
+    def serve_jar(self):
+        # The version manifests would otherwise keep an earlier server's url
+        get_version_manifest.clear_cache()
+        self.server = FakeHttpServer({
+            '/{0}.jar'.format(self.version): self.jar_contents,
+            '/{0}.json'.format(self.version): self._get_version_json(
+                hashlib.sha1(self.jar_contents).hexdigest(),
+            ),
+        })
+        with self.server.serving():
+            with contextlib.nested(
+                mock.patch.object(
+                    VanillaJarDownloader,
+                    'available_versions',
+                    [self.version],
+                ),
+                mock.patch.object(
+                    VanillaJarDownloader,
+                    'retry_policy',
+                    RetryPolicy(3, 0, 1, 0),
+                ),
+                mock.patch.object(
+                    jar_downloader.vanilla_jar_downloader,
+                    'DOWNLOAD_PATH',
+                    self.server.url('/{version}.jar'),
+                ),
+                mock.patch.object(
+                    jar_downloader.vanilla_jar_downloader,
+                    'VERSION_JSON_PATH',
+                    self.server.url('/{version}.json'),
+                ),
+                mock.patch.object(
+                    config.application,
+                    'CACHE_PATH',
+                    os.path.join(self.tempdir, 'cache'),
+                ),
+                mock.patch.object(
+                    config.application,
+                    'JAR_STORE_PATH',
+                    os.path.join(self.tempdir, 'store'),
+                ),
+            ):
+                yield
+
+    @property
+    def jar_directory(self):
+        jar_directory = os.path.join(self.tempdir, 'jar')
+        if not os.path.exists(jar_directory):
+            os.mkdir(jar_directory)
+        return jar_directory
+
+    @property
+    def jar_path(self):
+        return os.path.join(self.jar_directory, JAR_FILENAME % self.version)
+
+    def assert_only_jar(self, instance):
+        T.assert_equal(
+            [jar.short_version for jar in instance.downloaded_versions],
+            [self.version],
+        )
+        with open(self.jar_path, 'rb') as jar_file:
+            T.assert_equal(jar_file.read(), self.jar_contents)
+
+    def test_download_specific_version_performs_download(self):
+        instance = VanillaJarDownloader(self.jar_directory)
+        instance.download_specific_version(self.version)
+        self.assert_only_jar(instance)
+
+    def test_interrupted_download_is_resumed(self):
+        # The version json is requested before the jar
+        self.server.drop_after = [None, 1000]
+
+        instance = VanillaJarDownloader(self.jar_directory)
+        instance.download_specific_version(self.version)
+
+        T.assert_equal(self.server.requests[-1]['range'], 'bytes=1000-')
+        self.assert_only_jar(instance)
+
+    def test_failed_download_leaves_no_jar(self):
+        self.server.drop_after = [None, 1000, 1000, 1000]
+
+        instance = VanillaJarDownloader(self.jar_directory)
+        with T.assert_raises(IncompleteDownloadError):
+            instance.download_specific_version(self.version)
+
+        T.assert_equal(os.path.exists(self.jar_path), False)
+
+    def test_second_directory_links_instead_of_downloading(self):
+        VanillaJarDownloader(self.jar_directory).download_specific_version(
+            self.version,
+        )
+
+        other_directory = os.path.join(self.tempdir, 'other')
+        os.mkdir(other_directory)
+        other = VanillaJarDownloader(other_directory)
+        other.download_specific_version(self.version)
+
+        # One request for the version json and one for the jar
+        T.assert_equal(len(self.server.requests), 2)
+        T.assert_equal(
+            os.path.samefile(self.jar_path, other.get_jar_path(self.version)),
+            True,
+        )
+        T.assert_equal(
+            [jar.short_version for jar in other.downloaded_versions],
+            [self.version],
+        )
+
+    def test_download_records_hashes(self):
+        instance = VanillaJarDownloader(self.jar_directory)
+        instance.download_specific_version(self.version)
+
+        entry = instance.jar_index.load()[JAR_FILENAME % self.version]
+        T.assert_equal(
+            entry['hashes']['sha1'],
+            hashlib.sha1(self.jar_contents).hexdigest(),
+        )
+        T.assert_equal(
+            instance.verify(), [(instance.downloaded_versions[0], True)],
+        )
+
+    def test_checksum_mismatch_leaves_no_jar(self):
+        self.server.files['/{0}.json'.format(self.version)] = (
+            self._get_version_json('0' * 40)
+        )
+
+        instance = VanillaJarDownloader(self.jar_directory)
+        with T.assert_raises(ChecksumMismatchError):
+            instance.download_specific_version(self.version)
+
+        T.assert_equal(os.path.exists(self.jar_path), False)
+
+    def test_missing_version_json_skips_checksum(self):
+        del self.server.files['/{0}.json'.format(self.version)]
+
+        instance = VanillaJarDownloader(self.jar_directory)
+        T.assert_equal(instance.get_expected_hashes(self.version), {})
+        instance.download_specific_version(self.version)
+        self.assert_only_jar(instance)
+
+    def test_version_json_errors_fail_the_download(self):
+        with mock.patch.object(
+            jar_downloader.vanilla_jar_downloader,
+            'get_version_json',
+            side_effect=urllib2.HTTPError(
+                self.server.url('/'), 500, 'Internal Server Error', {}, None,
+            ),
+        ):
+            instance = VanillaJarDownloader(self.jar_directory)
+            with T.assert_raises(urllib2.HTTPError):
+                instance.download_specific_version(self.version)
+
+        T.assert_equal(self.server.requests, [])
+        T.assert_equal(os.path.exists(self.jar_path), False)
+
+    def test_version_manifest_is_shared(self):
+        T.assert_is(
+            get_version_manifest(self.version),
+            get_version_manifest(self.version),
+        )
+
+    def test_downloaded_versions_are_indexed(self):
+        instance = VanillaJarDownloader(self.jar_directory)
+        instance.download_specific_version(self.version)
+        old = time.time() - 60
+        os.utime(self.jar_directory, (old, old))
+
+        T.assert_equal(
+            instance.downloaded_versions,
+            [Jar(JAR_FILENAME % self.version, self.version)],
+        )
+        with mock.patch.object(os, 'listdir', autospec=True) as listdir_mock:
+            T.assert_equal(
+                instance.downloaded_versions,
+                [Jar(JAR_FILENAME % self.version, self.version)],
+            )
+        T.assert_equal(listdir_mock.call_count, 0)
+
+    def test_download_emits_progress(self):
+        events = []
+        instance = VanillaJarDownloader(self.jar_directory)
+        instance.add_progress_listener(events.append)
+        instance.download_specific_version(self.version)
+
+        T.assert_equal(
+            [event.stage for event in events][-2:], [DOWNLOAD, VERIFY],
+        )
+        T.assert_equal(
+            [
+                (event.bytes_transferred, event.total_bytes)
+                for event in events[-2:]
+            ],
+            [(len(self.jar_contents), len(self.jar_contents))] * 2,
+        )
@@ -3,19 +3,24 @@ import mock
 import testify as T
 
 from jar_downloader.jar_downloader_base import Jar
+from presentation.user_jar import NO_JARS_DOWNLOADED
 from presentation.user_jar import UserJar
 from web.app import app
 
 class TestUserJar(T.TestCase):
 
+    def _get_fake_instance(self):
+        fake_instance = mock.Mock(
+            jar_directory='/jar/directory',
+            downloaded_versions=[Jar('foo.jar', 'foo')],
+            latest_downloaded_version=Jar('foo.jar', 'foo'),
+        )
+        fake_instance.get_available_versions.return_value = ['foo', 'bar']
+        return fake_instance
+
     def _get_instance(self):
-        return UserJar(
-            'jar_type',
-            'name',
-            '/jar/directory',
-            ['foo', 'bar'],
-            [Jar('foo.jar', 'foo'),],
-            [Jar('foo.jar', 'foo'),],
+        return UserJar.from_user_jar(
+            self._get_fake_instance(), 'jar_type', 'name',
         )
 
     def test_update_url(self):
@@ -38,6 +43,28 @@ class TestUserJar(T.TestCase):
         instance = self._get_instance()
         T.assert_equal(instance.has_version('foo'), True)
         T.assert_equal(instance.has_version('bar'), False)
+        T.assert_equal(instance.downloaded_short_versions, frozenset(['foo']))
+
+    def test_fields_are_lazy_and_cached(self):
+        fake_instance = self._get_fake_instance()
+        instance = UserJar.from_user_jar(fake_instance, 'jar_type', 'name')
+        T.assert_equal(fake_instance.get_available_versions.call_count, 0)
+
+        T.assert_equal(instance.available_versions, ['foo', 'bar'])
+        T.assert_equal(instance.available_versions, ['foo', 'bar'])
+        T.assert_equal(instance.available_versions_error, None)
+        fake_instance.get_available_versions.assert_called_once_with(
+            allow_stale=True,
+        )
+
+    def test_available_versions_error(self):
+        fake_instance = self._get_fake_instance()
+        error = IOError('S3 is down')
+        fake_instance.get_available_versions.side_effect = error
+        instance = UserJar.from_user_jar(fake_instance, 'jar_type', 'name')
+
+        T.assert_equal(instance.available_versions, [])
+        T.assert_is(instance.available_versions_error, error)
 
     def test_from_user_jar_latest_version_excepts(self):
         # No latest downloaded version
@@ -48,6 +75,5 @@ class TestUserJar(T.TestCase):
         instance = UserJar.from_user_jar(fake_user_jar, 'jar_type', 'name')
         T.assert_equal(
             instance.latest_downloaded_version,
-            'No Jars Downloaded!',
+            NO_JARS_DOWNLOADED,
         )
-
@@ -1,9 +1,11 @@
 
 import jsonschema
+import markupsafe
 import mock
 import testify as T
 
 from schemaform.form import Form
+from schemaform.helpers import html_to_pq
 from schemaform.object_property import ObjectProperty
 from schemaform.types import Types
 
@@ -28,7 +30,9 @@ class TestForm(T.TestCase):
 
     def test_constructs_object_schema(self):
         ObjectProperty_mock = mock.Mock(spec=ObjectProperty)
-        ObjectProperty_mock.return_value.__pq__ = mock.Mock(spec=lambda: None)
+        ObjectProperty_mock.return_value.__html__ = mock.Mock(
+            spec=lambda: None, return_value=markupsafe.Markup('<fieldset/>'),
+        )
         schema = {'type': 'object', 'properties': {'foo': {}}}
 
         with mock.patch.object(
@@ -39,27 +43,21 @@ class TestForm(T.TestCase):
                 Types.OBJECT: ObjectProperty_mock,
             },
         ) as get_property_type_cls_map_mock:
-            pq = Form(schema).__pq__()
+            html = Form(schema).__html__()
             ObjectProperty_mock.assert_called_once_with(
                 '', '', schema, get_property_type_cls_map_mock.return_value
             )
-            T.assert_equal(pq, ObjectProperty_mock().__pq__().wrapAll())
+            T.assert_equal(html, '<form><fieldset/></form>')
 
-    def test_flattened_schema(self):
-        instance = Form({
-            'type': 'object',
-            'properties': {
-                'foo': {
-                    'type': 'object',
-                    'properties': {'bar': {}, 'baz': {}},
-                },
-                'womp': {},
-            }
-        })
-        T.assert_equal(
-            instance._flattened_schema,
-            {'foo.bar': {}, 'foo.baz': {}, 'womp': {}}
+    def test_render_before_and_after(self):
+        html = Form({'type': 'object', 'properties': {'foo': {}}}).render(
+            before=[markupsafe.Markup('<p>before</p>')],
+            after=['<after>'],
         )
+        pq = html_to_pq(html)
+        T.assert_equal(pq.children()[0].tag, 'p')
+        T.assert_equal(pq.children()[1].tag, 'fieldset')
+        T.assert_equal(pq.text(), 'before Foo <after>')
 
     def test_load_data_from_form_missing_values_does_nothing(self):
         instance = Form({'type': 'object', 'properties': {'a': {}, 'b': {}}})
@@ -1,44 +1,78 @@
 
 import collections
-import pyquery
+import markupsafe
+import mock
 import jsonschema
 import testify as T
 
-from schemaform.helpers import combine_pqables
-from schemaform.helpers import el
-from schemaform.helpers import flatten_schema
+from schemaform.helpers import combine_html
+from schemaform.helpers import get_schema_fingerprint
 from schemaform.helpers import get_type_from_schema
+from schemaform.helpers import get_validator
 from schemaform.helpers import get_value_type_from_schema
-from schemaform.helpers import transform_value
+from schemaform.helpers import html_el
+from schemaform.helpers import html_to_pq
+from schemaform.helpers import transform_boolean
 from schemaform.helpers import validate_default_value
 from schemaform.helpers import validate_enum_values
 from schemaform.helpers import validate_schema_against_draft4
 from schemaform.types import Types
 
-class TestEl(T.TestCase):
-    """Some basic tests for the element helper."""
-
-    def assert_is_pyquery(self, element):
-        T.assert_isinstance(element, pyquery.PyQuery)
+class TestHtmlEl(T.TestCase):
+    """Tests building html without parsing."""
 
     def test_base_case(self):
-        element = el('div')
-        self.assert_is_pyquery(element)
-        T.assert_equal(element.__html__(), '<div></div>')
-
-    def test_classname(self):
-        classname = 'herp fwerp'
-        element = el('div', classname=classname)
-        T.assert_equal(element.attr('class'), classname)
-
-    def test_attrs(self):
-        attrs = {
-            'herp': 'derp',
-            'id': 'foo',
-        }
-        element = el('div', **attrs)
-        for attr, value in attrs.iteritems():
-            T.assert_equal(element.attr(attr), value)
+        html = html_el('div')
+        T.assert_isinstance(html, markupsafe.Markup)
+        T.assert_equal(html, '<div></div>')
+
+    def test_attrs_are_sorted_and_escaped(self):
+        html = html_el('div', id='foo', classname='a"b', title='<&>')
+        T.assert_equal(
+            html, '<div class="a&#34;b" id="foo" title="&lt;&amp;&gt;"></div>',
+        )
+
+    def test_text_is_escaped(self):
+        T.assert_equal(html_el('p', text='<b>'), '<p>&lt;b&gt;</p>')
+
+    def test_contents(self):
+        html = html_el('p', html_el('b', text='bold'), ['<i>', html_el('span')])
+        T.assert_equal(html, '<p><b>bold</b>&lt;i&gt;<span></span></p>')
+
+    def test_void_element(self):
+        T.assert_equal(html_el('input', value='1'), '<input value="1">')
+
+    def test_parses_with_html_to_pq(self):
+        element = html_to_pq(html_el('label', text='hi', **{'for': 'foo'}))
+        T.assert_equal(element.attr('for'), 'foo')
+        T.assert_equal(element.text(), 'hi')
+
+class TestGetValidator(T.TestCase):
+
+    def test_fingerprint_ignores_key_order(self):
+        T.assert_equal(
+            get_schema_fingerprint({'type': 'integer', 'minimum': 1}),
+            get_schema_fingerprint({'minimum': 1, 'type': 'integer'}),
+        )
+
+    def test_equal_schemas_share_a_validator(self):
+        validator = get_validator({'type': 'integer', 'maximum': 17})
+        T.assert_is(get_validator({'type': 'integer', 'maximum': 17}), validator)
+        T.assert_is_not(get_validator({'type': 'integer', 'maximum': 18}), validator)
+
+    def test_validator_is_not_affected_by_changing_the_schema(self):
+        schema = {'type': 'integer', 'maximum': 19}
+        validator = get_validator(schema)
+        schema['maximum'] = 0
+        validator.validate(19)
+
+    def test_invalid_schema(self):
+        with T.assert_raises(jsonschema.SchemaError):
+            get_validator({'type': 'not_a_real_type'})
+
+    def test_validates(self):
+        with T.assert_raises(jsonschema.ValidationError):
+            get_validator({'type': 'string'}).validate(1)
 
 class TestSmokeValidateSchemaAgainstDraft4(T.TestCase):
 
@@ -51,6 +85,14 @@ class TestSmokeValidateSchemaAgainstDraft4(T.TestCase):
     def test_passing_schema(self):
         validate_schema_against_draft4({'type': 'object'})
 
+    def test_passing_schema_is_only_validated_once(self):
+        validate_schema_against_draft4({'type': 'object', 'title': 'once'})
+        with mock.patch.object(
+            jsonschema.Draft4Validator, 'validate', autospec=True,
+        ) as validate_mock:
+            validate_schema_against_draft4({'type': 'object', 'title': 'once'})
+            T.assert_equal(validate_mock.call_count, 0)
+
 class TestValidateDefaultValue(T.TestCase):
     """Tests the validate_default_value function."""
 
@@ -118,102 +160,48 @@ class TestGetValueTypeFromSchema(T.TestCase):
         value_type = get_value_type_from_schema({'type': 'foo'})
         T.assert_equal(value_type, 'foo')
 
-class TestCombinePqableObjects(T.TestCase):
-    class Pqable(object):
-        def __pq__(self):
-            return el('div', text='pqable')
-
-    class IterablePqable(collections.namedtuple('Foo', ['bar'])):
-        def __pq__(self):
-            return el('div', text=self.bar)
-
-    class IterablePqable2(collections.namedtuple('Bar', ['baz'])):
-        def __pq__(self):
-            return el('div', text=self.baz)
-
-    def test_combine_pqables(self):
-        ret = combine_pqables(
-            pyquery.PyQuery('<div>'),
-            [pyquery.PyQuery('<div>'), pyquery.PyQuery('<span>')],
-            self.Pqable(),
-            [self.Pqable(), self.Pqable()],
-        )
-        T.assert_equal(
-            ret.__html__(),
-            pyquery.PyQuery(
-                '<div/><div/><span/><div>pqable</div><div>pqable</div><div>pqable</div>',
-                parser='html_fragments',
-            ).__html__(),
-        )
+class TestCombineHtml(T.TestCase):
+    class Htmlable(object):
+        def __html__(self):
+            return '<div>htmlable</div>'
 
-    def test_combine_pqable_objects_with_acceptable_iterable_type(self):
-        ret = combine_pqables(
-            self.IterablePqable('foo'),
-            acceptable_iterable_type=self.IterablePqable
+    class IterableHtmlable(collections.namedtuple('Foo', ['bar'])):
+        def __html__(self):
+            return html_el('div', text=self.bar)
+
+    def test_combine_html(self):
+        ret = combine_html(
+            markupsafe.Markup('<div/>'),
+            ['<escaped>', self.Htmlable()],
         )
-        T.assert_equal(ret.__html__(), '<div>foo</div>')
-
-    def test_combine_pqable_objects_with_acceptable_iterable_types(self):
-        ret = combine_pqables(
-            self.IterablePqable('foo'),
-            self.IterablePqable2('baz'),
-            acceptable_iterable_type=[
-                self.IterablePqable,
-                self.IterablePqable2,
-            ],
+        T.assert_equal(ret, '<div/>&lt;escaped&gt;<div>htmlable</div>')
+
+    def test_combine_html_with_acceptable_iterable_type(self):
+        ret = combine_html(
+            self.IterableHtmlable('foo'),
+            acceptable_iterable_type=self.IterableHtmlable,
         )
-        T.assert_equal(ret.__html__(), '<div>foo</div><div>baz</div>')
-
-
-class TestTransformValue(T.TestCase):
-
-    def test_transforms_int(self):
-        ret = transform_value('1', {'type': Types.INTEGER})
-        T.assert_equal(ret, 1)
-
-    def test_transform_boolean(self):
-        ret = transform_value('on', {'type': Types.BOOLEAN})
-        T.assert_equal(ret, True)
-
-    def test_transform_boolean_falsey(self):
-        ret = transform_value(None, {'type': Types.BOOLEAN})
-        T.assert_equal(ret, False)
-
-    def test_transform_number(self):
-        ret = transform_value('1.5', {'type': Types.NUMBER})
-        T.assert_equal(ret, 1.5)
-
-    def test_transform_bad_value_returns_value(self):
-        bad_value = 'abc'
-        ret = transform_value(bad_value, {'type': Types.INTEGER})
-        T.assert_is(ret, bad_value)
-
-    def test_noop_passthrough(self):
-        value = 'foo'
-        ret = transform_value(value, {'type': Types.STRING})
-        T.assert_is(ret, value)
-
-class TestFlattenSchema(T.TestCase):
-    def test_flatten_schema_trivial(self):
-        in_schema = {'type': 'object', 'properties': {'foo': {}, 'bar': {}}}
-        out_schema = flatten_schema(in_schema)
-        T.assert_equal(out_schema, {'foo': {}, 'bar': {}})
-
-    def test_flatten_schema_nested(self):
-        in_schema = {
-            'type': 'object',
-            'properties': {
-                'a': {
-                    'type': 'object',
-                    'properties': {
-                        'b': {},
-                    },
-                },
-                'd': {},
-            }
-        }
-        out_schema = flatten_schema(in_schema)
-        T.assert_equal(out_schema, {'a.b': {}, 'd': {}})
+        T.assert_equal(ret, '<div>foo</div>')
+
+
+class TestTransformBoolean(T.TestCase):
+
+    def test_submitted_values(self):
+        for value, expected in (
+            ('on', True),
+            ('TRUE', True),
+            ('1', True),
+            ('False', False),
+            ('0', False),
+            (True, True),
+            (None, False),
+        ):
+            T.assert_equal(transform_boolean(value), expected)
+
+    def test_other_values_are_errors(self):
+        for value in ('', 'yes', 2):
+            with T.assert_raises(ValueError):
+                transform_boolean(value)
 
 if __name__ == '__main__':
     T.run()
@@ -0,0 +1,100 @@
+
+import testify as T
+
+from schemaform.load_plan import FieldLoader
+from schemaform.load_plan import LoadPlan
+from schemaform.load_plan import ROOT
+
+NESTED_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'a': {
+            'type': 'object',
+            'properties': {
+                'b': {
+                    'type': 'object',
+                    'properties': {'c': {'type': 'integer'}},
+                },
+                'd': {'type': 'boolean'},
+            },
+        },
+        'e': {'type': 'number'},
+        'f': {'enum': ['x', 'y']},
+    },
+}
+
+class TestLoadPlan(T.TestCase):
+
+    def test_from_schema(self):
+        plan = LoadPlan.from_schema({
+            'type': 'object',
+            'properties': {
+                'a': {'type': 'object', 'properties': {'b': {}}},
+                'c': {'type': 'integer'},
+            },
+        })
+        T.assert_equal(plan.containers, [(None, None), (ROOT, 'a')])
+        T.assert_sorted_equal(plan.fields, [
+            FieldLoader('a.b', 1, 'b', None, False),
+            FieldLoader('c', ROOT, 'c', int, False),
+        ])
+
+    def test_load_nested(self):
+        plan = LoadPlan.from_schema(NESTED_SCHEMA)
+        values = plan.load({'a.b.c': '5', 'e': '1.5', 'f': 'y'})
+        T.assert_equal(
+            values,
+            {'a': {'b': {'c': 5}, 'd': False}, 'e': 1.5, 'f': 'y'},
+        )
+
+    def test_load_missing_values_does_not_create_containers(self):
+        plan = LoadPlan.from_schema({
+            'type': 'object',
+            'properties': {
+                'a': {'type': 'object', 'properties': {'b': {}}},
+            },
+        })
+        T.assert_equal(plan.load({}), {})
+
+    def test_load_creates_missing_parents(self):
+        plan = LoadPlan.from_schema({
+            'type': 'object',
+            'properties': {
+                'a': {
+                    'type': 'object',
+                    'properties': {
+                        'b': {'type': 'object', 'properties': {'c': {}}},
+                        'd': {},
+                    },
+                },
+            },
+        })
+        T.assert_equal(plan.load({'a.b.c': 'foo'}), {'a': {'b': {'c': 'foo'}}})
+        T.assert_equal(plan.load({'a.d': 'foo'}), {'a': {'d': 'foo'}})
+
+    def test_load_bad_value_is_kept(self):
+        plan = LoadPlan.from_schema(NESTED_SCHEMA)
+        T.assert_equal(plan.load({'e': 'abc'})['e'], 'abc')
+
+    def test_plan_is_reusable(self):
+        plan = LoadPlan.from_schema(NESTED_SCHEMA)
+        first = plan.load({'a.b.c': '1'})
+        second = plan.load({'e': '2'})
+        T.assert_equal(first, {'a': {'b': {'c': 1}, 'd': False}})
+        T.assert_equal(second, {'a': {'d': False}, 'e': 2.0})
+
+    def test_load_booleans(self):
+        plan = LoadPlan.from_schema(NESTED_SCHEMA)
+        for submitted, loaded in (
+            ('on', True),
+            ('True', True),
+            ('1', True),
+            ('false', False),
+            ('0', False),
+            (False, False),
+        ):
+            T.assert_equal(plan.load({'a.d': submitted}), {'a': {'d': loaded}})
+
+    def test_load_bad_boolean_is_kept(self):
+        plan = LoadPlan.from_schema(NESTED_SCHEMA)
+        T.assert_equal(plan.load({'a.d': 'maybe'}), {'a': {'d': 'maybe'}})
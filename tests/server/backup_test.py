@@ -0,0 +1,182 @@
+
+import contextlib
+import cStringIO
+import mock
+import os
+import os.path
+import sys
+import testify as T
+import time
+
+import server.backup
+from server.backup import BackupEngine
+from server.backup import ChunkStore
+from server.backup import get_world_directories
+from server.backup import main
+from server.backup import saves_paused
+from server.user_server import UserServer
+from testing.base_classes.pymsm_server_test_case import PymsmServerTestCase
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+from util.properties import update_properties_file
+
+CHUNK_SIZE = 16
+
+
+class TestChunkStore(TempdirTestCase):
+
+    def test_stores_each_chunk_once(self):
+        chunk_store = ChunkStore(self.tempdir)
+        digest, written = chunk_store.put('foo')
+        T.assert_equal(written, True)
+        T.assert_equal(chunk_store.put('foo'), (digest, False))
+        T.assert_equal(chunk_store.get(digest), 'foo')
+        T.assert_equal(
+            chunk_store.get_chunk_path(digest),
+            os.path.join(
+                self.tempdir, 'chunks', 'sha256', digest[:2], digest,
+            ),
+        )
+
+
+class TestSavesPaused(T.TestCase):
+
+    def test_pauses_saves(self):
+        run_command = mock.Mock()
+        with saves_paused(run_command):
+            T.assert_equal(
+                [args for args, _ in run_command.call_args_list],
+                [server.backup.SAVE_OFF, server.backup.SAVE_ALL],
+            )
+        run_command.assert_called_with(*server.backup.SAVE_ON)
+
+    def test_resumes_saves_on_error(self):
+        run_command = mock.Mock()
+        with T.assert_raises(ValueError):
+            with saves_paused(run_command):
+                raise ValueError()
+        run_command.assert_called_with(*server.backup.SAVE_ON)
+
+
+class TestBackupEngine(PymsmServerTestCase):
+
+    @T.setup_teardown
+    def setup_server(self):
+        self.server_dir = os.path.join(self.servers_path, 'a')
+        os.makedirs(os.path.join(self.server_dir, 'world', 'region'))
+        self.user_server = UserServer(self.server_dir)
+        self.engine = BackupEngine()
+        self.now = time.time()
+        with mock.patch.object(server.backup, 'CHUNK_SIZE', CHUNK_SIZE):
+            yield
+
+    def _write(self, relative_path, contents, age=60):
+        """Writes a world file whose mtime is age seconds in the past."""
+        path = os.path.join(self.server_dir, relative_path)
+        with open(path, 'wb') as world_file:
+            world_file.write(contents)
+        os.utime(path, (self.now - age, self.now - age))
+
+    def test_get_world_directories(self):
+        os.mkdir(os.path.join(self.server_dir, 'world_the_end'))
+        T.assert_equal(
+            get_world_directories(self.user_server),
+            ['world', 'world_the_end'],
+        )
+        with open(self.user_server.server_properties_path, 'w'):
+            pass
+        update_properties_file(
+            self.user_server.server_properties_path, {'level-name': 'other'},
+        )
+        T.assert_equal(get_world_directories(self.user_server), [])
+
+    def test_round_trip(self):
+        self._write('world/level.dat', 'level')
+        self._write('world/region/r.0.0.mca', 'a' * CHUNK_SIZE + 'b' * 5)
+        result = self.engine.backup(self.user_server)
+        T.assert_equal(result.files, 2)
+        T.assert_equal(result.changed_files, 2)
+        T.assert_equal(result.new_chunks, 3)
+        T.assert_equal(self.engine.list_snapshots('a'), [result.snapshot_id])
+
+        destination = os.path.join(self.tempdir, 'restored')
+        self.engine.restore('a', result.snapshot_id, destination)
+        with open(
+            os.path.join(destination, 'world', 'region', 'r.0.0.mca'), 'rb',
+        ) as restored_file:
+            T.assert_equal(restored_file.read(), 'a' * CHUNK_SIZE + 'b' * 5)
+
+    def test_identical_chunks_are_stored_once(self):
+        self._write('world/region/r.0.0.mca', 'a' * CHUNK_SIZE * 3)
+        self._write('world/region/r.0.1.mca', 'a' * CHUNK_SIZE)
+        result = self.engine.backup(self.user_server)
+        T.assert_equal(result.new_chunks, 1)
+
+    def test_unchanged_files_are_not_read(self):
+        self._write('world/level.dat', 'level')
+        self._write('world/region/r.0.0.mca', 'a' * CHUNK_SIZE * 2)
+        self.engine.backup(self.user_server)
+
+        self._write('world/region/r.0.0.mca', 'a' * CHUNK_SIZE + 'c' * 3, 30)
+        result = self.engine.backup(self.user_server)
+        T.assert_equal(result.files, 2)
+        T.assert_equal(result.changed_files, 1)
+        T.assert_equal(result.new_chunks, 1)
+        T.assert_equal(result.bytes_read, CHUNK_SIZE + 3)
+        T.assert_equal(len(self.engine.list_snapshots('a')), 2)
+
+    def test_recently_modified_files_are_read_again(self):
+        # Could have changed again within the mtime's resolution
+        self._write('world/level.dat', 'level', age=0)
+        self.engine.backup(self.user_server)
+        result = self.engine.backup(self.user_server)
+        T.assert_equal(result.changed_files, 1)
+        T.assert_equal(result.new_chunks, 0)
+
+    def test_removed_files_are_not_in_the_next_snapshot(self):
+        self._write('world/level.dat', 'level')
+        self._write('world/region/r.0.0.mca', 'region')
+        self.engine.backup(self.user_server)
+        os.remove(os.path.join(self.server_dir, 'world/region/r.0.0.mca'))
+        result = self.engine.backup(self.user_server)
+        T.assert_equal(
+            self.engine.get_manifest('a', result.snapshot_id)['files'].keys(),
+            ['world/level.dat'],
+        )
+
+    def test_pauses_saves(self):
+        run_command = mock.Mock()
+        self.engine.backup(self.user_server, run_command)
+        T.assert_equal(run_command.call_count, 3)
+
+    def test_snapshots_within_a_second_are_ordered(self):
+        snapshots_directory = os.path.join(self.backups_path, 'snapshots', 'a')
+        os.makedirs(snapshots_directory)
+        snapshot_ids = ['20200101T000000Z'] + [
+            '20200101T000000Z.{0}'.format(suffix) for suffix in xrange(1, 12)
+        ] + ['20200101T000001Z']
+        for snapshot_id in snapshot_ids:
+            with open(
+                os.path.join(snapshots_directory, snapshot_id + '.json'), 'w',
+            ):
+                pass
+        T.assert_equal(self.engine.list_snapshots('a'), snapshot_ids)
+
+
+class TestMain(PymsmServerTestCase):
+
+    def test_missing_server_properties(self):
+        os.makedirs(os.path.join(self.servers_path, 'a', 'world'))
+        with contextlib.nested(
+            mock.patch.object(sys, 'stdout', cStringIO.StringIO()),
+            mock.patch.object(
+                server.backup,
+                'saves_paused',
+                wraps=server.backup.saves_paused,
+            ),
+        ) as (stdout, saves_paused_mock):
+            T.assert_equal(main(['a']), 0)
+        T.assert_equal(
+            stdout.getvalue().splitlines()[0],
+            'a: server.properties is missing, saves are not paused',
+        )
+        saves_paused_mock.assert_called_once_with(None)
@@ -0,0 +1,197 @@
+
+import mock
+import os
+import os.path
+import testify as T
+
+import server.console_log
+from server.console_log import ConsoleLog
+from server.console_log import LogFollower
+from server.console_log import ServerConsole
+from server.console_log import split_lines
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+
+class TestSplitLines(T.TestCase):
+
+    def test_split_lines(self):
+        T.assert_equal(split_lines('a', 'b\r\nc\nd'), (['ab', 'c'], 'd'))
+        T.assert_equal(split_lines('', ''), ([], ''))
+
+    def test_long_partial_line_is_flushed(self):
+        with mock.patch.object(server.console_log, 'MAX_LINE_LENGTH', 3):
+            T.assert_equal(split_lines('ab', 'cd'), (['abcd'], ''))
+            T.assert_equal(split_lines('', 'a\nbc'), (['a'], 'bc'))
+
+
+class TestConsoleLog(T.TestCase):
+
+    @T.setup_teardown
+    def setup_console_log(self):
+        self.console_log = ConsoleLog(max_lines=5)
+        self.console_log.extend(str(i) for i in xrange(8))
+        yield
+
+    def test_keeps_latest_lines(self):
+        T.assert_equal(self.console_log.first_cursor, 3)
+        T.assert_equal(self.console_log.next_cursor, 8)
+
+    def test_get_page_defaults_to_latest_lines(self):
+        page = self.console_log.get_page(limit=2)
+        T.assert_equal(page.lines, [(6, '6'), (7, '7')])
+        T.assert_equal(page.next_cursor, 8)
+        T.assert_equal(page.truncated, False)
+
+    def test_get_page_pages_from_cursor(self):
+        page = self.console_log.get_page(4, limit=2)
+        T.assert_equal(page.lines, [(4, '4'), (5, '5')])
+        page = self.console_log.get_page(page.next_cursor, limit=10)
+        T.assert_equal(page.lines, [(6, '6'), (7, '7')])
+        page = self.console_log.get_page(page.next_cursor)
+        T.assert_equal(page.lines, [])
+        T.assert_equal(page.next_cursor, 8)
+
+    def test_get_page_of_dropped_lines_is_truncated(self):
+        page = self.console_log.get_page(0, limit=2)
+        T.assert_equal(page.lines, [(3, '3'), (4, '4')])
+        T.assert_equal(page.truncated, True)
+
+    def test_get_page_after_the_end_is_clamped(self):
+        page = self.console_log.get_page(100)
+        T.assert_equal(page.lines, [])
+        T.assert_equal(page.next_cursor, 8)
+        T.assert_equal(page.truncated, False)
+
+    def test_get_page_before_the_start_is_clamped(self):
+        page = self.console_log.get_page(-5, limit=1)
+        T.assert_equal(page.lines, [(3, '3')])
+        T.assert_equal(page.next_cursor, 4)
+        T.assert_equal(page.truncated, True)
+
+    def test_get_page_invalid_limit(self):
+        for limit in (0, -1):
+            with T.assert_raises(ValueError):
+                self.console_log.get_page(limit=limit)
+
+    def test_long_lines_are_cut(self):
+        self.console_log.append('x' * (server.console_log.MAX_LINE_LENGTH + 1))
+        T.assert_equal(
+            len(self.console_log.get_page(8).lines[0][1]),
+            server.console_log.MAX_LINE_LENGTH,
+        )
+
+    def test_to_dict(self):
+        T.assert_equal(self.console_log.get_page(7).to_dict(), {
+            'lines': [{'cursor': 7, 'line': '7'}],
+            'next_cursor': 8,
+            'truncated': False,
+        })
+
+
+class TestLogFollower(TempdirTestCase):
+
+    @T.setup_teardown
+    def setup_follower(self):
+        self.path = os.path.join(self.tempdir, 'latest.log')
+        self.console_log = ConsoleLog()
+        self.follower = LogFollower(self.path, self.console_log)
+        yield
+
+    def _write(self, data, mode='ab'):
+        with open(self.path, mode) as log_file:
+            log_file.write(data)
+
+    @property
+    def lines(self):
+        return [line for _, line in self.console_log.get_page(0).lines]
+
+    def test_missing_file(self):
+        T.assert_equal(self.follower.poll(), 0)
+
+    def test_reads_only_new_complete_lines(self):
+        self._write('a\r\nb\nc')
+        T.assert_equal(self.follower.poll(), 2)
+        T.assert_equal(self.follower.poll(), 0)
+        self._write('d\ne\n')
+        T.assert_equal(self.follower.poll(), 2)
+        T.assert_equal(self.lines, ['a', 'b', 'cd', 'e'])
+
+    def test_long_partial_lines_are_flushed(self):
+        with mock.patch.object(server.console_log, 'MAX_LINE_LENGTH', 4):
+            self._write('abc')
+            T.assert_equal(self.follower.poll(), 0)
+            self._write('de')
+            T.assert_equal(self.follower.poll(), 1)
+            self._write('f\n')
+            T.assert_equal(self.follower.poll(), 1)
+        T.assert_equal(self.lines, ['abcd', 'f'])
+
+    def test_reads_from_offset(self):
+        self._write('a\n')
+        self.follower.poll()
+        self._write('b\n')
+        with mock.patch.object(
+            server.console_log, 'open', create=True, side_effect=open,
+        ) as open_mock:
+            self.follower.poll()
+        T.assert_equal(open_mock.call_count, 1)
+        T.assert_equal(self.lines, ['a', 'b'])
+
+    def test_follows_rotated_file(self):
+        self._write('a\nb\n')
+        self.follower.poll()
+        os.remove(self.path)
+        self._write('c\n')
+        self.follower.poll()
+        T.assert_equal(self.lines, ['a', 'b', 'c'])
+
+    def test_follows_truncated_file(self):
+        self._write('a\nb\n')
+        self.follower.poll()
+        self._write('c\n', mode='wb')
+        self.follower.poll()
+        T.assert_equal(self.lines, ['a', 'b', 'c'])
+
+    def test_only_catches_up_on_the_end_of_big_files(self):
+        self._write(''.join('line {0}\n'.format(i) for i in xrange(10)))
+        with mock.patch.object(server.console_log, 'MAX_CATCH_UP_BYTES', 15):
+            self.follower.poll()
+        T.assert_equal(self.lines, ['line 8', 'line 9'])
+
+
+class TestServerConsole(TempdirTestCase):
+
+    @T.setup_teardown
+    def setup_server_console(self):
+        os.mkdir(os.path.join(self.tempdir, 'logs'))
+        self.log_path = os.path.join(
+            self.tempdir, server.console_log.LATEST_LOG,
+        )
+        with open(self.log_path, 'w') as log_file:
+            log_file.write('old\n')
+        self.server_console = ServerConsole(self.tempdir)
+        yield
+
+    def test_get_page_follows_log(self):
+        T.assert_equal(self.server_console.get_page().lines, [(0, 'old')])
+
+    def test_iter_lines(self):
+        self.server_console.get_page()
+        lines = self.server_console.iter_lines(1)
+        with open(self.log_path, 'a') as log_file:
+            log_file.write('new\n')
+        with mock.patch.object(server.console_log, 'FOLLOW_POLL_INTERVAL', 0):
+            T.assert_equal(next(lines), (1, 'new'))
+
+    def test_iter_lines_keepalive(self):
+        lines = self.server_console.iter_lines(keepalive_interval=0)
+        with mock.patch.object(server.console_log, 'FOLLOW_POLL_INTERVAL', 0):
+            T.assert_equal(next(lines), None)
+
+    def test_feed_from(self):
+        managed_server = mock.Mock(output_listeners=[])
+        self.server_console.feed_from(managed_server)
+        for listener in managed_server.output_listeners:
+            listener(managed_server, 'from stdout')
+        T.assert_equal(
+            self.server_console.get_page().lines, [(0, 'from stdout')],
+        )
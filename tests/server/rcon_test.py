@@ -0,0 +1,205 @@
+
+import contextlib
+import mock
+import os.path
+import testify as T
+
+import server.rcon
+from server.rcon import RconAuthenticationError
+from server.rcon import RconConfig
+from server.rcon import RconConnection
+from server.rcon import RconError
+from server.rcon import RconNotEnabledError
+from server.rcon import RconPool
+from server.rcon import run_command_on_servers
+from server.user_server import UserServer
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+from testing.utilities.fake_rcon_server import FakeRconServer
+from util.properties import Properties
+
+PASSWORD = 'hunter2'
+
+class TestRconConfig(T.TestCase):
+
+    def test_from_server_properties(self):
+        T.assert_equal(
+            RconConfig.from_server_properties({
+                'enable-rcon': 'true',
+                'rcon.port': '25580',
+                'rcon.password': PASSWORD,
+            }),
+            RconConfig('127.0.0.1', 25580, PASSWORD),
+        )
+
+    def test_defaults(self):
+        T.assert_equal(
+            RconConfig.from_server_properties({
+                'enable-rcon': 'true',
+                'rcon.password': PASSWORD,
+                'server-ip': '10.0.0.1',
+            }),
+            RconConfig('10.0.0.1', 25575, PASSWORD),
+        )
+
+    def test_not_enabled(self):
+        for server_properties in (
+            {},
+            {'enable-rcon': 'false', 'rcon.password': PASSWORD},
+            {'enable-rcon': 'true', 'rcon.password': ''},
+            {
+                'enable-rcon': 'true',
+                'rcon.password': PASSWORD,
+                'rcon.port': 'nope',
+            },
+        ):
+            with T.assert_raises(RconNotEnabledError):
+                RconConfig.from_server_properties(server_properties)
+
+
+class RconTestCase(T.TestCase):
+    __test__ = False
+
+    @T.setup_teardown
+    def serve(self):
+        self.fake_server = FakeRconServer(PASSWORD, {
+            'list': 'There are 0 of a max 20 players online:',
+            'long': 'x' * 10000,
+        })
+        with self.fake_server.serving():
+            self.config = RconConfig('127.0.0.1', self.fake_server.port, PASSWORD)
+            yield
+
+
+class TestRconConnection(RconTestCase):
+
+    def test_command(self):
+        connection = RconConnection(self.config)
+        try:
+            T.assert_equal(
+                connection.command('list'),
+                'There are 0 of a max 20 players online:',
+            )
+            T.assert_equal(connection.command('long'), 'x' * 10000)
+            T.assert_equal(connection.command(u'say hi'), 'Unknown command')
+        finally:
+            connection.close()
+        T.assert_equal(self.fake_server.commands, ['list', 'long', 'say hi'])
+
+    def test_wrong_password(self):
+        with T.assert_raises(RconAuthenticationError):
+            RconConnection(self.config._replace(password='wrong'))
+
+    def test_cannot_connect(self):
+        self.fake_server._server.server_close()
+        with T.assert_raises(RconError):
+            RconConnection(self.config)
+
+    def test_is_healthy(self):
+        connection = RconConnection(self.config)
+        try:
+            T.assert_equal(connection.is_healthy(), True)
+            with mock.patch.object(server.rcon, 'HEALTH_CHECK_INTERVAL', 0):
+                T.assert_equal(connection.is_healthy(), True)
+            # Pinging doesn't run a command
+            T.assert_equal(self.fake_server.commands, [])
+
+            self.fake_server.drop_connections()
+            T.assert_equal(connection.is_healthy(), False)
+        finally:
+            connection.close()
+
+
+class TestRconPool(RconTestCase):
+
+    @T.setup_teardown
+    def setup_pool(self):
+        self.pool = RconPool(self.config)
+        try:
+            yield
+        finally:
+            self.pool.close()
+
+    def test_reuses_connections(self):
+        for _ in xrange(3):
+            self.pool.command('list')
+        T.assert_equal(self.fake_server.connections, 1)
+
+    def test_replaces_dropped_connections(self):
+        self.pool.command('list')
+        self.fake_server.drop_connections()
+        T.assert_equal(
+            self.pool.command('list'),
+            'There are 0 of a max 20 players online:',
+        )
+        T.assert_equal(self.fake_server.connections, 2)
+
+    def test_concurrent_checkouts_use_separate_connections(self):
+        with contextlib.nested(
+            self.pool.connection(), self.pool.connection(),
+        ) as (first, second):
+            T.assert_is_not(first, second)
+        self.pool.command('list')
+        T.assert_equal(self.fake_server.connections, 2)
+
+    def test_failed_connection_is_not_reused(self):
+        with T.assert_raises(ValueError):
+            with self.pool.connection():
+                raise ValueError
+        self.pool.command('list')
+        T.assert_equal(self.fake_server.connections, 2)
+
+
+class TestRunCommandOnServers(RconTestCase, TempdirTestCase):
+
+    @T.setup_teardown
+    def close_pools(self):
+        server.rcon.close_rcon_pools()
+        yield
+        server.rcon.close_rcon_pools()
+
+    def _make_server(self, name, server_properties):
+        server_dir = os.path.join(self.tempdir, name)
+        os.mkdir(server_dir)
+        with open(os.path.join(server_dir, 'server.properties'), 'w') as f:
+            Properties(server_properties).dump(f)
+        return UserServer(server_dir)
+
+    def _make_enabled_server(self, name, password=PASSWORD):
+        return self._make_server(name, {
+            'enable-rcon': 'true',
+            'rcon.port': str(self.fake_server.port),
+            'rcon.password': password,
+        })
+
+    def test_run_command_on_servers(self):
+        user_servers = [
+            self._make_enabled_server('a'),
+            self._make_server('b', {}),
+            self._make_enabled_server('c', password='wrong'),
+            self._make_enabled_server('d'),
+        ]
+        results = run_command_on_servers(user_servers, 'list')
+        T.assert_equal(
+            [result.server_dir for result in results],
+            [user_server.server_dir for user_server in user_servers],
+        )
+        T.assert_equal(
+            [result.success for result in results], [True, False, False, True],
+        )
+        T.assert_equal(
+            results[0].response, 'There are 0 of a max 20 players online:',
+        )
+        T.assert_equal(
+            results[1].error, 'RconNotEnabledError: enable-rcon is not true.',
+        )
+        T.assert_equal(
+            results[2].error,
+            'RconAuthenticationError: Wrong rcon.password.',
+        )
+
+    def test_user_server_pool_is_shared(self):
+        user_server = self._make_enabled_server('a')
+        T.assert_is(user_server.rcon, UserServer(user_server.server_dir).rcon)
+
+    def test_no_servers(self):
+        T.assert_equal(run_command_on_servers([], 'list'), [])
@@ -0,0 +1,416 @@
+
+import contextlib
+import cStringIO
+import errno
+import mock
+import os
+import os.path
+import stat
+import sys
+import testify as T
+import threading
+import time
+
+import server.console_log
+import server.supervisor
+from server.supervisor import BACKOFF
+from server.supervisor import JvmOptions
+from server.supervisor import ManagedServer
+from server.supervisor import RUNNING
+from server.supervisor import STOPPED
+from server.supervisor import STOPPING
+from server.supervisor import Supervisor
+from server.supervisor import SupervisorError
+from server.user_server import UserServer
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+
+# Stands in for java: echoes console commands, exits on stop and ignores
+# everything (including SIGTERM) after hang.  A server directory containing a
+# "crash" file makes it exit right away instead.
+FAKE_JAVA = '''#!{executable}
+import os
+import sys
+
+print 'Starting with', ' '.join(sys.argv[1:])
+sys.stdout.flush()
+if os.path.exists('crash'):
+    sys.exit(1)
+for line in iter(sys.stdin.readline, ''):
+    command = line.strip()
+    if command == 'stop':
+        print 'Stopping the server'
+        sys.exit(0)
+    elif command == 'hang':
+        print 'Hanging'
+        sys.stdout.flush()
+        import signal
+        import time
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        while True:
+            time.sleep(1)
+    else:
+        print 'Unknown command:', command
+        sys.stdout.flush()
+'''
+
+# Seconds to run the event loop before giving up on a condition
+WAIT_TIMEOUT = 10
+
+
+class TestJvmOptions(T.TestCase):
+
+    def test_get_command(self):
+        T.assert_equal(
+            JvmOptions(max_heap='2G', extra_flags=['-Dfoo=bar']).get_command(
+                'minecraft_server.jar',
+            ),
+            [
+                'java', '-Xms1G', '-Xmx2G', '-XX:+UseG1GC', '-Dfoo=bar',
+                '-jar', 'minecraft_server.jar', 'nogui',
+            ],
+        )
+
+
+class TestParseServer(TempdirTestCase):
+
+    def test_parse_server(self):
+        with mock.patch.object(
+            server.supervisor, 'get_server_jar_path', return_value='a.jar',
+        ) as get_server_jar_path_mock:
+            managed_server = server.supervisor._parse_server(
+                self.tempdir + '/:VanillaJarDownloader/vanilla',
+                JvmOptions(),
+            )
+        get_server_jar_path_mock.assert_called_once_with(
+            'VanillaJarDownloader', 'vanilla',
+        )
+        T.assert_equal(managed_server.name, os.path.basename(self.tempdir))
+        T.assert_equal(managed_server.user_server.server_dir, self.tempdir + '/')
+        T.assert_equal(managed_server.jar_path, 'a.jar')
+
+    def test_invalid(self):
+        with T.assert_raises(ValueError):
+            server.supervisor._parse_server(self.tempdir, JvmOptions())
+
+
+class TestMain(TempdirTestCase):
+
+    def test_duplicate_server_names(self):
+        server_dirs = [
+            os.path.join(self.tempdir, name, 'world') for name in ('a', 'b')
+        ]
+        for server_dir in server_dirs:
+            os.makedirs(server_dir)
+        with contextlib.nested(
+            mock.patch.object(
+                server.supervisor, 'get_server_jar_path', return_value='a.jar',
+            ),
+            mock.patch.object(server.supervisor, 'Supervisor', autospec=True),
+            mock.patch.object(sys, 'stderr', cStringIO.StringIO()),
+        ) as (_, Supervisor_mock, stderr):
+            with T.assert_raises(SystemExit):
+                server.supervisor.main([
+                    server_dir + ':A/a' for server_dir in server_dirs
+                ])
+        T.assert_in('Duplicate server name: world', stderr.getvalue())
+        T.assert_equal(Supervisor_mock.call_count, 0)
+
+class TestManagedServerCheckExited(T.TestCase):
+
+    @T.setup_teardown
+    def setup_server(self):
+        self.managed_server = ManagedServer(
+            'a', mock.Mock(server_dir='/nonexistent'), 'minecraft_server.jar',
+        )
+        self.managed_server.state = RUNNING
+        self.managed_server.started_at = 0
+        self.managed_server.process = mock.Mock()
+        self.managed_server.process.poll.return_value = 1
+        with mock.patch.object(
+            self.managed_server, 'read_output', return_value=None,
+        ):
+            yield
+
+    def test_still_running(self):
+        self.managed_server.process.poll.return_value = None
+        T.assert_equal(self.managed_server.check_exited(10), False)
+        T.assert_equal(self.managed_server.state, RUNNING)
+
+    def test_backoff_doubles(self):
+        for crashes, backoff in ((1, 1), (2, 2), (3, 4)):
+            self.managed_server.state = RUNNING
+            T.assert_equal(self.managed_server.check_exited(10), True)
+            T.assert_equal(self.managed_server.state, BACKOFF)
+            T.assert_equal(self.managed_server.crashes, crashes)
+            T.assert_equal(self.managed_server.deadline, 10 + backoff)
+
+    def test_backoff_is_capped(self):
+        self.managed_server.crashes = 100
+        self.managed_server.started_at = 10
+        self.managed_server.check_exited(20)
+        T.assert_equal(
+            self.managed_server.deadline, 20 + server.supervisor.MAX_BACKOFF,
+        )
+
+    def test_stable_server_resets_crashes(self):
+        self.managed_server.crashes = 5
+        self.managed_server.check_exited(server.supervisor.STABLE_UPTIME)
+        T.assert_equal(self.managed_server.crashes, 1)
+
+    def test_stopping_server_stops(self):
+        self.managed_server.state = STOPPING
+        self.managed_server.check_exited(10)
+        T.assert_equal(self.managed_server.state, STOPPED)
+        T.assert_equal(self.managed_server.deadline, None)
+
+
+class TestManagedServerReadOutput(T.TestCase):
+
+    @T.setup_teardown
+    def setup_server(self):
+        self.managed_server = ManagedServer(
+            'a', mock.Mock(server_dir='/nonexistent'), 'minecraft_server.jar',
+        )
+        read_fd, self.write_fd = os.pipe()
+        self.managed_server.process = mock.Mock()
+        self.managed_server.process.stdout.fileno.return_value = read_fd
+        self.lines = []
+        self.managed_server.output_listeners.append(
+            lambda _, line: self.lines.append(line),
+        )
+        try:
+            yield
+        finally:
+            os.close(read_fd)
+            os.close(self.write_fd)
+
+    def test_emits_complete_lines(self):
+        os.write(self.write_fd, 'a\r\nb')
+        T.assert_equal(self.managed_server.read_output(), 4)
+        os.write(self.write_fd, 'c\n')
+        self.managed_server.read_output()
+        T.assert_equal(self.lines, ['a', 'bc'])
+
+    def test_long_partial_line_is_flushed(self):
+        with mock.patch.object(server.console_log, 'MAX_LINE_LENGTH', 3):
+            os.write(self.write_fd, 'abcd')
+            self.managed_server.read_output()
+        T.assert_equal(self.lines, ['abcd'])
+
+
+class TestManagedServerWriteInput(T.TestCase):
+
+    @T.setup_teardown
+    def setup_server(self):
+        self.managed_server = ManagedServer(
+            'a', mock.Mock(server_dir='/nonexistent'), 'minecraft_server.jar',
+        )
+        self.managed_server.state = RUNNING
+        self.read_fd, write_fd = os.pipe()
+        server.supervisor._set_nonblocking(write_fd)
+        self.managed_server.process = mock.Mock()
+        self.managed_server.process.stdin.fileno.return_value = write_fd
+        try:
+            yield
+        finally:
+            if self.read_fd is not None:
+                os.close(self.read_fd)
+            os.close(write_fd)
+
+    def _read(self):
+        data = []
+        while True:
+            try:
+                data.append(os.read(self.read_fd, server.supervisor.READ_SIZE))
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+                return ''.join(data)
+
+    def test_input_the_pipe_does_not_take_is_pending(self):
+        server.supervisor._set_nonblocking(self.read_fd)
+        command = 'a' * 1024 * 1024
+        T.assert_equal(self.managed_server.send_command(command), True)
+        T.assert_equal(self.managed_server.has_pending_input, True)
+
+        data = self._read()
+        while self.managed_server.write_input():
+            data += self._read()
+        data += self._read()
+        T.assert_equal(data, command + '\n')
+        T.assert_equal(self.managed_server.has_pending_input, False)
+
+    def test_closed_input(self):
+        os.close(self.read_fd)
+        self.read_fd = None
+        T.assert_equal(self.managed_server.send_command('list'), False)
+        T.assert_equal(self.managed_server.has_pending_input, False)
+
+    def test_stopped_server(self):
+        self.managed_server.state = STOPPED
+        T.assert_equal(self.managed_server.send_command('list'), False)
+        T.assert_equal(self.managed_server.has_pending_input, False)
+
+class TestSupervisor(TempdirTestCase):
+
+    @T.setup_teardown
+    def setup_supervisor(self):
+        self.java = os.path.join(self.tempdir, 'java')
+        with open(self.java, 'w') as java_file:
+            java_file.write(FAKE_JAVA.format(executable=sys.executable))
+        os.chmod(self.java, stat.S_IRWXU)
+
+        self.supervisor = Supervisor()
+        try:
+            yield
+        finally:
+            for managed_server in self.supervisor.servers.itervalues():
+                if managed_server.state in (RUNNING, STOPPING):
+                    managed_server.process.kill()
+                    managed_server.process.wait()
+            self.supervisor.close()
+
+    def _add_server(self, name, crash=False, java=None, start=True):
+        server_dir = os.path.join(self.tempdir, name)
+        os.mkdir(server_dir)
+        if crash:
+            open(os.path.join(server_dir, 'crash'), 'w').close()
+
+        managed_server = ManagedServer(
+            name,
+            UserServer(server_dir),
+            'minecraft_server.jar',
+            JvmOptions(java=java or self.java),
+        )
+        lines = []
+        managed_server.output_listeners.append(
+            lambda _, line: lines.append(line),
+        )
+        self.supervisor.add_server(managed_server, start)
+        return managed_server, lines
+
+    def _run_until(self, condition):
+        deadline = time.time() + WAIT_TIMEOUT
+        while not condition():
+            T.assert_lt(time.time(), deadline)
+            self.supervisor.run_once(0.05)
+
+    def test_starts_and_stops_servers(self):
+        servers = [self._add_server(name) for name in ('a', 'b')]
+        self._run_until(lambda: all(
+            'Starting with' in ''.join(lines) for _, lines in servers
+        ))
+        for managed_server, lines in servers:
+            T.assert_equal(managed_server.state, RUNNING)
+            T.assert_equal(lines, [
+                'Starting with -Xms1G -Xmx1G -XX:+UseG1GC '
+                '-jar minecraft_server.jar nogui',
+            ])
+            with open(managed_server.pid_path) as pid_file:
+                T.assert_equal(int(pid_file.read()), managed_server.pid)
+
+        self.supervisor.shutdown()
+        self._run_until(lambda: self.supervisor.stopped)
+        for managed_server, lines in servers:
+            T.assert_equal(lines[-1], 'Stopping the server')
+            T.assert_equal(managed_server.returncode, 0)
+            T.assert_equal(os.path.exists(managed_server.pid_path), False)
+
+    def test_send_command(self):
+        managed_server, lines = self._add_server('a')
+        self.supervisor.send_command('a', 'list')
+        self._run_until(lambda: 'Unknown command: list' in lines)
+
+    def test_send_command_larger_than_the_pipe(self):
+        managed_server, lines = self._add_server('a')
+        self.supervisor.send_command('a', 'a' * 1024 * 1024)
+        self.supervisor.send_command('a', 'list')
+        self._run_until(lambda: 'Unknown command: list' in lines)
+        T.assert_equal(managed_server.has_pending_input, False)
+
+    def test_restarts_crashed_server_with_backoff(self):
+        managed_server, lines = self._add_server('a', crash=True)
+        with mock.patch.object(server.supervisor, 'INITIAL_BACKOFF', 0.01):
+            self._run_until(lambda: managed_server.crashes == 3)
+        T.assert_equal(managed_server.returncode, 1)
+        T.assert_equal(len(lines), 3)
+        T.assert_equal(managed_server.state, BACKOFF)
+
+        self.supervisor.stop('a')
+        self._run_until(lambda: managed_server.state == STOPPED)
+
+    def test_unknown_server(self):
+        for method, args in (
+            (self.supervisor.start, ()),
+            (self.supervisor.stop, ()),
+            (self.supervisor.send_command, ('list',)),
+        ):
+            with T.assert_raises(SupervisorError):
+                method('nope', *args)
+
+    def test_server_which_can_not_start_backs_off(self):
+        managed_server, _ = self._add_server(
+            'a', java=os.path.join(self.tempdir, 'nonexistent'),
+        )
+        with mock.patch.object(server.supervisor, 'INITIAL_BACKOFF', 0.01):
+            self._run_until(lambda: managed_server.crashes == 3)
+        T.assert_equal(managed_server.state, BACKOFF)
+        T.assert_equal(managed_server.process, None)
+        T.assert_equal(
+            managed_server.error.startswith('Could not start: '), True,
+        )
+
+        self.supervisor.stop('a')
+        self._run_until(lambda: managed_server.state == STOPPED)
+
+    def test_terminates_server_which_does_not_stop(self):
+        managed_server, lines = self._add_server('a')
+        self.supervisor.send_command('a', 'hang')
+        self._run_until(lambda: 'Hanging' in lines)
+        with contextlib.nested(
+            mock.patch.object(server.supervisor, 'STOP_TIMEOUT', 0),
+            mock.patch.object(server.supervisor, 'KILL_TIMEOUT', 0),
+        ):
+            self.supervisor.stop('a')
+            self._run_until(lambda: managed_server.state == STOPPED)
+        T.assert_equal(managed_server.returncode, -9)
+        T.assert_equal(managed_server.crashes, 0)
+
+    def test_run_command(self):
+        managed_server, lines = self._add_server('a')
+        thread = threading.Thread(target=self._run_until, args=(
+            lambda: 'Unknown command: list' in lines,
+        ))
+        thread.start()
+        try:
+            self.supervisor.run_command('a', 'list', 'Unknown command: list')
+        finally:
+            thread.join()
+        # The listener is removed by the event loop
+        self.supervisor.run_once(0)
+        T.assert_equal(len(managed_server.output_listeners), 1)
+
+    def test_run_command_times_out(self):
+        self._add_server('a')
+        self.supervisor.run_once(0)
+        with T.assert_raises(SupervisorError):
+            self.supervisor.run_command('a', 'list', 'Never printed', 0)
+
+    def test_run_command_on_stopped_server(self):
+        self._add_server('a', start=False)
+        done = threading.Event()
+        thread = threading.Thread(target=self._run_until, args=(done.is_set,))
+        thread.start()
+        try:
+            T.assert_raises_and_contains(
+                SupervisorError,
+                'a is not running.',
+                self.supervisor.run_command, 'a', 'list', 'Unknown command',
+            )
+        finally:
+            done.set()
+            thread.join()
+
+    def test_run_command_on_unknown_server(self):
+        with T.assert_raises(SupervisorError):
+            self.supervisor.run_command('nope', 'list', 'Unknown command')
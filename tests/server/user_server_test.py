@@ -0,0 +1,105 @@
+
+import mock
+import os
+import os.path
+import testify as T
+import time
+
+import server.user_server
+from server.user_server import load_server_properties
+from server.user_server import UserServer
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+from util.properties import FrozenProperties
+from util.properties import update_properties_file
+
+class TestLoadServerProperties(TempdirTestCase):
+
+    @T.setup_teardown
+    def clear_cache(self):
+        server.user_server.clear_server_properties_cache()
+        yield
+        server.user_server.clear_server_properties_cache()
+
+    @property
+    def path(self):
+        return os.path.join(self.tempdir, 'server.properties')
+
+    def _write(self, contents, age=60):
+        """Writes the file with an mtime age seconds in the past."""
+        with open(self.path, 'w') as properties_file:
+            properties_file.write(contents)
+        mtime = time.time() - age
+        os.utime(self.path, (mtime, mtime))
+
+    def test_loads_frozen_properties(self):
+        self._write('level-name=world\n')
+        server_properties = load_server_properties(self.path)
+        T.assert_equal(server_properties, {'level-name': 'world'})
+        T.assert_isinstance(server_properties, FrozenProperties)
+        with T.assert_raises(TypeError):
+            server_properties['level-name'] = 'other'
+
+    def test_unchanged_file_is_parsed_once(self):
+        self._write('level-name=world\n')
+        with mock.patch.object(
+            FrozenProperties, 'load', wraps=FrozenProperties.load,
+        ) as load_mock:
+            first = load_server_properties(self.path)
+            second = load_server_properties(self.path)
+        T.assert_is(first, second)
+        T.assert_equal(load_mock.call_count, 1)
+
+    def test_changed_file_is_parsed_again(self):
+        self._write('level-name=world\n')
+        load_server_properties(self.path)
+        update_properties_file(self.path, {'level-name': 'other world'})
+        T.assert_equal(
+            load_server_properties(self.path),
+            {'level-name': 'other world'},
+        )
+
+    def test_same_size_rewrite_is_parsed_again(self):
+        self._write('level-name=world\n')
+        load_server_properties(self.path)
+        self._write('level-name=wordl\n', age=59)
+        T.assert_equal(
+            load_server_properties(self.path), {'level-name': 'wordl'},
+        )
+
+    def test_recently_modified_file_is_parsed_again(self):
+        # A rewrite within the mtime granularity keeps the same stat
+        self._write('level-name=world\n', age=0)
+        stat = os.stat(self.path)
+        load_server_properties(self.path)
+        self._write('level-name=wordl\n', age=0)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime))
+        T.assert_equal(
+            load_server_properties(self.path), {'level-name': 'wordl'},
+        )
+
+    def test_removed_file_is_forgotten(self):
+        self._write('level-name=world\n')
+        load_server_properties(self.path)
+        os.remove(self.path)
+        T.assert_raises_and_contains(
+            IOError, 'No such file', load_server_properties, self.path,
+        )
+        T.assert_not_in(self.path, server.user_server._server_properties_cache)
+
+
+class TestUserServer(TempdirTestCase):
+
+    def test_server_properties(self):
+        user_server = UserServer(self.tempdir)
+        with mock.patch.object(
+            server.user_server, 'load_server_properties',
+        ) as load_mock:
+            T.assert_is(user_server.server_properties, load_mock.return_value)
+        load_mock.assert_called_once_with(
+            os.path.join(self.tempdir, 'server.properties'),
+        )
+
+    def test_console_is_shared(self):
+        T.assert_is(
+            UserServer(self.tempdir).console, UserServer(self.tempdir).console,
+        )
@@ -0,0 +1,47 @@
+
+import testify as T
+import urllib2
+
+from testing.utilities.fake_http_server import FakeHttpServer
+
+class TestFakeHttpServer(T.TestCase):
+
+    @T.setup_teardown
+    def serve(self):
+        self.server = FakeHttpServer({'/foo': 'foobarbaz'})
+        with self.server.serving():
+            yield
+
+    def test_serves_file(self):
+        response = urllib2.urlopen(self.server.url('/foo'))
+        T.assert_equal(response.read(), 'foobarbaz')
+        T.assert_equal(
+            response.info().getheader('ETag'),
+            FakeHttpServer.get_etag('foobarbaz'),
+        )
+
+    def test_missing_file(self):
+        with T.assert_raises(urllib2.HTTPError):
+            urllib2.urlopen(self.server.url('/bar'))
+
+    def test_range(self):
+        request = urllib2.Request(self.server.url('/foo'))
+        request.add_header('Range', 'bytes=3-')
+        response = urllib2.urlopen(request)
+        T.assert_equal(response.getcode(), 206)
+        T.assert_equal(response.read(), 'barbaz')
+
+    def test_range_with_stale_if_range(self):
+        request = urllib2.Request(self.server.url('/foo'))
+        request.add_header('Range', 'bytes=3-')
+        request.add_header('If-Range', '"stale"')
+        response = urllib2.urlopen(request)
+        T.assert_equal(response.getcode(), 200)
+        T.assert_equal(response.read(), 'foobarbaz')
+
+    def test_drop_after(self):
+        self.server.drop_after = [3]
+        T.assert_equal(urllib2.urlopen(self.server.url('/foo')).read(), 'foo')
+        T.assert_equal(
+            urllib2.urlopen(self.server.url('/foo')).read(), 'foobarbaz',
+        )
@@ -0,0 +1,50 @@
+import socket
+import testify as T
+
+from server.rcon import AUTH_FAILED_ID
+from server.rcon import AUTH_RESPONSE
+from server.rcon import COMMAND
+from server.rcon import encode_packet
+from server.rcon import LOGIN
+from server.rcon import read_packet
+from server.rcon import RESPONSE_VALUE
+from testing.utilities.fake_rcon_server import FakeRconServer
+
+class TestFakeRconServer(T.TestCase):
+
+    @T.setup_teardown
+    def serve(self):
+        self.server = FakeRconServer('pass', {'long': 'x' * 5000})
+        with self.server.serving():
+            self.sock = socket.create_connection(('127.0.0.1', self.server.port))
+            try:
+                yield
+            finally:
+                self.sock.close()
+
+    def _request(self, request_id, packet_type, payload):
+        self.sock.sendall(encode_packet(request_id, packet_type, payload))
+        return read_packet(self.sock)
+
+    def test_login(self):
+        T.assert_equal(self._request(5, LOGIN, 'pass'), (5, AUTH_RESPONSE, ''))
+
+    def test_wrong_login(self):
+        T.assert_equal(
+            self._request(5, LOGIN, 'nope'), (AUTH_FAILED_ID, AUTH_RESPONSE, ''),
+        )
+
+    def test_long_output_is_fragmented(self):
+        self._request(1, LOGIN, 'pass')
+        T.assert_equal(self._request(2, COMMAND, 'long'), (
+            2, RESPONSE_VALUE, 'x' * 4096,
+        ))
+        T.assert_equal(read_packet(self.sock), (2, RESPONSE_VALUE, 'x' * 904))
+        T.assert_equal(self.server.commands, ['long'])
+
+    def test_unknown_request(self):
+        self._request(1, LOGIN, 'pass')
+        T.assert_equal(
+            self._request(2, RESPONSE_VALUE, ''),
+            (2, RESPONSE_VALUE, 'Unknown request 0'),
+        )
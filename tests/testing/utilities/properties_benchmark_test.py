@@ -0,0 +1,105 @@
+import re
+import testify as T
+
+from testing.base_classes.regex import BooleanSearchReTestBase
+from testing.base_classes.regex import ReplaceReTestBase
+from testing.utilities import properties_benchmark
+from util.properties import InvalidPropertiesFileError
+
+class TestLineContinuationRe(BooleanSearchReTestBase):
+
+    regex = properties_benchmark.LINE_CONTINUATION_RE
+
+    backslash = '\\'
+
+    expected = (
+        ('', False),
+        (backslash, True),
+        ('foo', False),
+        ('foo' + backslash * 1, True),
+        ('foo' + backslash * 2, False),
+        ('foo' + backslash * 3, True),
+    )
+
+class TestUnescapeReSkeleton(ReplaceReTestBase):
+    regex = re.compile(
+        properties_benchmark.UNESCAPE_RE_SKELETON.format(':'),
+        re.VERBOSE,
+    )
+    replacement = r'\1~'
+
+    expected = (
+        (r'\:', '~'),
+        (r'aa\:', 'aa~'),
+        (r'\\\:', r'\\~'),
+        # Sadface, I can't get this one to replace correctly, I'll have to
+        # replace in a loop instead it appears
+        # (r'\:\:', '~~'),
+        # No replace here!
+        (r'\\\\:', r'\\\\:'),
+        (':', ':'),
+    )
+
+class TestUnescapeReWithSpaceWeirdness(ReplaceReTestBase):
+    regex = re.compile(
+        properties_benchmark.UNESCAPE_RE_SKELETON.format(' '),
+        re.VERBOSE,
+    )
+    replacement = r'\1 '
+
+    expected = (
+        (r'\=', '\='),
+        (r'\ ', ' '),
+    )
+
+class TestBlankLineStrippingHelper(T.TestCase):
+
+    def test_blank_line_stripping_helper(test):
+        lines = [
+            'foo',
+            '',
+            'bar',
+            '\t',
+            'baz',
+        ]
+        ret = list(properties_benchmark._blank_line_stripping_helper(lines))
+        T.assert_equal(ret, ['foo', 'bar', 'baz'])
+
+class TestCommentStrippingHelper(T.TestCase):
+
+    def test_comment_stripping_helper(self):
+        lines = [
+            'foo=bar',
+            '# I\'m a comment',
+            'herp=derp',
+        ]
+
+        ret = list(properties_benchmark._comment_stripping_helper(lines))
+        T.assert_equal(ret, [lines[0], lines[2]])
+
+class TestLineContinuationHelper(T.TestCase):
+
+    def test_no_continued_lines(self):
+        lines = ['foo', 'bar']
+        ret = list(properties_benchmark._line_continuation_helper(lines))
+        T.assert_equal(ret, lines)
+
+    def test_continued_line(self):
+        lines = ['foo\\', 'bar']
+        ret = list(properties_benchmark._line_continuation_helper(lines))
+        T.assert_equal(ret, ['foobar'])
+
+    def test_multiple_continued_lines(self):
+        lines = ['foo\\', 'bar\\', 'baz']
+        ret = list(properties_benchmark._line_continuation_helper(lines))
+        T.assert_equal(ret, ['foobarbaz'])
+
+    def test_strips_leading_whitespace_on_continued_lines(self):
+        lines = ['foo\\', '       bar']
+        ret = list(properties_benchmark._line_continuation_helper(lines))
+        T.assert_equal(ret, ['foobar'])
+
+    def test_nonterminated_line_errors(self):
+        lines = ['foo\\']
+        with T.assert_raises(InvalidPropertiesFileError):
+            list(properties_benchmark._line_continuation_helper(lines))
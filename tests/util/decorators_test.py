@@ -8,6 +8,7 @@ import werkzeug.exceptions
 
 from util.auto_namedtuple import auto_namedtuple
 from util.decorators import cached_property
+from util.decorators import memoize
 from util.decorators import require_internal
 
 class TestRequireInternal(T.TestCase):
@@ -78,5 +79,24 @@ class TestCachedProperty(T.TestCase):
         prop = self.Foo.foo
         T.assert_isinstance(prop, cached_property)
 
+
+class TestMemoize(T.TestCase):
+
+    def test_memoize(self):
+        calls = []
+
+        @memoize
+        def foo(bar):
+            calls.append(bar)
+            return object()
+
+        T.assert_is(foo(1), foo(1))
+        T.assert_is_not(foo(1), foo(2))
+        T.assert_equal(calls, [1, 2])
+
+        foo.clear_cache()
+        foo(1)
+        T.assert_equal(calls, [1, 2, 1])
+
 if __name__ == '__main__':
     T.run()
@@ -1,8 +1,18 @@
 
+import mock
+import os.path
 import testify as T
 
+import util.discovery
+from util.discovery import build_manifest
+from util.discovery import discover
 from util.discovery import get_module_name
 
+UTIL_DIRECTORY = os.path.dirname(util.discovery.__file__)
+
+def is_mock_returns(cls):
+    return cls.__name__ == 'MockReturns'
+
 class TestGetModuleName(T.TestCase):
     """Tests the get_module_name function."""
 
@@ -21,3 +31,46 @@ class TestGetModuleName(T.TestCase):
     def test_strips_prefixing_dot_slash(self):
         module_name = get_module_name('./foo', 'bar.py')
         T.assert_equal(module_name, 'foo.bar')
+
+
+class TestDiscover(T.TestCase):
+    """Tests discover using the testing/utilities package."""
+
+    directory = os.path.join(UTIL_DIRECTORY, '..', 'testing', 'utilities')
+
+    def test_build_manifest(self):
+        manifest = build_manifest(self.directory, is_mock_returns)
+        T.assert_equal(
+            manifest['testing.utilities.mock_returns']['classes'],
+            ['MockReturns'],
+        )
+        T.assert_equal(
+            manifest['testing.utilities.fake_file']['classes'], [],
+        )
+
+    def test_discover_without_manifest(self):
+        classes = discover(self.directory, is_mock_returns)
+        T.assert_equal(
+            [cls.__name__ for cls in classes], ['MockReturns'],
+        )
+
+    def test_manifest_skips_modules_without_matches(self):
+        manifest = build_manifest(self.directory, is_mock_returns)
+        with mock.patch.object(
+            util.discovery, '_import', wraps=util.discovery._import,
+        ) as import_mock:
+            classes = discover(self.directory, is_mock_returns, manifest)
+
+        T.assert_equal([cls.__name__ for cls in classes], ['MockReturns'])
+        T.assert_equal(
+            import_mock.call_args_list,
+            [mock.call('testing.utilities.mock_returns')],
+        )
+
+    def test_stale_manifest_entries_are_imported(self):
+        manifest = build_manifest(self.directory, is_mock_returns)
+        manifest['testing.utilities.mock_returns']['mtime'] = 0
+        manifest['testing.utilities.mock_returns']['classes'] = []
+
+        classes = discover(self.directory, is_mock_returns, manifest)
+        T.assert_equal([cls.__name__ for cls in classes], ['MockReturns'])
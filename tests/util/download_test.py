@@ -0,0 +1,222 @@
+
+import hashlib
+import mock
+import os
+import os.path
+import simplejson
+import testify as T
+import time
+import urllib2
+
+import util.download
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+from testing.utilities.fake_http_server import FakeHttpServer
+from util.download import ChecksumMismatchError
+from util.download import download
+from util.download import get_part_info_path
+from util.download import get_part_path
+from util.download import IncompleteDownloadError
+from util.download import RetryPolicy
+
+NO_RETRY = RetryPolicy(1, 0, 1, 0)
+
+class TestRetryPolicy(T.TestCase):
+
+    def test_get_delay(self):
+        policy = RetryPolicy(5, 1, 2, 5)
+        T.assert_equal(
+            [policy.get_delay(failures) for failures in xrange(1, 5)],
+            [1, 2, 4, 5],
+        )
+
+
+class TestDownload(TempdirTestCase):
+
+    contents = ''.join(chr(i % 256) for i in xrange(100000))
+
+    @T.setup_teardown
+    def serve_file(self):
+        self.server = FakeHttpServer({'/foo.jar': self.contents})
+        with self.server.serving():
+            yield
+
+    @property
+    def path(self):
+        return os.path.join(self.tempdir, 'foo.jar')
+
+    def assert_downloaded(self, contents=None):
+        with open(self.path, 'rb') as downloaded_file:
+            T.assert_equal(downloaded_file.read(), contents or self.contents)
+        T.assert_equal(os.listdir(self.tempdir), ['foo.jar'])
+
+    def test_download(self):
+        download(self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY)
+        self.assert_downloaded()
+        T.assert_not_in('range', self.server.requests[0])
+
+    def test_failed_attempt_keeps_part_file_and_info(self):
+        self.server.drop_after = [1000]
+        with T.assert_raises(IncompleteDownloadError):
+            download(
+                self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY,
+            )
+
+        T.assert_equal(os.path.exists(self.path), False)
+        T.assert_equal(os.path.getsize(get_part_path(self.path)), 1000)
+        with open(get_part_info_path(self.path), 'r') as part_info_file:
+            part_info = simplejson.load(part_info_file)
+        T.assert_equal(part_info['size'], len(self.contents))
+        T.assert_equal(part_info['etag'], FakeHttpServer.get_etag(self.contents))
+
+    def test_later_call_resumes_with_range(self):
+        self.server.drop_after = [1000]
+        with T.assert_raises(IncompleteDownloadError):
+            download(
+                self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY,
+            )
+
+        download(self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY)
+        self.assert_downloaded()
+        T.assert_equal(self.server.requests[1]['range'], 'bytes=1000-')
+        T.assert_equal(
+            self.server.requests[1]['if-range'],
+            FakeHttpServer.get_etag(self.contents),
+        )
+
+    def test_retries_resume_within_one_call(self):
+        self.server.drop_after = [1000, 5000]
+        with mock.patch.object(time, 'sleep', autospec=True) as sleep_mock:
+            download(
+                self.server.url('/foo.jar'),
+                self.path,
+                retry_policy=RetryPolicy(3, 1, 2, 10),
+            )
+
+        self.assert_downloaded()
+        T.assert_equal(
+            [request.get('range') for request in self.server.requests],
+            [None, 'bytes=1000-', 'bytes=6000-'],
+        )
+        T.assert_equal(sleep_mock.call_args_list, [mock.call(1), mock.call(2)])
+
+    def test_changed_resource_restarts_download(self):
+        self.server.drop_after = [1000]
+        with T.assert_raises(IncompleteDownloadError):
+            download(
+                self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY,
+            )
+
+        self.server.files['/foo.jar'] = 'new contents'
+        download(self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY)
+        self.assert_downloaded('new contents')
+
+    def test_part_for_other_url_is_discarded(self):
+        with open(get_part_path(self.path), 'wb') as part_file:
+            part_file.write('garbage')
+        with open(get_part_info_path(self.path), 'w') as part_info_file:
+            simplejson.dump({'url': 'http://example.com/'}, part_info_file)
+
+        download(self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY)
+        self.assert_downloaded()
+        T.assert_not_in('range', self.server.requests[0])
+
+    def test_part_larger_than_the_file_is_discarded(self):
+        with open(get_part_path(self.path), 'wb') as part_file:
+            part_file.write(self.contents + 'garbage')
+        with open(get_part_info_path(self.path), 'w') as part_info_file:
+            simplejson.dump(
+                {
+                    'url': self.server.url('/foo.jar'),
+                    'etag': FakeHttpServer.get_etag(self.contents),
+                    'last_modified': None,
+                    'size': len(self.contents),
+                },
+                part_info_file,
+            )
+
+        download(self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY)
+        self.assert_downloaded()
+        T.assert_not_in('range', self.server.requests[0])
+
+    def test_download_larger_than_expected_is_discarded(self):
+        with mock.patch.object(
+            util.download, '_get_total_size', return_value=10,
+        ):
+            with T.assert_raises(IncompleteDownloadError):
+                download(
+                    self.server.url('/foo.jar'),
+                    self.path,
+                    retry_policy=NO_RETRY,
+                )
+        T.assert_equal(os.listdir(self.tempdir), [])
+
+    def test_client_errors_are_not_retried(self):
+        with T.assert_raises(urllib2.HTTPError):
+            download(
+                self.server.url('/bar.jar'),
+                self.path,
+                retry_policy=RetryPolicy(3, 0, 1, 0),
+            )
+        T.assert_equal(len(self.server.requests), 1)
+
+    def test_returns_hashes(self):
+        hashes = download(
+            self.server.url('/foo.jar'),
+            self.path,
+            retry_policy=NO_RETRY,
+            hash_algorithms=['sha256'],
+            expected_hashes={'sha1': hashlib.sha1(self.contents).hexdigest()},
+        )
+        self.assert_downloaded()
+        T.assert_equal(
+            hashes,
+            {
+                'sha1': hashlib.sha1(self.contents).hexdigest(),
+                'sha256': hashlib.sha256(self.contents).hexdigest(),
+            },
+        )
+
+    def test_resumed_download_hashes_whole_file(self):
+        self.server.drop_after = [1000]
+        with T.assert_raises(IncompleteDownloadError):
+            download(
+                self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY,
+            )
+
+        hashes = download(
+            self.server.url('/foo.jar'),
+            self.path,
+            retry_policy=NO_RETRY,
+            hash_algorithms=['sha1'],
+        )
+        T.assert_equal(hashes['sha1'], hashlib.sha1(self.contents).hexdigest())
+
+    def test_checksum_mismatch_discards_download(self):
+        with T.assert_raises(ChecksumMismatchError):
+            download(
+                self.server.url('/foo.jar'),
+                self.path,
+                retry_policy=NO_RETRY,
+                expected_hashes={'sha1': '0' * 40},
+            )
+        T.assert_equal(os.listdir(self.tempdir), [])
+
+    def test_progress_callback_includes_resumed_bytes(self):
+        self.server.drop_after = [1000]
+        with T.assert_raises(IncompleteDownloadError):
+            download(
+                self.server.url('/foo.jar'), self.path, retry_policy=NO_RETRY,
+            )
+
+        progress = []
+        download(
+            self.server.url('/foo.jar'),
+            self.path,
+            retry_policy=NO_RETRY,
+            chunk_size=50000,
+            progress_callback=lambda *args: progress.append(args),
+        )
+        total = len(self.contents)
+        T.assert_equal(
+            progress, [(1000, total), (51000, total), (total, total)],
+        )
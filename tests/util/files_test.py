@@ -0,0 +1,134 @@
+
+import cStringIO
+import hashlib
+import mock
+import os
+import os.path
+import stat
+import testify as T
+
+import util.files
+from testing.base_classes.tempdir_test_case import TempdirTestCase
+from util.files import atomic_open
+from util.files import copy_in_chunks
+from util.files import get_file_hashes
+from util.files import hash_file
+from util.files import HashingWriter
+
+class TestAtomicOpen(TempdirTestCase):
+
+    def test_writes_file(self):
+        path = os.path.join(self.tempdir, 'foo')
+        with atomic_open(path) as file_obj:
+            file_obj.write('bar')
+
+        with open(path, 'rb') as file_obj:
+            T.assert_equal(file_obj.read(), 'bar')
+        T.assert_equal(os.listdir(self.tempdir), ['foo'])
+
+    def test_replaces_existing_file(self):
+        path = os.path.join(self.tempdir, 'foo')
+        with open(path, 'w') as file_obj:
+            file_obj.write('old')
+
+        with atomic_open(path, 'w') as file_obj:
+            file_obj.write('new')
+
+        with open(path, 'r') as file_obj:
+            T.assert_equal(file_obj.read(), 'new')
+
+    def test_leaves_original_on_failure(self):
+        path = os.path.join(self.tempdir, 'foo')
+        with open(path, 'w') as file_obj:
+            file_obj.write('old')
+
+        with T.assert_raises(ValueError):
+            with atomic_open(path) as file_obj:
+                file_obj.write('partial')
+                raise ValueError
+
+        with open(path, 'r') as file_obj:
+            T.assert_equal(file_obj.read(), 'old')
+        T.assert_equal(os.listdir(self.tempdir), ['foo'])
+
+    def test_keeps_mode_of_replaced_file(self):
+        path = os.path.join(self.tempdir, 'foo')
+        open(path, 'w').close()
+        os.chmod(path, 0754)
+
+        with atomic_open(path) as file_obj:
+            file_obj.write('new')
+
+        T.assert_equal(stat.S_IMODE(os.stat(path).st_mode), 0754)
+
+    def test_new_file_mode_follows_umask(self):
+        path = os.path.join(self.tempdir, 'foo')
+        with mock.patch.object(util.files, '_umask', 0027):
+            with atomic_open(path) as file_obj:
+                file_obj.write('new')
+
+        T.assert_equal(stat.S_IMODE(os.stat(path).st_mode), 0640)
+
+
+class TestCopyInChunks(T.TestCase):
+
+    def test_copy_in_chunks(self):
+        source = cStringIO.StringIO('a' * 10)
+        destination = cStringIO.StringIO()
+        T.assert_equal(copy_in_chunks(source, destination, chunk_size=3), 10)
+        T.assert_equal(destination.getvalue(), 'a' * 10)
+
+    def test_copy_in_chunks_reads_chunk_size(self):
+        source = mock.Mock()
+        source.read.side_effect = ['abc', 'de', '']
+        destination = cStringIO.StringIO()
+        copy_in_chunks(source, destination, chunk_size=3)
+        T.assert_equal(
+            source.read.call_args_list,
+            [mock.call(3), mock.call(3), mock.call(3)],
+        )
+        T.assert_equal(destination.getvalue(), 'abcde')
+
+
+class TestHashFile(TempdirTestCase):
+
+    def test_hash_file(self):
+        path = os.path.join(self.tempdir, 'foo')
+        with open(path, 'wb') as file_obj:
+            file_obj.write('foo' * 1000)
+
+        T.assert_equal(
+            hash_file(path, chunk_size=7),
+            hashlib.sha256('foo' * 1000).hexdigest(),
+        )
+        T.assert_equal(
+            hash_file(path, algorithm='sha1'),
+            hashlib.sha1('foo' * 1000).hexdigest(),
+        )
+
+    def test_get_file_hashes(self):
+        path = os.path.join(self.tempdir, 'foo')
+        with open(path, 'wb') as file_obj:
+            file_obj.write('foo' * 1000)
+
+        T.assert_equal(
+            get_file_hashes(path, ['sha1', 'md5'], chunk_size=7),
+            {
+                'sha1': hashlib.sha1('foo' * 1000).hexdigest(),
+                'md5': hashlib.md5('foo' * 1000).hexdigest(),
+            },
+        )
+
+
+class TestHashingWriter(T.TestCase):
+
+    def test_hashes_written_data(self):
+        destination = cStringIO.StringIO()
+        writer = HashingWriter(destination, ['sha1'])
+        writer.update('foo')
+        writer.write('bar')
+
+        T.assert_equal(destination.getvalue(), 'bar')
+        T.assert_equal(
+            writer.hexdigests, {'sha1': hashlib.sha1('foobar').hexdigest()},
+        )
@@ -0,0 +1,117 @@
+
+import testify as T
+import threading
+
+from util.jobs import FAILED
+from util.jobs import FINISHED
+from util.jobs import Job
+from util.jobs import JobQueue
+from util.jobs import PROGRESS
+from util.jobs import QUEUED
+from util.jobs import SUCCEEDED
+
+class TestJob(T.TestCase):
+
+    def test_run_records_result(self):
+        job = Job('key', 'description')
+        T.assert_equal(job.state, QUEUED)
+        job.run(lambda job: 'result')
+
+        T.assert_equal(job.state, SUCCEEDED)
+        T.assert_equal(job.result, 'result')
+        T.assert_equal(job.wait(0), True)
+
+    def test_run_records_error(self):
+        def fail(job):
+            raise ValueError('womp')
+
+        job = Job('key', 'description')
+        job.run(fail)
+        T.assert_equal(job.state, FAILED)
+        T.assert_equal(job.error, 'ValueError: womp')
+
+    def test_report_progress(self):
+        job = Job('key', 'description')
+        job.report_progress({'bytes_transferred': 100})
+        T.assert_equal(
+            job.to_dict()['progress'], {'bytes_transferred': 100},
+        )
+
+    def test_iter_events(self):
+        job = Job('key', 'description')
+        job.report_progress({'bytes_transferred': 1})
+        events = job.iter_events()
+        T.assert_equal(next(events), (PROGRESS, {'bytes_transferred': 1}))
+
+        def work(job):
+            job.report_progress({'bytes_transferred': 2})
+            return 'result'
+
+        thread = threading.Thread(target=job.run, args=(work,))
+        thread.start()
+        T.assert_equal(next(events), (PROGRESS, {'bytes_transferred': 2}))
+        event_type, job_dict = next(events)
+        thread.join()
+
+        T.assert_equal(event_type, FINISHED)
+        T.assert_equal(job_dict['result'], 'result')
+        T.assert_equal(list(events), [])
+
+    def test_iter_events_of_finished_job(self):
+        job = Job('key', 'description')
+        job.run(lambda job: None)
+        T.assert_equal(
+            [event_type for event_type, _ in job.iter_events()], [FINISHED],
+        )
+
+    def test_iter_events_keepalive(self):
+        job = Job('key', 'description')
+        events = job.iter_events(keepalive_interval=0.01)
+        T.assert_equal(next(events), None)
+
+
+class TestJobQueue(T.TestCase):
+
+    @T.setup_teardown
+    def create_queue(self):
+        self.queue = JobQueue(max_workers=2, max_finished_jobs=1)
+        try:
+            yield
+        finally:
+            self.queue.close()
+
+    def test_submit(self):
+        job = self.queue.submit('key', 'description', lambda job: 'result')
+        T.assert_equal(job.wait(5), True)
+        T.assert_is(self.queue.get(job.id), job)
+        T.assert_equal(job.result, 'result')
+
+    def test_unfinished_jobs_are_coalesced(self):
+        release = threading.Event()
+        first = self.queue.submit('key', 'first', lambda job: release.wait(5))
+        second = self.queue.submit('key', 'second', lambda job: None)
+        other = self.queue.submit('other', 'other', lambda job: None)
+        release.set()
+
+        T.assert_is(first, second)
+        T.assert_is_not(first, other)
+        T.assert_equal(first.wait(5), True)
+
+    def test_finished_jobs_are_not_coalesced(self):
+        first = self.queue.submit('key', 'first', lambda job: None)
+        first.wait(5)
+        second = self.queue.submit('key', 'second', lambda job: None)
+        T.assert_is_not(first, second)
+
+    def test_old_finished_jobs_are_forgotten(self):
+        first = self.queue.submit('first', 'first', lambda job: None)
+        first.wait(5)
+        second = self.queue.submit('second', 'second', lambda job: None)
+        second.wait(5)
+        self.queue.close()
+
+        T.assert_equal(self.queue.get(first.id), None)
+        T.assert_is(self.queue.get(second.id), second)
+
+    def test_unknown_job(self):
+        T.assert_equal(self.queue.get('nope'), None)
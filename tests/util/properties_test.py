@@ -1,14 +1,15 @@
 # -*- coding: utf-8 -*-
 
+import mock
 import os.path
-import re
 import testify as T
 
 import config.application
 import util.properties
 from util.properties import InvalidPropertiesFileError
+from testing.utilities.properties_benchmark import generate_properties
+from testing.utilities.properties_benchmark import legacy_loads
 from testing.base_classes.regex import BooleanSearchReTestBase
-from testing.base_classes.regex import ReplaceReTestBase
 from testing.base_classes.tempdir_test_case import TempdirTestCase
 
 class TestCommentRe(BooleanSearchReTestBase):
@@ -24,9 +25,7 @@ class TestCommentRe(BooleanSearchReTestBase):
         ('foo=bar!this is not a comment', False),
     )
 
-class TestLineContinuationRe(BooleanSearchReTestBase):
-
-    regex = util.properties.LINE_CONTINUATION_RE
+class TestIsContinued(T.TestCase):
 
     backslash = '\\'
 
@@ -39,38 +38,11 @@ class TestLineContinuationRe(BooleanSearchReTestBase):
         ('foo' + backslash * 3, True),
     )
 
-class TestUnescapeReSkeleton(ReplaceReTestBase):
-    regex = re.compile(
-        util.properties.UNESCAPE_RE_SKELETON.format(':'),
-        re.VERBOSE,
-    )
-    replacement = r'\1~'
-
-    expected = (
-        (r'\:', '~'),
-        (r'aa\:', 'aa~'),
-        (r'\\\:', r'\\~'),
-        # Sadface, I can't get this one to replace correctly, I'll have to
-        # replace in a loop instead it appears
-        # (r'\:\:', '~~'),
-        # No replace here!
-        (r'\\\\:', r'\\\\:'),
-        (':', ':'),
-    )
-
-class TestUnescapeReWithSpaceWeirdness(ReplaceReTestBase):
-    regex = re.compile(
-        util.properties.UNESCAPE_RE_SKELETON.format(' '),
-        re.VERBOSE,
-    )
-    replacement = r'\1 '
-
-    expected = (
-        (r'\=', '\='),
-        (r'\ ', ' '),
-    )
+    def test_expected(self):
+        for line, expected in self.expected:
+            T.assert_equal(util.properties._is_continued(line), expected)
 
-class TestKeySplitter(T.TestCase):
+class TestSplitLine(T.TestCase):
 
     # Tuple of tuples of (input, output_key, output_value)
     expected = (
@@ -95,11 +67,11 @@ class TestKeySplitter(T.TestCase):
         # This next one also comes from java.util.Properties but I'll simplify
         # it to how we would expect to process it
         (
-            list(util.properties._line_continuation_helper([
+            util.properties._join_continued_lines('\n'.join([
                 'fruits                    apple, banana, pear, \\',
                 '                          cantaloupe, watermelon, \\',
                 '                          kiwi, mango',
-            ]))[0],
+            ])),
             'fruits', 'apple, banana, pear, cantaloupe, watermelon, kiwi, mango'
         ),
 
@@ -109,10 +81,10 @@ class TestKeySplitter(T.TestCase):
 
     def test_expected(self):
         for input, expected_key, expected_value in self.expected:
-            key, value = util.properties.KeySplitter(input).split()
+            key, value = util.properties._split_line(input)
             if key != expected_key or value != expected_value:
                 raise AssertionError(
-                    'KeySplitter did not yield the expected key/value\n'
+                    '_split_line did not yield the expected key/value\n'
                     'Input: {0}\n'
                     'Key (Expected): {1}\n'
                     'Key (Actually): {2}\n'
@@ -122,18 +94,29 @@ class TestKeySplitter(T.TestCase):
                     )
                 )
 
-class TestDecodeChars(T.TestCase):
+class TestUnescape(T.TestCase):
 
-    def test_decode_chars_single_char(self):
+    def test_unescape_single_char(self):
         input = 'foo\=bar\=baz'
-        ret = util.properties._decode_chars(input, ('=',))
+        ret = util.properties._unescape(
+            input, util.properties._get_unescapes(('=',)),
+        )
         T.assert_equal(ret, 'foo=bar=baz')
 
-    def test_decode_chars_multiple_chars(self):
+    def test_unescape_multiple_chars(self):
         input = r'foo\=\:bar\=\:baz'
-        ret = util.properties._decode_chars(input, ('=', ':'))
+        ret = util.properties._unescape(
+            input, util.properties._get_unescapes(('=', ':')),
+        )
         T.assert_equal(ret, 'foo=:bar=:baz')
 
+    def test_other_escapes_are_left_alone(self):
+        input = r'\\\=\n'
+        ret = util.properties._unescape(
+            input, util.properties._get_unescapes(('=',)),
+        )
+        T.assert_equal(ret, r'\\=\n')
+
 class TestEncodeChars(T.TestCase):
 
     def test_encode_chars_single_char(self):
@@ -160,7 +143,9 @@ class TestEncodeDecodeRoundTrip(T.TestCase):
     def test_encode_decode_round_trip(self):
         for s in self.strs:
             encoded = util.properties._encode_chars(s, self.chars)
-            decoded = util.properties._decode_chars(encoded, self.chars)
+            decoded = util.properties._unescape(
+                encoded, util.properties._get_unescapes(self.chars),
+            )
             T.assert_equal(decoded, s)
 
 class TestEncodeUnicodeEscapes(T.TestCase):
@@ -214,57 +199,44 @@ class TestEncodeKeyValue(T.TestCase):
         T.assert_equal(value, 'foo bar')
 
 
-class TestBlankLineStrippingHelper(T.TestCase):
-
-    def test_blank_line_stripping_helper(test):
-        lines = [
-            'foo',
-            '',
-            'bar',
-            '\t',
-            'baz',
-        ]
-        ret = list(util.properties._blank_line_stripping_helper(lines))
-        T.assert_equal(ret, ['foo', 'bar', 'baz'])
-
-class TestCommentStrippingHelper(T.TestCase):
+class TestPropertiesLoads(T.TestCase):
 
-    def test_comment_stripping_helper(self):
-        lines = [
-            'foo=bar',
-            '# I\'m a comment',
-            'herp=derp',
-        ]
+    def test_matches_legacy_implementation(self):
+        text = generate_properties(200)
+        T.assert_equal(
+            util.properties.Properties.loads(text), legacy_loads(text),
+        )
 
-        ret = list(util.properties._comment_stripping_helper(lines))
-        T.assert_equal(ret, [lines[0], lines[2]])
+    def test_even_backslashes_do_not_continue(self):
+        ret = util.properties.Properties.loads('foo=bar\\\\\n  baz=womp')
+        T.assert_equal(ret, {'foo': 'bar\\', 'baz': 'womp'})
 
-class TestLineContinuationHelper(T.TestCase):
+    def test_continued_lines(self):
+        ret = util.properties.Properties.loads(
+            '# comment\nfoo=bar\\\n   baz\\\n\tqux\n\na b\n',
+        )
+        T.assert_equal(ret, {'foo': 'barbazqux', 'a': 'b'})
 
-    def test_no_continued_lines(self):
-        lines = ['foo', 'bar']
-        ret = list(util.properties._line_continuation_helper(lines))
-        T.assert_equal(ret, lines)
+    def test_escaped_newline_in_value(self):
+        ret = util.properties.Properties.loads('foo=bar\\nbaz\nk\\ e\\=y=v')
+        T.assert_equal(ret, {'foo': 'bar\nbaz', 'k e=y': 'v'})
 
-    def test_continued_line(self):
-        lines = ['foo\\', 'bar']
-        ret = list(util.properties._line_continuation_helper(lines))
-        T.assert_equal(ret, ['foobar'])
+    def test_unicode(self):
+        ret = util.properties.Properties.loads(u'foo=\\u00e9')
+        T.assert_equal(ret, {u'foo': u'\u00e9'})
 
-    def test_multiple_continued_lines(self):
-        lines = ['foo\\', 'bar\\', 'baz']
-        ret = list(util.properties._line_continuation_helper(lines))
-        T.assert_equal(ret, ['foobarbaz'])
+    def test_separator_in_value(self):
+        # Can't be decoded joined together
+        ret = util.properties.Properties.loads('foo=b\x00r\nbaz=\\:')
+        T.assert_equal(ret, {'foo': 'b\x00r', 'baz': ':'})
 
-    def test_strips_leading_whitespace_on_continued_lines(self):
-        lines = ['foo\\', '       bar']
-        ret = list(util.properties._line_continuation_helper(lines))
-        T.assert_equal(ret, ['foobar'])
+    def test_empty(self):
+        T.assert_equal(util.properties.Properties.loads('# comment\n'), {})
 
-    def test_nonterminated_line_errors(self):
-        lines = ['foo\\']
+    def test_unterminated_continued_line_errors(self):
         with T.assert_raises(InvalidPropertiesFileError):
-            list(util.properties._line_continuation_helper(lines))
+            util.properties.Properties.loads('foo=bar\nbaz=womp\\')
+
 
 @T.suite('integration')
 class TestPropertiesLoadIntegration(T.TestCase):
@@ -322,3 +294,190 @@ class TestPropertiesDumpIntegration(TempdirTestCase):
         data_str = self.data.dumps()
         props = util.properties.Properties.loads(data_str)
         T.assert_equal(props, self.data)
+
+
+class TestEncodeKeyValueMatchesEncodeChars(T.TestCase):
+
+    def test_single_pass_encoding(self):
+        for s in ('a\\b=c:d#e!f g\th', '\\\\=', u'\xe9\\\x00', ''):
+            T.assert_equal(
+                util.properties._encode_key_value(s, s),
+                (
+                    util.properties._encode_unicode_escapes(
+                        util.properties._encode_chars(
+                            util.properties._encode_chars(s, ('\\',)),
+                            util.properties.KEY_ESCAPED_CHARACTERS,
+                        ),
+                    ),
+                    util.properties._encode_unicode_escapes(
+                        util.properties._encode_chars(
+                            util.properties._encode_chars(s, ('\\',)),
+                            util.properties.VALUE_ESCAPED_CHARACTERS,
+                        ),
+                    ),
+                ),
+            )
+
+
+class TestPropertiesDocument(T.TestCase):
+
+    text = (
+        '#Minecraft server properties\r\n'
+        '\r\n'
+        'level-name = world\r\n'
+        '  motd: A \\\r\n'
+        '     Minecraft Server\r\n'
+        'server-port=25565\r\n'
+        '! shadowed below\r\n'
+        'pvp=true\r\n'
+        'pvp=false\r\n'
+    )
+
+    def _load(self):
+        return util.properties.PropertiesDocument.loads(self.text)
+
+    def test_round_trip_is_exact(self):
+        document = self._load()
+        T.assert_equal(document.dumps(), self.text)
+        T.assert_equal(document.changed, False)
+
+    def test_values(self):
+        document = self._load()
+        T.assert_equal(document.to_properties(), {
+            'level-name': 'world',
+            'motd': 'A Minecraft Server',
+            'server-port': '25565',
+            'pvp': 'false',
+        })
+        T.assert_equal(
+            document.to_properties(),
+            util.properties.Properties.loads(self.text),
+        )
+        T.assert_equal(document['pvp'], 'false')
+        T.assert_equal(document.get('missing', 'default'), 'default')
+        T.assert_in('motd', document)
+        T.assert_equal(
+            document.keys(), ['level-name', 'motd', 'server-port', 'pvp'],
+        )
+
+    def test_set_only_changes_the_line_of_the_key(self):
+        document = self._load()
+        document['level-name'] = 'other world'
+        T.assert_equal(document.changed, True)
+        T.assert_equal(
+            document.dumps(),
+            self.text.replace('= world', '= other world'),
+        )
+
+    def test_set_same_value_is_not_a_change(self):
+        document = self._load()
+        document['server-port'] = u'25565'
+        T.assert_equal(document.changed, False)
+
+    def test_set_continued_line(self):
+        document = self._load()
+        document['motd'] = 'Hi: #1'
+        T.assert_equal(
+            document.dumps(),
+            self.text.replace(
+                'A \\\r\n     Minecraft Server\r\n', 'Hi\\: \\#1\r\n',
+            ),
+        )
+        T.assert_equal(
+            util.properties.Properties.loads(document.dumps())['motd'],
+            'Hi: #1',
+        )
+
+    def test_set_shadowed_key_sets_the_last_one(self):
+        document = self._load()
+        document['pvp'] = 'true'
+        T.assert_equal(
+            document.dumps(), self.text.replace('pvp=false', 'pvp=true'),
+        )
+
+    def test_set_new_key_appends(self):
+        document = util.properties.PropertiesDocument.loads('foo=bar')
+        document[u'k\xe9y'] = 'v a\\l'
+        T.assert_equal(document.dumps(), 'foo=bar\nk\\u00e9y=v a\\\\l\n')
+
+    def test_set_key_without_separator(self):
+        document = util.properties.PropertiesDocument.loads(
+            'white-list\nfoo \n',
+        )
+        document['white-list'] = 'true'
+        document['foo'] = 'bar'
+        T.assert_equal(document.dumps(), 'white-list=true\nfoo bar\n')
+
+    def test_set_unicode_value_on_latin_1_line(self):
+        document = util.properties.PropertiesDocument.loads('caf\xe9=x\n')
+        document[document.keys()[0]] = u'\xe9'
+        T.assert_equal(document.dumps(), 'caf\xe9=\\u00e9\n')
+
+    def test_set_non_string_errors(self):
+        with T.assert_raises(ValueError):
+            self._load()['server-port'] = 25565
+
+    def test_delete_removes_all_lines_of_the_key(self):
+        document = self._load()
+        del document['pvp']
+        del document['motd']
+        T.assert_equal(document.dumps(), (
+            '#Minecraft server properties\r\n'
+            '\r\n'
+            'level-name = world\r\n'
+            'server-port=25565\r\n'
+            '! shadowed below\r\n'
+        ))
+        T.assert_not_in('pvp', document)
+
+    def test_separator_in_value(self):
+        # Can't be decoded joined together
+        ret = util.properties.Properties.loads('foo=b\x00r\nbaz=\\:')
+        T.assert_equal(ret, {'foo': 'b\x00r', 'baz': ':'})
+
+    def test_empty(self):
+        T.assert_equal(util.properties.Properties.loads('# comment\n'), {})
+
+    def test_unterminated_continued_line_errors(self):
+        with T.assert_raises(InvalidPropertiesFileError):
+            util.properties.PropertiesDocument.loads('foo=bar\\\n')
+
+
+class TestUpdatePropertiesFile(TempdirTestCase):
+
+    def _get_file_path(self):
+        return os.path.join(self.tempdir, 'server.properties')
+
+    def _write(self, contents):
+        with open(self._get_file_path(), 'wb') as properties_file:
+            properties_file.write(contents)
+
+    def _read(self):
+        with open(self._get_file_path(), 'rb') as properties_file:
+            return properties_file.read()
+
+    def test_updates_changed_values(self):
+        self._write('#comment\r\nfoo=bar\r\nbaz=womp\r\n')
+        T.assert_equal(
+            util.properties.update_properties_file(
+                self._get_file_path(), {'baz': 'qux', 'new': 'value'},
+            ),
+            True,
+        )
+        T.assert_equal(
+            self._read(), '#comment\r\nfoo=bar\r\nbaz=qux\r\nnew=value\r\n',
+        )
+
+    def test_unchanged_file_is_not_written(self):
+        self._write('foo=bar\n')
+        with mock.patch.object(
+            util.properties, 'atomic_open',
+        ) as atomic_open_mock:
+            T.assert_equal(
+                util.properties.update_properties_file(
+                    self._get_file_path(), {'foo': 'bar'},
+                ),
+                False,
+            )
+        T.assert_equal(atomic_open_mock.called, False)
+        T.assert_equal(self._read(), 'foo=bar\n')
@@ -0,0 +1,108 @@
+import flask
+import mock
+import os
+import os.path
+import testify as T
+
+import server.console_log
+from server.user_server import get_server_dir
+from testing.assertions.response import assert_no_response_errors
+from testing.base_classes.pymsm_server_test_case import PymsmServerTestCase
+
+class TestConsole(PymsmServerTestCase):
+
+    server_name = 'survival'
+
+    @T.setup_teardown
+    def set_up_server(self):
+        logs_dir = os.path.join(get_server_dir(self.server_name), 'logs')
+        os.makedirs(logs_dir)
+        with open(os.path.join(logs_dir, 'latest.log'), 'w') as log_file:
+            log_file.write(''.join('line {0}\n'.format(i) for i in xrange(5)))
+        server.console_log.clear_server_consoles()
+        try:
+            with self.client.patch_ip('127.0.0.1'):
+                yield
+        finally:
+            server.console_log.clear_server_consoles()
+
+    def test_console_page(self):
+        resp = self.client.get(flask.url_for(
+            'console.console_page', server_name=self.server_name, limit=2,
+        ))
+        assert_no_response_errors(resp)
+        T.assert_equal(resp.json, {
+            'lines': [
+                {'cursor': 3, 'line': 'line 3'},
+                {'cursor': 4, 'line': 'line 4'},
+            ],
+            'next_cursor': 5,
+            'truncated': False,
+        })
+
+    def test_console_page_from_cursor(self):
+        resp = self.client.get(flask.url_for(
+            'console.console_page',
+            server_name=self.server_name,
+            cursor=1,
+            limit=1,
+        ))
+        T.assert_equal(resp.json['lines'], [{'cursor': 1, 'line': 'line 1'}])
+        T.assert_equal(resp.json['next_cursor'], 2)
+
+    def test_invalid_cursor(self):
+        resp = self.client.get(flask.url_for(
+            'console.console_page', server_name=self.server_name, cursor='x',
+        ))
+        T.assert_equal(resp.response.status_code, 400)
+
+    def test_invalid_limit(self):
+        for limit in ('x', 0, -1):
+            resp = self.client.get(flask.url_for(
+                'console.console_page',
+                server_name=self.server_name,
+                limit=limit,
+            ))
+            T.assert_equal(resp.response.status_code, 400)
+
+    def test_cursor_after_the_end(self):
+        resp = self.client.get(flask.url_for(
+            'console.console_page', server_name=self.server_name, cursor=100,
+        ))
+        T.assert_equal(resp.json['lines'], [])
+        T.assert_equal(resp.json['next_cursor'], 5)
+
+    def test_unknown_server(self):
+        for server_name in ('nope', '..'):
+            resp = self.client.get(flask.url_for(
+                'console.console_page', server_name=server_name,
+            ))
+            T.assert_equal(resp.response.status_code, 404)
+
+    def test_not_internal(self):
+        with self.client.patch_ip('1.2.3.4'):
+            resp = self.client.get(flask.url_for(
+                'console.console_page', server_name=self.server_name,
+            ))
+        T.assert_equal(resp.response.status_code, 403)
+
+    def _get_first_event(self, **kwargs):
+        with mock.patch.object(server.console_log, 'FOLLOW_POLL_INTERVAL', 0):
+            resp = self.client.get(
+                flask.url_for(
+                    'console.console_events', server_name=self.server_name,
+                ),
+                buffered=False,
+                **kwargs
+            )
+            T.assert_equal(resp.response.mimetype, 'text/event-stream')
+            chunks = resp.response.response
+            first_event = next(iter(chunks))
+            chunks.close()
+        return first_event
+
+    def test_console_events_from_last_event_id(self):
+        T.assert_equal(
+            self._get_first_event(headers={'Last-Event-ID': '2'}),
+            'id: 3\nevent: line\ndata: "line 3"\n\n',
+        )
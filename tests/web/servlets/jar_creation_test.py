@@ -6,6 +6,7 @@ import os.path
 import pyquery
 import testify as T
 
+import jar_downloader.config_form
 from jar_downloader.discovery import get_jar_downloaders
 from jar_downloader.helpers import get_jar_directory
 from presentation.jar_downloader import JarDownloader
@@ -46,7 +47,7 @@ class TestGetJarCreateForm(T.TestCase):
     def patch_out_jar_downloader_map(self):
         with contextlib.nested(
             mock.patch.object(
-                web.servlets.jar_creation,
+                jar_downloader.config_form,
                 'get_jar_downloader_map',
                 autospec=True,
             ),
@@ -74,6 +75,14 @@ class TestGetJarCreateForm(T.TestCase):
         ret_pq = pyquery.PyQuery(ret)
         T.assert_length(ret_pq.find('input[name=user_jar_name]'), 1)
 
+    def test_action_is_substituted(self):
+        self.url_for_mock.return_value = '/create_jar/A?a=1&b=2'
+        ret_pq = pyquery.PyQuery(get_jar_create_form('A'))
+        T.assert_equal(ret_pq.attr('action'), '/create_jar/A?a=1&b=2')
+        self.url_for_mock.assert_called_once_with(
+            'jar_creation.create_jar', jar_type='A',
+        )
+
 
 class TestJarCreation(TestJarBase):
 
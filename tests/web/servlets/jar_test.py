@@ -3,14 +3,24 @@ import contextlib
 import flask
 import mock
 import shutil
+import simplejson
 import testify as T
+import threading
+import urllib2
 
+import jar_downloader.vanilla_jar_downloader
 from jar_downloader.helpers import create_jar_directory
 from jar_downloader.helpers import get_jar_directory
+from jar_downloader.progress import DOWNLOAD
+from jar_downloader.progress import ProgressEvent
 from jar_downloader.vanilla_jar_downloader import VanillaJarDownloader
 from schemaform.form import Form
 from testing.assertions.response import assert_no_response_errors
 from testing.base_classes.pymsm_server_test_case import PymsmServerTestCase
+from util.jobs import FAILED
+from util.jobs import JobQueue
+from util.jobs import SUCCEEDED
+import web.servlets.jar
 
 class TestJarBase(PymsmServerTestCase):
     __test__ = False
@@ -48,6 +58,24 @@ class TestJarHome(TestJarBase):
         ))
         assert_no_response_errors(resp)
 
+    def test_jar_home_renders_when_versions_are_unreachable(self):
+        with mock.patch.object(
+            jar_downloader.vanilla_jar_downloader.versions_manifest,
+            'get',
+            autospec=True,
+            side_effect=urllib2.URLError('unreachable'),
+        ):
+            resp = self.client.get(flask.url_for(
+                'jar.jar_home',
+                jar_type=self.jar_type,
+                user_jar_name=self.user_jar_name,
+            ))
+        assert_no_response_errors(resp)
+        T.assert_in(
+            'Available versions could not be retrieved',
+            resp.pq('[data-download-url]').text(),
+        )
+
 class TestJarDownloadAndUpdate(TestJarBase):
 
     @T.setup_teardown
@@ -57,6 +85,7 @@ class TestJarDownloadAndUpdate(TestJarBase):
                  VanillaJarDownloader,
                  'update',
                  autospec=True,
+                 return_value=None,
              ),
              mock.patch.object(
                  VanillaJarDownloader,
@@ -69,6 +98,25 @@ class TestJarDownloadAndUpdate(TestJarBase):
          ):
              yield
 
+    @T.setup_teardown
+    def patch_job_queue(self):
+        queue = JobQueue(max_workers=2)
+        with mock.patch.object(web.servlets.jar, 'job_queue', queue):
+            try:
+                yield
+            finally:
+                queue.close()
+
+    def wait_for_job(self, resp):
+        T.assert_equal(resp.response.status_code, 202)
+        T.assert_equal(resp.json['success'], True)
+        job = web.servlets.jar.job_queue.get(resp.json['job']['id'])
+        T.assert_equal(job.wait(5), True)
+
+        status = self.client.get(resp.json['job_url'])
+        assert_no_response_errors(status)
+        return status.json
+
     def test_update(self):
         resp = self.client.post(
            flask.url_for(
@@ -77,11 +125,13 @@ class TestJarDownloadAndUpdate(TestJarBase):
                 user_jar_name=self.user_jar_name,
             ),
         )
+        status = self.wait_for_job(resp)
         self.update_mock.assert_called_once_with(
             # instance of VanillaJarDownloader,
             mock.ANY,
         )
-        T.assert_equal(resp.json, {'success': True})
+        T.assert_equal(status['state'], SUCCEEDED)
+        T.assert_equal(status['result'], {'updated': False})
 
     def test_download(self):
         resp = self.client.post(
@@ -92,9 +142,118 @@ class TestJarDownloadAndUpdate(TestJarBase):
             ),
             data={'version': str(mock.sentinel.download_version)},
         )
+        status = self.wait_for_job(resp)
         self.download_specific_version_mock.assert_called_once_with(
             # instance of VanillaJarDownloader,
             mock.ANY,
             str(mock.sentinel.download_version),
         )
-        T.assert_equal(resp.json, {'success': True})
+        T.assert_equal(status['state'], SUCCEEDED)
+
+    def test_failed_download_reports_error(self):
+        self.download_specific_version_mock.side_effect = IOError('womp')
+        resp = self.client.post(
+           flask.url_for(
+                'jar.download',
+                jar_type=self.jar_type,
+                user_jar_name=self.user_jar_name,
+            ),
+            data={'version': '1.6.2'},
+        )
+        status = self.wait_for_job(resp)
+        T.assert_equal(status['state'], FAILED)
+        T.assert_equal(status['error'], 'IOError: womp')
+
+    def test_duplicate_updates_are_coalesced(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_update(instance):
+            started.set()
+            release.wait(5)
+
+        self.update_mock.side_effect = slow_update
+        url = flask.url_for(
+            'jar.update',
+            jar_type=self.jar_type,
+            user_jar_name=self.user_jar_name,
+        )
+        first = self.client.post(url)
+        started.wait(5)
+        second = self.client.post(url)
+        release.set()
+
+        T.assert_equal(first.json['job']['id'], second.json['job']['id'])
+        self.wait_for_job(second)
+        T.assert_equal(self.update_mock.call_count, 1)
+
+    def test_update_and_download_of_a_directory_do_not_overlap(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_update(instance):
+            started.set()
+            release.wait(5)
+
+        self.update_mock.side_effect = slow_update
+        update = self.client.post(flask.url_for(
+            'jar.update',
+            jar_type=self.jar_type,
+            user_jar_name=self.user_jar_name,
+        ))
+        started.wait(5)
+        download = self.client.post(
+            flask.url_for(
+                'jar.download',
+                jar_type=self.jar_type,
+                user_jar_name=self.user_jar_name,
+            ),
+            data={'version': '1.6.2'},
+        )
+        download_job = web.servlets.jar.job_queue.get(
+            download.json['job']['id'],
+        )
+        T.assert_equal(download_job.wait(0.1), False)
+        T.assert_equal(self.download_specific_version_mock.call_count, 0)
+
+        release.set()
+        self.wait_for_job(update)
+        self.wait_for_job(download)
+        T.assert_equal(self.download_specific_version_mock.call_count, 1)
+
+    def test_unknown_job(self):
+        resp = self.client.get(flask.url_for('jar.job_status', job_id='nope'))
+        T.assert_equal(resp.response.status_code, 404)
+
+    def test_job_events(self):
+        def fake_download(instance, version):
+            instance.emit_progress(ProgressEvent(DOWNLOAD, 10, 20, 5, 2))
+
+        self.download_specific_version_mock.side_effect = fake_download
+        resp = self.client.post(
+           flask.url_for(
+                'jar.download',
+                jar_type=self.jar_type,
+                user_jar_name=self.user_jar_name,
+            ),
+            data={'version': '1.6.2'},
+        )
+        self.wait_for_job(resp)
+
+        events = self.client.get(resp.json['events_url'])
+        assert_no_response_errors(events)
+        T.assert_equal(
+            events.response.mimetype, 'text/event-stream',
+        )
+        chunks = events.response.data.split('\n\n')
+        T.assert_equal(
+            chunks[0].split('\n'),
+            [
+                'event: progress',
+                'data: ' + simplejson.dumps(
+                    ProgressEvent(DOWNLOAD, 10, 20, 5, 2)._asdict(),
+                ),
+            ],
+        )
+        T.assert_equal(chunks[1].split('\n')[0], 'event: finished')
+        T.assert_equal(chunks[2:], [''])
@@ -0,0 +1,17 @@
+import testify as T
+
+from web.sse import format_event
+
+class TestFormatEvent(T.TestCase):
+
+    def test_format_event(self):
+        T.assert_equal(
+            format_event('progress', {'a': 1}),
+            'event: progress\ndata: {"a": 1}\n\n',
+        )
+
+    def test_event_id(self):
+        T.assert_equal(
+            format_event('line', 'foo', event_id=0),
+            'id: 0\nevent: line\ndata: "foo"\n\n',
+        )
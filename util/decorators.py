@@ -1,6 +1,7 @@
 
 import flask
 import functools
+import threading
 
 from web.flask_helpers import is_internal
 
@@ -50,3 +51,30 @@ class cached_property(object):
         value = self._func(obj)
         obj.__dict__[self.__name__] = value
         return value
+
+def memoize(func):
+    """Caches the return value of func for each set of (hashable) positional
+    arguments.  The cache is cleared with func.clear_cache().
+
+    Usage:
+
+    @memoize
+    def foo():
+        return expensive()
+    """
+    cache = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        with lock:
+            if args not in cache:
+                cache[args] = func(*args)
+            return cache[args]
+
+    def clear_cache():
+        with lock:
+            cache.clear()
+
+    wrapper.clear_cache = clear_cache
+    return wrapper
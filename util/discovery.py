@@ -24,34 +24,87 @@ def get_module_name(root, filename):
     # XXX: should really use pathsep here
     return relpath.replace('/', '.')
 
-def discover(directory, cls_match_func):
+def _iter_module_files(directory):
+    """Yields (module_name, path) of the python files in directory."""
+    # Look for all python files in the directory
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if not fnmatch.fnmatch(filename, '*.py'):
+                continue
+            yield get_module_name(root, filename), os.path.join(root, filename)
+
+def _import(module_name):
+    # TODO: testify does something similar and wraps this in a try
+    # except.  Is this something I want to do?
+    __import__(module_name)
+    return sys.modules[module_name]
+
+def _get_matched_names(module, cls_match_func):
+    """Returns the sorted names of the classes in module matched by
+    cls_match_func.
+    """
+    return sorted(
+        name
+        for name, imported_class in inspect.getmembers(module, inspect.isclass)
+        if cls_match_func(imported_class)
+    )
+
+def build_manifest(directory, cls_match_func):
+    """Returns a manifest of the classes discover() would find.  The manifest
+    is json serializable and looks like this: {
+        'module.name': {
+            'mtime': 1375794000.0,
+            'classes': ['ClassName'],
+        },
+    }
+
+    Args:
+        directory - Directory to search in relative to the cwd (or absolute)
+        cls_match_func - Function taking a class and returning true if the
+            class is to be included in the manifest.
+    """
+    manifest = {}
+    for module_name, path in _iter_module_files(directory):
+        manifest[module_name] = {
+            'mtime': os.stat(path).st_mtime,
+            'classes': _get_matched_names(_import(module_name), cls_match_func),
+        }
+    return manifest
+
+def discover(directory, cls_match_func, manifest=None):
     """Returns a set of classes in the directory matched by cls_match_func
 
     Args:
         directory - Directory to search in relative to the cwd (or absolute)
         cls_match_func - Function taking a class and returning true if the
             class is to be included in the output.
+        manifest - Optional manifest from build_manifest().  Modules which
+            have not been modified since the manifest was built are only
+            imported if they contain matching classes.
     """
+    manifest = manifest or {}
     matched_classes = set()
 
-    # Look for all python files in the jar downloader directory
-    for root, _, filenames in os.walk(directory):
-        for filename in filenames:
-            if not fnmatch.fnmatch(filename, '*.py'):
+    for module_name, path in _iter_module_files(directory):
+        entry = manifest.get(module_name)
+        if entry is not None and entry['mtime'] == os.stat(path).st_mtime:
+            names = entry['classes']
+            if not names:
                 continue
+        else:
+            names = None
 
-            module_name = get_module_name(root, filename)
-            # TODO: testify does something similar and wraps this in a try
-            # except.  Is this something I want to do?
-            # Import the module
-            __import__(module_name)
-            module = sys.modules[module_name]
-
-            # Check all the classes in that module
-            for name, _ in inspect.getmembers(module, inspect.isclass):
-                imported_class = getattr(module, name)
+        module = _import(module_name)
+        if names is None:
+            names = _get_matched_names(module, cls_match_func)
 
-                if cls_match_func(imported_class):
-                    matched_classes.add(imported_class)
+        # The manifest only saves us imports, the classes are checked again
+        for name in names:
+            imported_class = getattr(module, name, None)
+            if (
+                inspect.isclass(imported_class) and
+                cls_match_func(imported_class)
+            ):
+                matched_classes.add(imported_class)
 
     return matched_classes
@@ -0,0 +1,293 @@
+
+import collections
+import httplib
+import os
+import os.path
+import simplejson
+import socket
+import time
+import urllib2
+
+from util.files import CHUNK_SIZE
+from util.files import copy_in_chunks
+from util.files import HashingWriter
+
+PART_SUFFIX = '.part'
+PART_INFO_SUFFIX = '.part.json'
+
+DEFAULT_TIMEOUT = 60
+
+PARTIAL_CONTENT = 206
+RANGE_NOT_SATISFIABLE = 416
+
+
+class IncompleteDownloadError(IOError): pass
+class ChecksumMismatchError(IOError): pass
+
+
+class RetryPolicy(collections.namedtuple(
+    'RetryPolicy',
+    ['attempts', 'initial_delay', 'backoff_factor', 'max_delay'],
+)):
+    """A RetryPolicy describes how many times a download is attempted and how
+    long to wait between attempts.
+
+    Properties:
+        attempts - Total number of attempts (including the first one)
+        initial_delay - Seconds to wait after the first failure
+        backoff_factor - Multiplier applied to the delay after each failure
+        max_delay - Upper bound on the delay between attempts
+    """
+    __slots__ = ()
+
+    def get_delay(self, failures):
+        """Returns the number of seconds to wait after the given number of
+        failures.
+        """
+        return min(
+            self.initial_delay * self.backoff_factor ** (failures - 1),
+            self.max_delay,
+        )
+
+DEFAULT_RETRY_POLICY = RetryPolicy(
+    attempts=5, initial_delay=1, backoff_factor=2, max_delay=30,
+)
+
+# Errors which are worth retrying, anything else is raised immediately
+RETRYABLE_ERRORS = (
+    ChecksumMismatchError,
+    IncompleteDownloadError,
+    httplib.HTTPException,
+    socket.error,
+    urllib2.URLError,
+)
+
+
+def _is_client_error(error):
+    """Client errors (such as 404) will not go away by trying again."""
+    return isinstance(error, urllib2.HTTPError) and 400 <= error.code < 500
+
+def get_part_path(path):
+    return path + PART_SUFFIX
+
+def get_part_info_path(path):
+    return path + PART_INFO_SUFFIX
+
+def _remove_if_exists(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def _read_part_info(path, url):
+    """Returns the recorded info about a partial download of url to path or
+    None if there is no usable partial download.
+    """
+    part_path = get_part_path(path)
+    part_info_path = get_part_info_path(path)
+    if not os.path.exists(part_path) or not os.path.exists(part_info_path):
+        return None
+
+    try:
+        with open(part_info_path, 'r') as part_info_file:
+            part_info = simplejson.load(part_info_file)
+    except (IOError, ValueError):
+        return None
+
+    if part_info.get('url') != url:
+        return None
+
+    # More than the whole file can't be resumed from
+    size = part_info.get('size')
+    if size is not None and os.path.getsize(part_path) > size:
+        return None
+
+    return part_info
+
+def _write_part_info(path, part_info):
+    with open(get_part_info_path(path), 'w') as part_info_file:
+        simplejson.dump(part_info, part_info_file)
+
+def _discard_part(path):
+    _remove_if_exists(get_part_path(path))
+    _remove_if_exists(get_part_info_path(path))
+
+def _get_total_size(response, offset):
+    """Returns the total size of the resource or None if it is unknown."""
+    headers = response.info()
+    content_range = headers.getheader('Content-Range')
+    if content_range:
+        # Content-Range: bytes 100-999/1000
+        total = content_range.rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+
+    content_length = headers.getheader('Content-Length')
+    if content_length is not None:
+        return offset + int(content_length)
+    return None
+
+def check_hashes(hashes, expected_hashes):
+    """Raises ChecksumMismatchError if any of the expected hashes does not
+    match the computed ones.
+
+    Args:
+        hashes - dict mapping algorithm name to computed hex digest
+        expected_hashes - dict mapping algorithm name to expected hex digest
+    """
+    for algorithm, expected in expected_hashes.iteritems():
+        if hashes[algorithm] != expected.lower():
+            raise ChecksumMismatchError(
+                'Expected {0} {1}, got {2}.'.format(
+                    algorithm, expected, hashes[algorithm],
+                )
+            )
+
+def _hash_existing(part_path, writer, chunk_size):
+    """Feeds the already downloaded part of a file to the writer's hashes."""
+    with open(part_path, 'rb') as part_file:
+        while True:
+            chunk = part_file.read(chunk_size)
+            if not chunk:
+                return
+            writer.update(chunk)
+
+def _download_attempt(
+    url,
+    path,
+    timeout,
+    chunk_size,
+    hash_algorithms,
+    expected_hashes,
+    progress_callback,
+):
+    part_path = get_part_path(path)
+    part_info = _read_part_info(path, url)
+    if part_info is None:
+        _discard_part(path)
+        offset = 0
+    else:
+        offset = os.path.getsize(part_path)
+
+    request = urllib2.Request(url)
+    if offset:
+        request.add_header('Range', 'bytes={0}-'.format(offset))
+        # If-Range makes the server send the full resource (200) instead of a
+        # range if the resource changed since we started downloading it
+        validator = part_info.get('etag') or part_info.get('last_modified')
+        if validator:
+            request.add_header('If-Range', validator)
+
+    try:
+        response = urllib2.urlopen(request, timeout=timeout)
+    except urllib2.HTTPError as e:
+        if e.code == RANGE_NOT_SATISFIABLE:
+            # Our partial file no longer makes sense, start over
+            _discard_part(path)
+            raise IncompleteDownloadError('Range not satisfiable.')
+        raise
+
+    if response.getcode() != PARTIAL_CONTENT:
+        offset = 0
+
+    headers = response.info()
+    part_info = {
+        'url': url,
+        'etag': headers.getheader('ETag'),
+        'last_modified': headers.getheader('Last-Modified'),
+        'size': _get_total_size(response, offset),
+    }
+    _write_part_info(path, part_info)
+
+    with open(part_path, 'ab' if offset else 'wb') as part_file:
+        writer = HashingWriter(part_file, hash_algorithms)
+        if offset:
+            _hash_existing(part_path, writer, chunk_size)
+        if progress_callback is None:
+            chunk_callback = None
+        else:
+            progress_callback(offset, part_info['size'])
+            chunk_callback = lambda bytes_copied: progress_callback(
+                offset + bytes_copied, part_info['size'],
+            )
+        copy_in_chunks(
+            response,
+            writer,
+            chunk_size=chunk_size,
+            progress_callback=chunk_callback,
+        )
+        part_file.flush()
+        os.fsync(part_file.fileno())
+
+    downloaded_size = os.path.getsize(part_path)
+    if part_info['size'] is not None and downloaded_size != part_info['size']:
+        if downloaded_size > part_info['size']:
+            # Resuming would only add to the garbage, start over
+            _discard_part(path)
+        raise IncompleteDownloadError(
+            'Expected {0} bytes, got {1}.'.format(
+                part_info['size'], downloaded_size,
+            )
+        )
+
+    hashes = writer.hexdigests
+    try:
+        check_hashes(hashes, expected_hashes)
+    except ChecksumMismatchError:
+        # The partial file is garbage, the next attempt needs to start over
+        _discard_part(path)
+        raise
+
+    os.rename(part_path, path)
+    _remove_if_exists(get_part_info_path(path))
+    return hashes
+
+def download(
+    url,
+    path,
+    retry_policy=DEFAULT_RETRY_POLICY,
+    timeout=DEFAULT_TIMEOUT,
+    chunk_size=CHUNK_SIZE,
+    hash_algorithms=(),
+    expected_hashes=None,
+    progress_callback=None,
+):
+    """Downloads url to path.  Returns a dict mapping algorithm name to the
+    hex digest of the downloaded file for each of hash_algorithms.
+
+    The download is streamed into path.part (alongside a path.part.json
+    recording the expected size and the ETag / Last-Modified validator).  Once
+    complete it is fsynced and renamed to path.  When an attempt fails the
+    partial file is kept and the next attempt (in this call or a later one)
+    resumes it with a Range request.
+
+    The file is hashed while it streams.  If it does not match
+    expected_hashes it is discarded (and retried) instead of being renamed
+    into place.
+
+    Args:
+        url - Url to download
+        path - Destination of the downloaded file
+        retry_policy - RetryPolicy for failed attempts
+        timeout - Timeout in seconds for the connection
+        chunk_size - Number of bytes to read at once
+        hash_algorithms - hashlib algorithm names to compute while downloading
+        expected_hashes - dict mapping algorithm name to expected hex digest
+        progress_callback - Optional function called with
+            (bytes_transferred, total_size) as the file streams.  The counts
+            include a resumed prefix and total_size is None when unknown.
+    """
+    expected_hashes = expected_hashes or {}
+    hash_algorithms = set(hash_algorithms) | set(expected_hashes)
+    for attempt in xrange(1, retry_policy.attempts + 1):
+        try:
+            return _download_attempt(
+                url,
+                path,
+                timeout,
+                chunk_size,
+                hash_algorithms,
+                expected_hashes,
+                progress_callback,
+            )
+        except RETRYABLE_ERRORS as e:
+            if attempt == retry_policy.attempts or _is_client_error(e):
+                raise
+            time.sleep(retry_policy.get_delay(attempt))
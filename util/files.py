@@ -0,0 +1,153 @@
+
+import contextlib
+import errno
+import hashlib
+import os
+import os.path
+import stat
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+# Mode of new files before the umask is applied (like open())
+DEFAULT_FILE_MODE = 0666
+
+# The umask can only be read by setting it, so it is read once on import
+# (before any threads could be creating files with the temporary umask)
+_umask = os.umask(0)
+os.umask(_umask)
+
+def _get_file_mode(path):
+    """Returns the permissions of the file at path or the ones a new file
+    would get if it doesn't exist.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return DEFAULT_FILE_MODE & ~_umask
+
+@contextlib.contextmanager
+def atomic_open(path, mode='wb'):
+    """Opens a temporary file next to path which replaces path on success.
+
+    The file is flushed and fsynced before being renamed over path so a crash
+    will never leave a partially written file at path.  On failure the
+    temporary file is removed and path is left untouched.  The file keeps the
+    permissions of the file it replaces (new files get the umask's).
+
+    Args:
+        path - Destination path of the file
+        mode - Mode to open the temporary file with (must be a write mode)
+    """
+    directory, filename = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(
+        prefix='.{0}.'.format(filename),
+        suffix='.tmp',
+        dir=directory or '.',
+    )
+    try:
+        # mkstemp creates the file readable by its owner only
+        os.fchmod(fd, _get_file_mode(path))
+        with os.fdopen(fd, mode) as temp_file:
+            yield temp_file
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.rename(temp_path, path)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def copy_in_chunks(
+    source, destination, chunk_size=CHUNK_SIZE, progress_callback=None,
+):
+    """Copies a file-like object to another in fixed size chunks so at most
+    one chunk is held in memory at a time.  Returns the number of bytes copied.
+
+    Args:
+        source - File-like object to read from
+        destination - File-like object to write to
+        chunk_size - Maximum number of bytes to read at once
+        progress_callback - Optional function called with the number of bytes
+            copied so far after every chunk
+    """
+    bytes_copied = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return bytes_copied
+        destination.write(chunk)
+        bytes_copied += len(chunk)
+        if progress_callback is not None:
+            progress_callback(bytes_copied)
+
+class HashingWriter(object):
+    """Wraps a writable file-like object and hashes everything written to it.
+    """
+
+    def __init__(self, file_obj, algorithms):
+        """Initialize a HashingWriter.
+
+        Args:
+            file_obj - Writable file-like object
+            algorithms - Iterable of hashlib algorithm names
+        """
+        self.file_obj = file_obj
+        self._hashes = dict(
+            (algorithm, hashlib.new(algorithm)) for algorithm in algorithms
+        )
+
+    def update(self, data):
+        """Hashes data without writing it."""
+        for file_hash in self._hashes.itervalues():
+            file_hash.update(data)
+
+    def write(self, data):
+        self.update(data)
+        self.file_obj.write(data)
+
+    @property
+    def hexdigests(self):
+        """Returns a dict mapping algorithm name to hex digest."""
+        return dict(
+            (algorithm, file_hash.hexdigest())
+            for algorithm, file_hash in self._hashes.iteritems()
+        )
+
+def get_file_hashes(
+    path, algorithms, chunk_size=CHUNK_SIZE, progress_callback=None,
+):
+    """Returns a dict mapping algorithm name to the hex digest of the file at
+    path.  The file is only read once regardless of the number of algorithms.
+
+    Args:
+        path - Path to the file
+        algorithms - Iterable of hashlib algorithm names
+        chunk_size - Maximum number of bytes to read at once
+        progress_callback - Optional function called with
+            (bytes_hashed, total_size) after every chunk
+    """
+    writer = HashingWriter(None, algorithms)
+    total_size = os.path.getsize(path)
+    bytes_hashed = 0
+    with open(path, 'rb') as file_obj:
+        while True:
+            chunk = file_obj.read(chunk_size)
+            if not chunk:
+                return writer.hexdigests
+            writer.update(chunk)
+            bytes_hashed += len(chunk)
+            if progress_callback is not None:
+                progress_callback(bytes_hashed, total_size)
+
+def hash_file(path, algorithm='sha256', chunk_size=CHUNK_SIZE):
+    """Returns the hex digest of the file at path, reading it in chunks.
+
+    Args:
+        path - Path to the file
+        algorithm - Name of a hashlib algorithm
+        chunk_size - Maximum number of bytes to read at once
+    """
+    return get_file_hashes(path, [algorithm], chunk_size=chunk_size)[algorithm]
@@ -0,0 +1,140 @@
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import time
+
+# Flags from linux/inotify.h
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_ONLYDIR = 0x01000000
+
+# Changes to the entries of a directory (and to the directory itself)
+DIRECTORY_EVENTS = (
+    IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+    IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+READ_SIZE = 64 * 1024
+
+# Mtimes younger than this many seconds are not trusted since an entry could
+# still be added within the filesystem's timestamp granularity
+RACY_MTIME_WINDOW = 2
+
+
+def _get_libc():
+    return ctypes.CDLL(
+        ctypes.util.find_library('c') or 'libc.so.6', use_errno=True,
+    )
+
+
+class MtimeWatcher(object):
+    """Watches directories by comparing their mtimes on every check.
+
+    The mtime of a directory changes when an entry is added to, removed from
+    or renamed inside of it (but not when a file inside of it is written).
+    """
+
+    def __init__(self):
+        self._mtimes = {}
+
+    def _get_mtime(self, path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def watch(self, paths):
+        """Watches exactly paths from now on, forgetting earlier paths."""
+        self._mtimes = dict((path, self._get_mtime(path)) for path in paths)
+
+    def changed(self):
+        """Returns whether any of the watched directories changed since they
+        were watched.
+        """
+        now = time.time()
+        for path, mtime in self._mtimes.iteritems():
+            if mtime is None or now - mtime < RACY_MTIME_WINDOW:
+                return True
+            if self._get_mtime(path) != mtime:
+                return True
+        return False
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Watches directories with inotify.
+
+    Checking for changes is a single non-blocking read of the inotify file
+    descriptor.  Raises OSError on construction if inotify is not available.
+    """
+
+    def __init__(self):
+        try:
+            self._libc = _get_libc()
+            self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except AttributeError:
+            raise OSError(errno.ENOSYS, 'inotify is not available.')
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._watched = set()
+        self._changed = False
+
+    def watch(self, paths):
+        """Adds watches for paths not yet watched.
+
+        Watches of directories which have been removed go away on their own.
+        A path which can't be watched (it was removed in the meantime) is
+        reported as a change.
+        """
+        for path in set(paths) - self._watched:
+            watch_descriptor = self._libc.inotify_add_watch(
+                self._fd, path, DIRECTORY_EVENTS,
+            )
+            if watch_descriptor < 0:
+                self._changed = True
+            else:
+                self._watched.add(path)
+
+    def changed(self):
+        """Returns whether any events arrived since the last check."""
+        changed, self._changed = self._changed, False
+        while True:
+            try:
+                events = os.read(self._fd, READ_SIZE)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if not events:
+                break
+            changed = True
+
+        if changed:
+            # Removed directories lose their watches so forget all of them and
+            # let the next watch() re-add (which is a no-op for live watches)
+            self._watched = set()
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def get_watcher():
+    """Returns an InotifyWatcher, falling back to an MtimeWatcher where
+    inotify is not available.
+    """
+    try:
+        return InotifyWatcher()
+    except OSError:
+        return MtimeWatcher()
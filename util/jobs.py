@@ -0,0 +1,209 @@
+
+import collections
+import multiprocessing.pool
+import Queue
+import threading
+import time
+import uuid
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+FINISHED_STATES = frozenset([SUCCEEDED, FAILED])
+
+DEFAULT_MAX_WORKERS = 4
+# Number of finished jobs kept around for status lookups
+DEFAULT_MAX_FINISHED_JOBS = 100
+
+# Kinds of events yielded by Job.iter_events
+PROGRESS = 'progress'
+FINISHED = 'finished'
+
+# Put on subscriber queues when the job finishes
+_FINISHED_SENTINEL = object()
+
+
+class Job(object):
+    """A Job is a unit of background work along with its progress."""
+
+    def __init__(self, key, description):
+        """Initialize a Job.
+
+        Args:
+            key - Jobs with equal keys are coalesced while one is unfinished
+            description - Human readable description of the job
+        """
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.description = description
+        self.state = QUEUED
+        self.progress = None
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def _publish(self, item):
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(item)
+
+    def report_progress(self, progress):
+        """Records the latest progress of the job and passes it on to
+        iter_events.
+
+        Args:
+            progress - json serializable dict describing the progress
+        """
+        self.progress = progress
+        self._publish(progress)
+
+    def iter_events(self, keepalive_interval=None):
+        """Yields (PROGRESS, progress) as the job reports progress and
+        finally (FINISHED, job dict).  The first event is the current
+        progress (if there is any).  Blocks between events, yielding None
+        every keepalive_interval seconds without an event.
+        """
+        subscriber = Queue.Queue()
+        with self._lock:
+            self._subscribers.append(subscriber)
+            progress = self.progress
+            # Subscribing before the job finished means the sentinel arrives
+            finished = self._finished.is_set()
+        try:
+            if progress is not None:
+                yield PROGRESS, progress
+
+            while not finished:
+                try:
+                    item = subscriber.get(timeout=keepalive_interval)
+                except Queue.Empty:
+                    yield None
+                    continue
+                if item is _FINISHED_SENTINEL:
+                    finished = True
+                else:
+                    yield PROGRESS, item
+
+            yield FINISHED, self.to_dict()
+        finally:
+            with self._lock:
+                self._subscribers.remove(subscriber)
+
+    def wait(self, timeout=None):
+        """Blocks until the job finishes.  Returns whether it finished."""
+        # Event.wait returns None before python 2.7
+        self._finished.wait(timeout)
+        return self._finished.is_set()
+
+    def run(self, func, on_finished=None):
+        """Runs func(job) recording its outcome.
+
+        Args:
+            func - Function taking the Job
+            on_finished - Optional function taking the Job which is called
+                once it finished, before anything waiting on it wakes up
+        """
+        self.started_at = time.time()
+        self.state = RUNNING
+        try:
+            self.result = func(self)
+            self.state = SUCCEEDED
+        except Exception as e:
+            self.error = '{0}: {1}'.format(type(e).__name__, e)
+            self.state = FAILED
+        finally:
+            self.finished_at = time.time()
+            if on_finished is not None:
+                on_finished(self)
+            self._finished.set()
+            self._publish(_FINISHED_SENTINEL)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'description': self.description,
+            'state': self.state,
+            'progress': self.progress,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class JobQueue(object):
+    """Runs jobs on a pool of background threads.
+
+    Submitting a job whose key matches an unfinished job returns the
+    unfinished job instead of running a duplicate.
+    """
+
+    def __init__(
+        self,
+        max_workers=DEFAULT_MAX_WORKERS,
+        max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS,
+    ):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pool = None
+        self._jobs = {}
+        self._unfinished_by_key = {}
+        self._finished_ids = collections.deque()
+        self._max_finished_jobs = max_finished_jobs
+
+    def _get_pool(self):
+        # Created on first use so importing doesn't start threads
+        if self._pool is None:
+            self._pool = multiprocessing.pool.ThreadPool(self.max_workers)
+        return self._pool
+
+    def submit(self, key, description, func):
+        """Queues func(job) to run in the background and returns its Job.
+
+        Args:
+            key - Hashable identifying the work, see Job
+            description - Human readable description of the job
+            func - Function taking the Job, its return value becomes the
+                job's result
+        """
+        with self._lock:
+            job = self._unfinished_by_key.get(key)
+            if job is not None:
+                return job
+
+            job = Job(key, description)
+            self._jobs[job.id] = job
+            self._unfinished_by_key[key] = job
+            self._get_pool().apply_async(job.run, (func, self._forget))
+            return job
+
+    def _forget(self, job):
+        """Stops coalescing with the finished job."""
+        with self._lock:
+            del self._unfinished_by_key[job.key]
+            self._finished_ids.append(job.id)
+            while len(self._finished_ids) > self._max_finished_jobs:
+                del self._jobs[self._finished_ids.popleft()]
+
+    def get(self, job_id):
+        """Returns the Job with the id or None if it is unknown."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def close(self):
+        """Waits for the queued jobs and stops the worker threads."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
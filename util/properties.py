@@ -1,8 +1,11 @@
 
+import collections
 import contextlib
 import cStringIO
 import re
 
+from util.files import atomic_open
+
 class InvalidPropertiesFileError(ValueError): pass
 
 # This interface roughly follows that of the interface for simplejson
@@ -10,20 +13,6 @@ class InvalidPropertiesFileError(ValueError): pass
 # java.util.Properties
 # http://docs.oracle.com/javase/6/docs/api/java/util/Properties.html
 
-# Line continuation regex matches an odd number of backslashes terminating a
-# line
-LINE_CONTINUATION_RE = re.compile(
-    r'''
-        # beginning of string or non backslash character
-        (\A|[^\\])
-        # An odd number of backslashes
-        [\\](\\\\)*
-        # Terminating the string
-        $
-    ''',
-    re.VERBOSE,
-)
-
 # From java.util.Properties:
 # A comment line has an ASCII '#' or '!' as its first non-white space
 # character; comment lines are also ignored and do not encode key-element
@@ -61,102 +50,93 @@ VALUE_ESCAPED_CHARACTERS = set(
     COMMENT + ASSIGNMENT
 )
 
-UNESCAPE_RE_SKELETON = r'''
+# Splits a logical line into its (still encoded) key and value.
+#
+# From java.util.Properties:
+# The key contains all of the characters in the line starting with the first
+# non-white space character and up to, but not including, the first unescaped
+# '=', ':', or white space character other than a line terminator.  ...  Any
+# white space after the key is skipped; if the first non-white space character
+# after the key is '=' or ':', then it is ignored and any white space
+# characters after it are also skipped. All remaining characters on the line
+# become part of the associated element string; if there are no remaining
+# characters, the element is the empty string "".
+#
+# {space} is white space, \s is the same white space str.strip() strips
+# (unicode lines need re.UNICODE for that).
+LINE_RE_SKELETON = r'''
+    {space}*
     (
-        # Beginning of string or a non-backslash character
-        (?:\A|[^\\])
-        # A chunk of even regexes
-        (?:\\\\)*
+        (?:
+            # Anything but a key terminating character
+            [^\\{end_of_key}]
+            |
+            # An escaped character
+            \\.
+            |
+            # A trailing backslash
+            \\\Z
+        )*
     )
-    # Our replace character is 0
-    \\[{0}]
-'''
-
-class KeySplitter(object):
-    """A KeySplitter is for splitting up lines for loading properties."""
-
-    def __init__(self, line):
-        # From java.util.Properties:
-        # The key contains all of the characters in the line starting with the
-        # first non-white space character
-        self.line = line.lstrip()
-        self.position = 0
-        self.in_escape = False
-
-    def _advance(self):
-        """Advances position and sets whether or not the current position is in
-        a character escape.
-        """
-        if not self.in_escape and self.line[self.position] == '\\':
-            self.in_escape = True
-        else:
-            self.in_escape = False
-        self.position += 1
-
-    @property
-    def _is_end_of_key(self):
-        """The current position is the end of the key if the character is not in
-        an escape sequence and is at a key terminating character.
+    {space}*
+    (?:[{assignment}]{space}*)?
+'''.replace(
+    '{end_of_key}', re.escape(''.join(END_OF_ASSIGNMENT)),
+).replace(
+    '{assignment}', re.escape(''.join(ASSIGNMENT)),
+)
 
-        Alternately the end of key could be the end of the string (leading to a
-        key with a value of an empty string.
+_LINE_PATTERN = LINE_RE_SKELETON.replace('{space}', r'\s') + '(.*)'
+LINE_RE = re.compile(_LINE_PATTERN, re.VERBOSE | re.DOTALL)
+UNICODE_LINE_RE = re.compile(
+    _LINE_PATTERN, re.VERBOSE | re.DOTALL | re.UNICODE,
+)
 
-        From java.util.Properties:
-            As a third example, the line:
+# Splits every line of newline joined logical lines in a single findall.  The
+# white space excludes the newline so a match can't run into the next line.
+_LINES_PATTERN = (
+    '^' + LINE_RE_SKELETON.replace('{space}', r'[^\S\n]') + '(.*)$'
+)
+LINES_RE = re.compile(_LINES_PATTERN, re.VERBOSE | re.MULTILINE)
+UNICODE_LINES_RE = re.compile(
+    _LINES_PATTERN, re.VERBOSE | re.MULTILINE | re.UNICODE,
+)
 
-            cheeses
+def _split_line(line):
+    """Splits the line into key, value.  Note these are still encoded."""
+    line_re = UNICODE_LINE_RE if isinstance(line, unicode) else LINE_RE
+    return line_re.match(line).groups()
 
+# Splits out every escape sequence (a backslash and the character after it).
+# Scanning from the left pairs up runs of backslashes from their start just
+# like java.util.Properties does.
+ESCAPE_SPLIT_RE = re.compile(r'(\\.)', re.DOTALL)
 
-            specifies that the key is "cheeses" and the associated element is
-            the empty string "".
-        """
-        return (
-            self.position == len(self.line)
-        ) or (
-            not self.in_escape and
-            self.line[self.position] in END_OF_ASSIGNMENT
-        )
+def _get_unescapes(chars):
+    """Returns a dict mapping the escape sequences of chars to chars."""
+    return dict(('\\' + char, char) for char in chars)
 
-    def _get_key_and_value(self):
-        """Call after _is_end_of_key returns True."""
-        key = self.line[:self.position]
-
-        # From java.util.Properties:
-        # Any white space after the key is skipped; if the first non-white
-        # space character after the key is '=' or ':', then it is ignored and
-        # any white space characters after it are also skipped. All remaining
-        # characters on the line become part of the associated element string;
-        # if there are no remaining characters, the element is the empty string
-        # "".
-        value = self.line[self.position:].lstrip()
-        if len(value) and value[0] in ASSIGNMENT:
-            value = value[1:].lstrip()
-        return key, value
-
-    def split(self):
-        """Splits the line into key, value.  Note these are still encoded."""
-        while not self._is_end_of_key:
-            self._advance()
-        return self._get_key_and_value()
-
-
-def _decode_chars(s, chars):
-    """Decodes characters in chars escaped by a \."""
-    def unescape_char(str_to_replace, char_to_replace):
-        """Unescapes a single character on a string."""
-        unescape_re = re.compile(
-            UNESCAPE_RE_SKELETON.format(char_to_replace),
-            re.VERBOSE,
-        )
-        unescape_replace = r'\1{0}'.format(char_to_replace)
-        while unescape_re.search(str_to_replace):
-            str_to_replace = unescape_re.sub(unescape_replace, str_to_replace)
-        return str_to_replace
+KEY_UNESCAPES = _get_unescapes(KEY_ESCAPED_CHARACTERS)
+VALUE_UNESCAPES = _get_unescapes(VALUE_ESCAPED_CHARACTERS)
 
-    for char in chars:
-        s = unescape_char(s, char)
+# Stands in for escaped backslashes while unescaping
+BACKSLASH_PLACEHOLDER = '\x01'
 
-    return s
+def _unescape(s, unescapes):
+    """Replaces the escape sequences in unescapes (see _get_unescapes),
+    leaving any other escape sequence alone.
+    """
+    if BACKSLASH_PLACEHOLDER not in s:
+        # str.replace pairs up backslashes from the left too and is faster
+        s = s.replace('\\\\', BACKSLASH_PLACEHOLDER)
+        for escaped, char in unescapes.iteritems():
+            s = s.replace(escaped, char)
+        return s.replace(BACKSLASH_PLACEHOLDER, '\\\\')
+
+    parts = ESCAPE_SPLIT_RE.split(s)
+    escapes = parts[1::2]
+    parts[1::2] = map(unescapes.get, escapes, escapes)
+    return ''.join(parts)
 
 def _encode_chars(s, chars):
     """Encodes s with characters in chars by escaping with a \."""
@@ -176,74 +156,126 @@ def _encode_unicode_escapes(s):
         for c in s
     )
 
+def _decode(s, unescapes):
+    if '\\' in s:
+        s = _unescape(s, unescapes)
+    return s.decode('unicode_escape')
+
 def _decode_key_value(key, value):
-    key = _decode_chars(key, KEY_ESCAPED_CHARACTERS)
-    key = key.decode('unicode_escape')
-    value = _decode_chars(value, VALUE_ESCAPED_CHARACTERS)
-    value = value.decode('unicode_escape')
+    return _decode(key, KEY_UNESCAPES), _decode(value, VALUE_UNESCAPES)
 
-    return key, value
+# Separates the keys (or values) decoded together by _decode_joined
+SEPARATOR = '\x00'
 
-def _encode_key_value(key, value):
-    key = _encode_chars(key, ('\\',))
-    key = _encode_chars(key, KEY_ESCAPED_CHARACTERS)
-    key = _encode_unicode_escapes(key)
-    value = _encode_chars(value, ('\\',))
-    value = _encode_chars(value, VALUE_ESCAPED_CHARACTERS)
-    value = _encode_unicode_escapes(value)
-
-    return key, value
-
-def _blank_line_stripping_helper(iterable):
-    """Skips blank lines as described in java.util.Properties:
-        A natural line that contains only white space characters is considered
-        blank and is ignored.
-
-    Args:
-        iterable - An iterable of lines
+def _decode_joined(encoded, unescapes):
+    """Decodes a list of keys (or values) like _decode_key_value with a
+    handful of calls on all of them joined together.
+
+    This works since an encoded key or value never ends inside an escape
+    sequence (the line would have been continued or the key terminator would
+    have been escaped).  Returns None if the separator shows up in a key or
+    value (or decoding fails) in which case they must be decoded one by one
+    (see _decode_all).
     """
-    for line in iterable:
-        if line.strip():
-            yield line
+    joined = SEPARATOR.join(encoded)
+    if joined.count(SEPARATOR) != len(encoded) - 1:
+        return None
+    if '\\' in joined:
+        joined = _unescape(joined, unescapes)
+    try:
+        decoded = joined.decode('unicode_escape')
+    except UnicodeError:
+        # Let decoding one by one raise the error of the first bad line
+        return None
+    if decoded.count(SEPARATOR) != len(encoded) - 1:
+        return None
+    return decoded.split(SEPARATOR)
+
+def _decode_all(encoded, unescapes):
+    """Decodes a list of keys (or values), joined together when possible."""
+    decoded = _decode_joined(encoded, unescapes)
+    if decoded is None:
+        decoded = [_decode(s, unescapes) for s in encoded]
+    return decoded
+
+def _get_encode_re(chars):
+    """Returns a regex matching a backslash or any of chars."""
+    return re.compile('[{0}]'.format(re.escape('\\' + ''.join(sorted(chars)))))
+
+# Backslashes are escaped along with the other characters in a single pass
+KEY_ENCODE_RE = _get_encode_re(KEY_ESCAPED_CHARACTERS)
+VALUE_ENCODE_RE = _get_encode_re(VALUE_ESCAPED_CHARACTERS)
+
+# Characters _encode_unicode_escapes needs to escape
+UNICODE_ESCAPED_RE = re.compile(u'[^\x20-\x7e]')
+
+def _encode(s, encode_re):
+    s = encode_re.sub(r'\\\g<0>', s)
+    if UNICODE_ESCAPED_RE.search(s):
+        s = _encode_unicode_escapes(s)
+    return s
 
-def _comment_stripping_helper(iterable):
-    """Generator to strip comments from a properties file.
+def _encode_key_value(key, value):
+    return _encode(key, KEY_ENCODE_RE), _encode(value, VALUE_ENCODE_RE)
 
-    Args:
-        iterable - An iterable of lines
-    """
-    for line in iterable:
-        if not COMMENT_RE.search(line):
-            yield line
+def _is_continued(line):
+    """Whether the line ends with an odd number of backslashes.
 
-def _line_continuation_helper(iterable):
-    """Generator to assist with line continuation as described in
-    java.util.Properties:
+    From java.util.Properties:
         A logical line holds all the data of a key-element pair, which may be
         spread out across several adjacent natural lines by escaping the line
         terminator sequence with a backslash character \.
-
-    Args:
-        gen - A Generator object
     """
-    gen = iter(iterable)
-
-    while True:
-        try:
-            next = gen.next()
-        except StopIteration:
-            return
-
-        while LINE_CONTINUATION_RE.search(next):
-            # Strip of end line character
-            next = next[:-1]
-            # Add the next line
-            try:
-                next += gen.next().lstrip()
-            except StopIteration:
-                raise InvalidPropertiesFileError('Unexpected EOF')
+    return (len(line) - len(line.rstrip('\\'))) % 2 == 1
 
-        yield next
+def _join_continued_lines(text):
+    """Joins the continued lines of newline joined lines (leading white
+    space of a continuing line is skipped).  Only loops over the lines ending
+    with a backslash.
+    """
+    parts = text.split('\\\n')
+    joined_lines = []
+    head, newline, line = parts[0].rpartition('\n')
+    if newline:
+        joined_lines.append(head)
+
+    for part in parts[1:]:
+        # line lost one of the backslashes ending it to the split, so an even
+        # number left means it was continued
+        if (len(line) - len(line.rstrip('\\'))) % 2 == 0:
+            line += part.lstrip()
+        else:
+            line += '\\\n' + part
+        head, newline, line = line.rpartition('\n')
+        if newline:
+            joined_lines.append(head)
+
+    joined_lines.append(line)
+    return '\n'.join(joined_lines)
+
+def _load_pairs(lines):
+    """Loads the (blank and comment free) natural lines.  Returns a list of
+    (key, value).
+
+    Everything works on the lines joined together: continued lines are
+    joined in one pass, the logical lines are split by a single findall and
+    the keys and values are decoded with a handful of calls (see
+    _decode_all).
+    """
+    if not lines:
+        return []
+    if _is_continued(lines[-1]):
+        raise InvalidPropertiesFileError('Unexpected EOF')
+
+    text = '\n'.join(lines)
+    if '\\\n' in text:
+        text = _join_continued_lines(text)
+
+    lines_re = UNICODE_LINES_RE if isinstance(text, unicode) else LINES_RE
+    keys, values = zip(*lines_re.findall(text))
+    return zip(
+        _decode_all(keys, KEY_UNESCAPES), _decode_all(values, VALUE_UNESCAPES),
+    )
 
 class TypedGetterSetter(object):
     """Interface for setting / getting typed values on a Properties object."""
@@ -288,27 +320,28 @@ class Properties(dict):
     It is a series of key-values that is stored in a file.
     """
 
+    @classmethod
+    def _load_lines(cls, natural_lines):
+        """Loads a Properties object from a list of lines (without line
+        terminators).
+        """
+        lines = [
+            line for line in natural_lines
+            if line.strip() and not COMMENT_RE.match(line)
+        ]
+        return cls(_load_pairs(lines))
+
     @classmethod
     def load(cls, file_like_object):
         """Loads a Properties object from a file-like object."""
-        values = {}
-        for line in _line_continuation_helper(
-            _comment_stripping_helper(
-                _blank_line_stripping_helper(
-                    line.rstrip('\r\n') for line in file_like_object
-                )
-            )
-        ):
-            key_encoded, value_encoded = KeySplitter(line).split()
-            key, value = _decode_key_value(key_encoded, value_encoded)
-            values[key] = value
-
-        return cls(values)
+        return cls._load_lines([
+            line.rstrip('\r\n') for line in file_like_object
+        ])
 
     @classmethod
     def loads(cls, s):
         """Loads a Properties object from a string."""
-        return cls.load(s.splitlines())
+        return cls._load_lines(s.splitlines())
 
     def dump(self, file_like_object):
         """Saves this instance to a file-like object."""
@@ -323,3 +356,236 @@ class Properties(dict):
         with contextlib.closing(cStringIO.StringIO()) as stringio:
             self.dump(stringio)
             return stringio.getvalue()
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError('{0} is immutable'.format(type(self).__name__))
+
+class FrozenProperties(Properties):
+    """A Properties object which can't be modified so it can be shared."""
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+
+class PropertiesEntry(collections.namedtuple(
+    'PropertiesEntry', ['key', 'value', 'line_indices'],
+)):
+    """A key-value of a PropertiesDocument.
+
+    Properties:
+        key - Decoded key
+        value - Decoded value
+        line_indices - Indices of the natural lines holding the entry
+    """
+    __slots__ = ()
+
+
+class PropertiesDocument(object):
+    """A PropertiesDocument is a properties file which remembers its natural
+    lines.  Setting or deleting a key only touches the lines of that key so
+    comments, ordering and formatting survive a round trip (and unchanged
+    documents dump exactly as they were loaded).
+    """
+
+    def __init__(self, natural_lines):
+        """Initialize a PropertiesDocument.  See load / loads.
+
+        Args:
+            natural_lines - List of the lines of the file including their line
+                terminators
+        """
+        self._lines = list(natural_lines)
+        # key -> PropertiesEntry, keys repeated later in the file win
+        self._entries = collections.OrderedDict()
+        # Entries shadowed by a later one, they are removed with the key
+        self._shadowed_line_indices = collections.defaultdict(list)
+        self.changed = False
+
+        for entry in self._iter_entries():
+            if entry.key in self._entries:
+                self._shadowed_line_indices[entry.key].extend(
+                    self._entries.pop(entry.key).line_indices
+                )
+            self._entries[entry.key] = entry
+
+    def _iter_entries(self):
+        logical_line = None
+        line_indices = []
+        for index, natural_line in enumerate(self._lines):
+            line = natural_line.rstrip('\r\n')
+            if not line.strip() or COMMENT_RE.match(line):
+                continue
+
+            if logical_line is None:
+                logical_line = line
+            else:
+                logical_line = logical_line[:-1] + line.lstrip()
+            line_indices.append(index)
+
+            if not _is_continued(logical_line):
+                key, value = _decode_key_value(*_split_line(logical_line))
+                yield PropertiesEntry(key, value, tuple(line_indices))
+                logical_line = None
+                line_indices = []
+
+        if logical_line is not None:
+            raise InvalidPropertiesFileError('Unexpected EOF')
+
+    @property
+    def _line_terminator(self):
+        """The line terminator of the first line ('\n' if there is none)."""
+        for line in self._lines:
+            stripped = line.rstrip('\r\n')
+            if stripped != line:
+                return line[len(stripped):]
+        return '\n'
+
+    def _get_value_prefix(self, entry):
+        """Returns the text of the entry's first line up to its value (the
+        indentation, key and assignment) or None if it doesn't end on the
+        first line.
+        """
+        first_line = self._lines[entry.line_indices[0]].rstrip('\r\n')
+        line_re = UNICODE_LINE_RE if isinstance(first_line, unicode) else LINE_RE
+        match = line_re.match(first_line)
+        value_start = match.start(2)
+        # A continued line's value starts after the trailing backslash
+        if len(entry.line_indices) > 1 and value_start >= len(first_line) - 1:
+            return None
+        prefix = first_line[:value_start]
+        # A key without a separator (and without a value)
+        if match.end(1) == value_start:
+            prefix += '='
+        return prefix
+
+    def _get_line(self, key, value, prefix, line_terminator):
+        # Encoded keys and values are ascii, as str they join with the other
+        # (possibly latin-1) bytes of the line
+        key_encoded, value_encoded = (
+            str(encoded) for encoded in _encode_key_value(key, value)
+        )
+        if prefix is None:
+            prefix = key_encoded + '='
+        return prefix + value_encoded + line_terminator
+
+    def _remove_lines(self, line_indices):
+        # Removed lines are blanked rather than deleted so the indices of the
+        # other entries stay valid
+        for index in line_indices:
+            self._lines[index] = ''
+
+    def __getitem__(self, key):
+        return self._entries[key].value
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        return default if entry is None else entry.value
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        return self._entries.keys()
+
+    def __setitem__(self, key, value):
+        if not isinstance(value, basestring):
+            raise ValueError(
+                'Value needs to be a string, got {0}'.format(
+                    type(value).__name__,
+                ),
+            )
+        entry = self._entries.get(key)
+        if entry is not None and entry.value == value:
+            return
+
+        if entry is None:
+            line_terminator = self._line_terminator
+            if self._lines and not self._lines[-1].endswith(('\r', '\n')):
+                self._lines[-1] += line_terminator
+            self._lines.append(
+                self._get_line(key, value, None, line_terminator),
+            )
+            line_indices = (len(self._lines) - 1,)
+        else:
+            first_index = entry.line_indices[0]
+            first_line = self._lines[first_index]
+            self._lines[first_index] = self._get_line(
+                key,
+                value,
+                self._get_value_prefix(entry),
+                first_line[len(first_line.rstrip('\r\n')):],
+            )
+            self._remove_lines(entry.line_indices[1:])
+            line_indices = (first_index,)
+
+        self._entries[key] = PropertiesEntry(key, value, line_indices)
+        self.changed = True
+
+    def __delitem__(self, key):
+        entry = self._entries.pop(key)
+        self._remove_lines(entry.line_indices)
+        self._remove_lines(self._shadowed_line_indices.pop(key, ()))
+        self.changed = True
+
+    def update(self, values):
+        """Sets each of the key-values of the dict values."""
+        for key, value in values.iteritems():
+            self[key] = value
+
+    def to_properties(self):
+        """Returns the key-values as a Properties object."""
+        return Properties(
+            (key, entry.value) for key, entry in self._entries.iteritems()
+        )
+
+    @classmethod
+    def load(cls, file_like_object):
+        """Loads a PropertiesDocument from a file-like object."""
+        return cls(file_like_object)
+
+    @classmethod
+    def loads(cls, s):
+        """Loads a PropertiesDocument from a string."""
+        return cls(s.splitlines(True))
+
+    def dump(self, file_like_object):
+        """Saves this instance to a file-like object."""
+        file_like_object.write(self.dumps())
+
+    def dumps(self):
+        """Returns this instance as a string."""
+        return ''.join(self._lines)
+
+    @classmethod
+    def load_path(cls, path):
+        # Binary so line terminators are kept as they are
+        with open(path, 'rb') as properties_file:
+            return cls.load(properties_file)
+
+    def save(self, path):
+        """Atomically replaces the file at path with this instance if it
+        changed.  Returns whether the file was written.
+        """
+        if not self.changed:
+            return False
+        with atomic_open(path, 'wb') as properties_file:
+            self.dump(properties_file)
+        self.changed = False
+        return True
+
+
+def update_properties_file(path, values):
+    """Sets the key-values of the dict values in the properties file at path,
+    leaving the rest of the file alone.  The file is only written (atomically)
+    if a value changed.  Returns whether the file was written.
+    """
+    document = PropertiesDocument.load_path(path)
+    document.update(values)
+    return document.save(path)
@@ -4,6 +4,7 @@ import os.path
 
 import config.application
 from web.flask_helpers import render_template_mako
+from web.servlets.console import console
 from web.servlets.jar import jar
 from web.servlets.jar_creation import jar_creation
 
@@ -15,6 +16,7 @@ EXTENSIONS_TO_MIMETYPES = {
 app = flask.Flask(__name__)
 app.register_blueprint(jar_creation)
 app.register_blueprint(jar)
+app.register_blueprint(console)
 
 @app.route('/', methods=['GET'])
 def index():
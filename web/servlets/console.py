@@ -0,0 +1,81 @@
+import flask
+import os.path
+import simplejson
+
+from server.console_log import DEFAULT_PAGE_SIZE
+from server.user_server import get_server_dir
+from server.user_server import SERVER_NAME_REGEX
+from server.user_server import UserServer
+from util.decorators import require_internal
+from web.sse import event_stream_response
+from web.sse import format_event
+from web.sse import KEEPALIVE
+from web.sse import KEEPALIVE_INTERVAL
+
+MAX_PAGE_SIZE = 1000
+
+console = flask.Blueprint('console', __name__)
+
+def get_user_server(server_name):
+    if not SERVER_NAME_REGEX.match(server_name):
+        flask.abort(404)
+    server_dir = get_server_dir(server_name)
+    if not os.path.isdir(server_dir):
+        flask.abort(404)
+    return UserServer(server_dir)
+
+def _get_int_arg(name, default=None):
+    value = flask.request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        flask.abort(400)
+
+@console.route('/servers/<server_name>/console', methods=['GET'])
+@require_internal
+def console_page(server_name):
+    """Returns a page of the server's console lines as json.
+
+    Query args:
+        cursor - next_cursor of the previous page (defaults to the latest
+            lines)
+        limit - Maximum number of lines
+    """
+    user_server = get_user_server(server_name)
+    limit = _get_int_arg('limit', DEFAULT_PAGE_SIZE)
+    if limit < 1:
+        flask.abort(400)
+    limit = min(limit, MAX_PAGE_SIZE)
+    page = user_server.console.get_page(_get_int_arg('cursor'), limit)
+    return flask.Response(
+        simplejson.dumps(page.to_dict()), mimetype='application/json',
+    )
+
+def _format_line_event(line):
+    if line is None:
+        return KEEPALIVE
+    cursor, text = line
+    return format_event('line', text, event_id=cursor)
+
+@console.route('/servers/<server_name>/console/events', methods=['GET'])
+@require_internal
+def console_events(server_name):
+    """Streams the server's console lines as server-sent events, starting at
+    the cursor query arg (or after Last-Event-ID, defaulting to new lines).
+    """
+    user_server = get_user_server(server_name)
+    cursor = _get_int_arg('cursor')
+    last_event_id = flask.request.headers.get('Last-Event-ID')
+    if cursor is None and last_event_id is not None:
+        try:
+            cursor = int(last_event_id) + 1
+        except ValueError:
+            flask.abort(400)
+    return event_stream_response(
+        _format_line_event(line)
+        for line in user_server.console.iter_lines(
+            cursor, keepalive_interval=KEEPALIVE_INTERVAL,
+        )
+    )
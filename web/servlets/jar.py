@@ -1,12 +1,28 @@
-
 import flask
+import functools
 import simplejson
+import threading
 
 from jar_downloader.discovery import get_jar_downloader_map
 from jar_downloader.discovery import get_user_jars
 from util.decorators import require_internal
+from util.jobs import JobQueue
 from presentation.user_jar import UserJar
 from web.flask_helpers import render_template_mako
+from web.sse import event_stream_response
+from web.sse import format_event
+from web.sse import KEEPALIVE
+from web.sse import KEEPALIVE_INTERVAL
+
+ACCEPTED = 202
+
+# Downloads run here so they don't tie up the web workers
+job_queue = JobQueue()
+
+# Maps jar directory to the lock its jobs hold, updates and downloads write
+# the same partial files so only one of them runs per directory at a time
+_jar_directory_locks = {}
+_jar_directory_locks_lock = threading.Lock()
 
 jar = flask.Blueprint(
     'jar', __name__, template_folder='../templates/jar'
@@ -30,13 +46,50 @@ def jar_home(jar_type, user_jar_name):
 
     return render_template_mako('jar/home.mako', user_jar=user_jar_presenter)
 
+def _get_jar_directory_lock(jar_directory):
+    with _jar_directory_locks_lock:
+        return _jar_directory_locks.setdefault(jar_directory, threading.Lock())
+
+def _report_progress(job, event):
+    job.report_progress(event._asdict())
+
+def _run_update(instance, job):
+    instance.add_progress_listener(functools.partial(_report_progress, job))
+    with _get_jar_directory_lock(instance.jar_directory):
+        latest_jar = instance.update()
+    if latest_jar is None:
+        return {'updated': False}
+    return {'updated': True, 'version': latest_jar.short_version}
+
+def _run_download(instance, version, job):
+    instance.add_progress_listener(functools.partial(_report_progress, job))
+    with _get_jar_directory_lock(instance.jar_directory):
+        instance.download_specific_version(version)
+    return {'version': version}
+
+def _job_response(job):
+    return flask.Response(
+        simplejson.dumps({
+            'success': True,
+            'job': job.to_dict(),
+            'job_url': flask.url_for('jar.job_status', job_id=job.id),
+            'events_url': flask.url_for('jar.job_events', job_id=job.id),
+        }),
+        status=ACCEPTED,
+        mimetype='application/json',
+    )
+
 @jar.route('/jar/<jar_type>/<user_jar_name>/update', methods=['POST'])
 @require_internal
 def update(jar_type, user_jar_name):
     instance = get_jar_instance(jar_type, user_jar_name)
 
-    instance.update()
-    return simplejson.dumps({'success': True})
+    job = job_queue.submit(
+        (instance.jar_directory, 'update'),
+        'Update {0}/{1}'.format(jar_type, user_jar_name),
+        functools.partial(_run_update, instance),
+    )
+    return _job_response(job)
 
 @jar.route('/jar/<jar_type>/<user_jar_name>/download', methods=['POST'])
 @require_internal
@@ -44,5 +97,39 @@ def download(jar_type, user_jar_name):
     version = flask.request.form['version']
 
     instance = get_jar_instance(jar_type, user_jar_name)
-    instance.download_specific_version(version)
-    return simplejson.dumps({'success': True})
+    job = job_queue.submit(
+        (instance.jar_directory, 'download', version),
+        'Download {0} for {1}/{2}'.format(version, jar_type, user_jar_name),
+        functools.partial(_run_download, instance, version),
+    )
+    return _job_response(job)
+
+@jar.route('/jobs/<job_id>', methods=['GET'])
+@require_internal
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        flask.abort(404)
+    return flask.Response(
+        simplejson.dumps(job.to_dict()), mimetype='application/json',
+    )
+
+def _format_event(event):
+    if event is None:
+        return KEEPALIVE
+    event_type, data = event
+    return format_event(event_type, data)
+
+@jar.route('/jobs/<job_id>/events', methods=['GET'])
+@require_internal
+def job_events(job_id):
+    """Streams the progress of a job as server-sent events.  The stream ends
+    with a `finished` event carrying the job's status.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        flask.abort(404)
+    return event_stream_response(
+        _format_event(event)
+        for event in job.iter_events(keepalive_interval=KEEPALIVE_INTERVAL)
+    )
@@ -1,25 +1,19 @@
 
 import flask
-import markupsafe
-import re
 
+from jar_downloader.config_form import get_compiled_form
 from jar_downloader.discovery import get_jar_downloaders
-from jar_downloader.discovery import get_jar_downloader_map
 from jar_downloader.discovery import get_user_jars
 from jar_downloader.helpers import create_jar_directory
+from jar_downloader.helpers import USER_JAR_NAME_REGEX
 from util.decorators import require_internal
 from presentation.jar_downloader import JarDownloader
-from schemaform.form import Form
-from schemaform.helpers import el
-from schemaform.single_input_property import SingleInputProperty
 from web.flask_helpers import render_template_mako
 
 jar_creation = flask.Blueprint(
     'jar_creation', __name__, template_folder='../templates/jar_creation'
 )
 
-USER_JAR_NAME_REGEX = re.compile('^[a-zA-Z-_]+$')
-
 def get_jar_downloader_presenters():
     """Returns JarDownloader presenters for each jar downloader installed."""
     return sorted(
@@ -32,30 +26,13 @@ def get_jar_downloader_presenters():
 
 def get_jar_create_form(jar_type):
     """Returns a form for creating a jar given its name.  The returned form
-    has (in addition to the form elements retrieved from the jar itself) a
-    hidden element denoting the name of the jar.  It also has an input for the
-    user to add a name to jar and a submit button.
+    has (in addition to the form elements retrieved from the jar itself) an
+    input for the user to add a name to jar and a submit button.
     """
     # TODO: validate the jar name and redirect back if nonsense, for now error
-    jar_presenter = JarDownloader(get_jar_downloader_map()[jar_type])
-
-    # Need to add a hidden field for the jar name and a text entry for
-    # what the name they are giving it
-    form_pq = Form(
-        jar_presenter.jar_downloader_cls.get_config_schema(),
-        method='POST',
-        action=flask.url_for('jar_creation.create_jar', jar_type=jar_type),
-    ).__pq__()
-    user_jar_name_input = SingleInputProperty(
-        '',
-        'user_jar_name',
-        {'type': 'string', 'label': 'Your Jar Name'},
+    return get_compiled_form(jar_type).render(
+        flask.url_for('jar_creation.create_jar', jar_type=jar_type),
     )
-    form_pq.prepend(user_jar_name_input.__pq__())
-    form_pq.append(el('input', type='submit', value='Submit',))
-    jar_form_markup = markupsafe.Markup(form_pq.__html__())
-
-    return jar_form_markup
 
 
 @jar_creation.route('/jar_list', methods=['GET'])
@@ -81,8 +58,7 @@ def new_jar(jar_type):
 @jar_creation.route('/create_jar/<jar_type>', methods=['POST'])
 @require_internal
 def create_jar(jar_type):
-    jar_downloader_cls = get_jar_downloader_map()[jar_type]
-    form = Form(jar_downloader_cls.get_config_schema())
+    form = get_compiled_form(jar_type).form
     values, errors = form.load_from_form(flask.request.form)
 
     user_jar_name = flask.request.form['user_jar_name']
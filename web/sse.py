@@ -0,0 +1,33 @@
+
+import flask
+import simplejson
+
+# Seconds between keepalives of an idle event stream
+KEEPALIVE_INTERVAL = 15
+
+# Comments keep idle connections from being closed
+KEEPALIVE = ': keepalive\n\n'
+
+def format_event(event_type, data, event_id=None):
+    """Formats a server-sent event with json data.
+
+    Args:
+        event_type - Name of the event
+        data - Json serializable data of the event
+        event_id - Id of the event (lets reconnecting clients resume through
+            Last-Event-ID), None for no id
+    """
+    event = 'event: {0}\ndata: {1}\n\n'.format(
+        event_type, simplejson.dumps(data),
+    )
+    if event_id is not None:
+        event = 'id: {0}\n'.format(event_id) + event
+    return event
+
+def event_stream_response(events):
+    """Returns a streaming Response of formatted server-sent events."""
+    return flask.Response(
+        events,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache'},
+    )
@@ -13,23 +13,46 @@
             downloadList = $('[data-download-url]'),
             downloadUrl = downloadList.data('download-url');
 
-        function updateCallback(d) {
-            console.log('update');
-            console.log(d)
+        var progress = $('[data-progress]');
+
+        function formatProgress(p) {
+            var text = p.stage + ': ' + p.bytes_transferred;
+            if (p.total_bytes !== null) {
+                text += ' / ' + p.total_bytes;
+            }
+            text += ' bytes';
+            if (p.rate !== null) {
+                text += ' (' + Math.round(p.rate / 1024) + ' KiB/s)';
+            }
+            if (p.eta !== null) {
+                text += ' ETA ' + Math.round(p.eta) + 's';
+            }
+            return text;
         }
 
-        function update() {
-            $.post(updateUrl, updateCallback);
+        function followJob(d) {
+            var source = new EventSource(d.events_url);
+            progress.text(d.job.description + ': ' + d.job.state);
+            source.addEventListener('progress', function (e) {
+                progress.text(formatProgress(JSON.parse(e.data)));
+            });
+            source.addEventListener('finished', function (e) {
+                var job = JSON.parse(e.data);
+                source.close();
+                progress.text(
+                    job.description + ': ' + job.state +
+                    (job.error ? ' (' + job.error + ')' : '')
+                );
+            });
         }
 
-        function downloadCallback(d) {
-            console.log('download');
-            console.log(d);
+        function update() {
+            $.post(updateUrl, followJob);
         }
 
         function download() {
             var version = $(this).data('version');
-            $.post(downloadUrl, {version: version}, downloadCallback);
+            $.post(downloadUrl, {version: version}, followJob);
         }
 
         updateLink.click(update);
@@ -73,7 +96,11 @@
       % endif
     </li>
   % else:
-    <li>No Available Versions</li>
+    % if user_jar.available_versions_error is not None:
+      <li>Available versions could not be retrieved, try again later.</li>
+    % else:
+      <li>No Available Versions</li>
+    % endif
   % endfor
 </ul>
 
@@ -81,3 +108,5 @@
   Update
 </a>
 
+<p data-progress></p>
+